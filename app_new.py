@@ -1,31 +1,300 @@
-from flask import Flask, render_template, request, jsonify, session, redirect
+from flask import Flask, render_template, request, jsonify, session, redirect, send_from_directory, g, has_app_context
+from flask.json.provider import DefaultJSONProvider
 from openai import OpenAI
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 import json
 import base64
+import bisect
 from datetime import datetime
 import os
 import tempfile
 import uuid
+import zipfile
+from xml.etree import ElementTree
 import glob
+import hashlib
+import queue
+import threading
+import weakref
+import logging
+import logging.handlers
+import atexit
+import re
+import time
 from dotenv import load_dotenv
-from prompt_loader import load_prompt, get_photo_analysis_prompt
-from functools import wraps
+from prompt_loader import (
+    load_prompt_cached, get_photo_analysis_prompt, get_prompt_mtime, PHOTO_PROMPT_MAPPING
+)
+from cache_utils import TTLCache
+from functools import wraps, lru_cache
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from collections import deque
 import sqlite3
 import mysql.connector
 from mysql.connector import Error
 
+try:
+    import pybase64  # SIMD-accelerated base64 (optional)
+except ImportError:
+    pybase64 = None
+
+try:
+    import orjson  # C/SIMD JSON encoder/decoder (optional)
+except ImportError:
+    orjson = None
+
+try:
+    from dateutil import parser as date_parser  # lenient date parsing (optional)
+except ImportError:
+    date_parser = None
+
+try:
+    import httpx  # HTTP client used by the OpenAI SDK
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx, optional)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import fcntl  # advisory file locks (POSIX only)
+except ImportError:
+    fcntl = None
+
 # Load environment variables
 load_dotenv()
 
+# Logging (production default is WARNING; set LOG_LEVEL=DEBUG for request traces).
+# Request threads only enqueue records; a background QueueListener formats and writes
+# them, to a rotating LOG_FILE when set, otherwise to stderr.
+def create_log_handler():
+    log_file = os.getenv('LOG_FILE')
+    if log_file:
+        handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=5)
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    return handler
+
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, create_log_handler())
+log_queue_handler = logging.handlers.QueueHandler(log_queue)
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # Level/name are added by the listener's handler
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING').upper(), handlers=[log_queue_handler])
+log_listener.start()
+atexit.register(log_listener.stop)
+logger = logging.getLogger(__name__)
+
 # Debug: Check what API key is loaded
 api_key_from_env = os.getenv('OPENAI_API_KEY')
 print(f"DEBUG: API key from .env: {api_key_from_env[:15] if api_key_from_env else 'None'}...")
 
+class OrjsonJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes with orjson, falling back to the default for unsupported types"""
+
+    def _option(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._option(kwargs.get('indent'))).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's UTF-8 bytes straight to the response instead of decoding to str and re-encoding
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        try:
+            body = orjson.dumps(obj, default=self.default, option=self._option(indent) | orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def json_loads(data):
+    """Parse a JSON string/bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+_json_decoder = json.JSONDecoder()
+
+def json_loads_many(payloads):
+    """
+    Parse a list of JSON documents with a single decoder call over one combined array.
+    If the batch does not parse cleanly, each document is parsed on its own; documents
+    that fail are returned as their JSONDecodeError instead of a value.
+    """
+    if not payloads:
+        return []
+    try:
+        parsed = json_loads('[' + ','.join(payloads) + ']')
+        if len(parsed) == len(payloads):
+            return parsed
+    except json.JSONDecodeError:
+        pass
+    results = []
+    for payload in payloads:
+        try:
+            results.append(json_loads(payload))
+        except json.JSONDecodeError as e:
+            results.append(e)
+    return results
+
+def parse_llm_json(text):
+    """
+    Parse a JSON object from an LLM response, tolerating ```json fences and surrounding prose.
+    A clean response is parsed directly; otherwise the object starting at the first '{' is
+    decoded in place with raw_decode (no slicing, trailing text ignored).
+    """
+    text = text.strip().removeprefix('```json').removesuffix('```').strip()
+    try:
+        return json_loads(text)
+    except json.JSONDecodeError:
+        start_idx = text.find('{')
+        if start_idx == -1:
+            raise ValueError("No valid JSON found in response")
+        return _json_decoder.raw_decode(text, start_idx)[0]
+
 app = Flask(__name__)
 app.secret_key = 'your-secure-secret-key-2024'  # Change this to a secure secret key
 
+# Upload size limits. Single-file uploads are capped at MAX_UPLOAD_SIZE; the
+# request-wide cap lets Werkzeug reject oversized bodies before buffering them
+# while still allowing multi-image feedback submissions.
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB per file
+MULTIPART_OVERHEAD_ALLOWANCE = 64 * 1024  # Form fields and multipart boundaries
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 50 * 1024 * 1024))
+if orjson is not None:
+    app.json = OrjsonJSONProvider(app)
+
+# Shared HTTP connection pool for OpenAI calls. httpx.Client is thread-safe, so one
+# pool (HTTP/2 when h2 is installed) keeps TLS sessions alive across worker threads.
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '50'))
+# Overall per-call timeout in seconds; defaults to the OpenAI SDK's own 600s so long completions aren't cut off
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '600'))
+
+def create_openai_http_client():
+    """Return a pooled httpx.Client for the OpenAI SDK, or None to use the SDK default"""
+    if httpx is None:
+        return None
+    return httpx.Client(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=max(1, OPENAI_MAX_CONNECTIONS // 2)
+        ),
+        timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=10.0)
+    )
+
+openai_http_client = create_openai_http_client()
+
 # Configure OpenAI client
-openai_client = OpenAI(api_key=api_key_from_env)
+openai_client = OpenAI(api_key=api_key_from_env, http_client=openai_http_client)
+
+@lru_cache(maxsize=4)
+def get_openai_client(api_key):
+    """Return an OpenAI client for api_key that shares the pooled HTTP connections"""
+    if api_key == api_key_from_env:
+        return openai_client
+    return OpenAI(api_key=api_key, http_client=openai_http_client)
+
+def collect_form_data(fields=None):
+    """Return {field: stripped value} for the non-blank request.form fields (all fields, or only those listed)"""
+    raw = request.form.to_dict(flat=True)
+    if fields is not None:
+        raw = {field: raw[field] for field in fields if field in raw}
+    return {key: stripped for key, value in raw.items() if (stripped := value.strip())}
+
+def get_upload_size(file):
+    """Return the size of an uploaded file by seeking its spooled stream, without reading it into memory"""
+    stream = file.stream
+    position = stream.tell()
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(position)
+    return size
+
+def b64encode_to_str(data):
+    """Base64-encode bytes to a str, using pybase64's SIMD encoder when it is installed"""
+    if pybase64 is not None:
+        return pybase64.b64encode_as_string(data)
+    return base64.b64encode(data).decode('ascii')
+
+def iso_timestamp():
+    """Current local time as an ISO-8601 string at second precision, for stored records"""
+    return datetime.now().isoformat(timespec='seconds')
+
+# Read size for streamed base64 encoding; a multiple of 3 so no padding is emitted mid-stream
+B64_STREAM_CHUNK_SIZE = 3 * 64 * 1024
+
+def stream_b64encode(stream, prefix='', chunk_size=B64_STREAM_CHUNK_SIZE, hasher=None):
+    """Base64-encode a file stream chunk by chunk without buffering the raw upload.
+
+    If a hashlib hasher is given, it is updated with the raw bytes as they are read.
+    Returns a tuple of (prefix + encoded text, number of raw bytes read).
+    """
+    encode = pybase64.b64encode if pybase64 is not None else base64.b64encode
+    out = bytearray(prefix.encode('ascii'))
+    pending = b''
+    total_bytes = 0
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        total_bytes += len(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+        if pending:
+            chunk = pending + chunk
+        # Only encode whole 3-byte groups; carry the remainder into the next read
+        cut = len(chunk) - len(chunk) % 3
+        out += encode(chunk[:cut])
+        pending = chunk[cut:]
+    if pending:
+        out += encode(pending)
+    return out.decode('ascii'), total_bytes
+
+def stream_b64_data_uri(stream, mime_type, hasher=None):
+    """Encode an uploaded file stream straight into a base64 data URI (returns uri, bytes read)"""
+    return stream_b64encode(stream, prefix=f"data:{mime_type};base64,", hasher=hasher)
+
+# Read size when copying uploads to disk, so memory stays bounded regardless of file size
+UPLOAD_WRITE_CHUNK_SIZE = 1024 * 1024
+
+def save_upload_stream(stream, file_path, hasher=None):
+    """Copy an upload stream to file_path in fixed-size chunks and return the number of bytes written.
+
+    If a hashlib hasher is given, it is updated with the bytes as they are copied.
+    """
+    total_bytes = 0
+    with open(file_path, 'wb') as out:
+        while chunk := stream.read(UPLOAD_WRITE_CHUNK_SIZE):
+            if hasher is not None:
+                hasher.update(chunk)
+            out.write(chunk)
+            total_bytes += len(chunk)
+    return total_bytes
+
+# Worker threads for upload encoding, so it overlaps with prompt loading on the request thread
+upload_encode_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='upload-encode')
+
+# Worker threads for OpenAI calls made off the request thread, sized to the HTTP connection pool
+llm_call_pool = ThreadPoolExecutor(max_workers=OPENAI_MAX_CONNECTIONS, thread_name_prefix='llm-call')
+SYMPTOM_ANALYSIS_TIMEOUT = float(os.getenv('SYMPTOM_ANALYSIS_TIMEOUT', '30'))  # seconds
+
+# Raw LLM responses for image analyses, keyed on a hash of the image bytes plus prompt/model
+image_analysis_cache = TTLCache(maxsize=256, ttl=24 * 60 * 60)
 
 # Database Configuration
 DB_CONFIG = {
@@ -36,14 +305,71 @@ DB_CONFIG = {
     'port': int(os.getenv('DB_PORT', 3306))
 }
 
+# AI models offered for custom image analysis (read once; the environment doesn't change at runtime)
+AVAILABLE_MODELS = tuple(
+    model.strip() for model in os.getenv('AVAILABLE_MODELS', 'gpt-4o,gpt-4o-mini,gpt-4-turbo,gpt-3.5-turbo').split(',')
+)
+AVAILABLE_MODELS_SET = frozenset(AVAILABLE_MODELS)
+DEFAULT_MODEL = os.getenv('MODEL', 'gpt-4o-mini')
+
 # SQLite database path
 SQLITE_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'care_ai_cases.db')
 
+# Idle SQLite connections kept open between requests (most recently used first)
+SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', '8'))
+sqlite_idle_connections = queue.LifoQueue(maxsize=SQLITE_POOL_SIZE)
+
+class PooledSQLiteConnection(sqlite3.Connection):
+    """
+    SQLite connection whose close() returns it to sqlite_idle_connections instead of closing it.
+    Cursors still open are closed and any open transaction is rolled back first; the connection
+    is really closed when the pool is full.
+    """
+
+    pooled = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Cursors handed out by this connection, so a partly read SELECT can be finalized
+        # (releasing its read lock) before the connection goes back to the pool
+        self.open_cursors = weakref.WeakSet()
+
+    def cursor(self, *args, **kwargs):
+        cursor = super().cursor(*args, **kwargs)
+        self.open_cursors.add(cursor)
+        return cursor
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def close(self):
+        if self.pooled:
+            return  # Already handed back by an earlier close()
+        try:
+            for cursor in list(self.open_cursors):
+                cursor.close()
+            self.open_cursors.clear()
+            if self.in_transaction:
+                self.rollback()
+            self.pooled = True
+            sqlite_idle_connections.put_nowait(self)
+        except (queue.Full, sqlite3.Error):
+            self.pooled = False
+            super().close()
+
 def get_sqlite_connection():
-    """Create and return a SQLite database connection"""
+    """Return a SQLite database connection, reusing an idle pooled one when available"""
     try:
-        connection = sqlite3.connect(SQLITE_DB_PATH)
-        connection.row_factory = sqlite3.Row  # Enable dict-like access
+        try:
+            connection = sqlite_idle_connections.get_nowait()
+            connection.pooled = False
+        except queue.Empty:
+            # Connections move between worker threads through the pool, one user at a time
+            connection = sqlite3.connect(SQLITE_DB_PATH, factory=PooledSQLiteConnection, check_same_thread=False)
+            connection.row_factory = sqlite3.Row  # Enable dict-like access
         return connection
     except Exception as e:
         print(f"❌ SQLite connection error: {e}")
@@ -110,10 +436,16 @@ def build_patient_summary_fallback(case_details):
         print(f"❌ Error building patient summary fallback: {e}")
         return "Error building patient summary"
 
-def generate_case_number():
-    """Generate a unique case number in format CASE-YYYY-NNNN"""
+def generate_case_number(connection=None):
+    """Generate a unique case number in format CASE-YYYY-NNNN
+
+    Pass an open connection to run the lookup inside the caller's transaction;
+    it is left open for the caller.
+    """
     try:
-        connection = get_sqlite_connection()
+        owns_connection = connection is None
+        if owns_connection:
+            connection = get_sqlite_connection()
         if connection:
             cursor = connection.cursor()
             
@@ -147,7 +479,8 @@ def generate_case_number():
             case_number = f"CASE-{current_year}-{new_number:04d}"
             
             cursor.close()
-            connection.close()
+            if owns_connection:
+                connection.close()
             
             return case_number
             
@@ -171,6 +504,7 @@ def login_required(f):
 
 # File storage functions for patient data
 APP_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'care_app_data')
+UPLOADS_DIR = os.path.join(APP_DATA_DIR, 'uploads')
 os.makedirs(APP_DATA_DIR, exist_ok=True)
 
 def get_session_file_path():
@@ -181,38 +515,160 @@ def get_session_file_path():
         session['session_id'] = session_id
     return os.path.join(APP_DATA_DIR, f'patient_data_{session_id}.json')
 
+def json_dumps_bytes(data):
+    """Serialize data to compact UTF-8 JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # Fall back to the stdlib encoder for types orjson rejects
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+def json_dumps_compact(data):
+    """Serialize data to a compact JSON string (unknown types via str), using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                data, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            ).decode('utf-8')
+        except TypeError:
+            pass  # Fall back to the stdlib encoder for types orjson rejects
+    return json.dumps(data, default=str, separators=(',', ':'))
+
+def write_json_atomic(file_path, data):
+    """Write data as JSON to a temp file in the same directory, then atomically replace file_path"""
+    payload = json_dumps_bytes(data)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
 def save_patient_data(patient_data):
     """Save patient data to temporary file"""
     try:
         file_path = get_session_file_path()
-        with open(file_path, 'w') as f:
-            json.dump(patient_data, f, indent=2)
-        print(f"DEBUG: Saved patient data to {file_path}")
+        invalidate_request_patient_data()
+        write_json_atomic(file_path, patient_data)
+        logger.debug("Saved patient data to %s", file_path)
+        return True
+    except Exception as e:
+        logger.error("Failed to save patient data: %s", e)
+        return False
+
+def _read_patient_data_file(file_path):
+    try:
+        with open(file_path, 'rb') as f:
+            content = f.read()
+    except FileNotFoundError:
+        return {}
+    return json_loads(content) if content.strip() else {}
+
+def update_patient_data_field(section, field, value):
+    """Set patient_data[section][field] with a single read and an atomic rewrite of the file"""
+    try:
+        file_path = get_session_file_path()
+        invalidate_request_patient_data()
+        patient_data = _read_patient_data_file(file_path)
+        patient_data.setdefault(section, {})[field] = value
+        write_json_atomic(file_path, patient_data)
+        logger.debug("Updated %s.%s in %s", section, field, file_path)
         return True
     except Exception as e:
-        print(f"ERROR: Failed to save patient data: {str(e)}")
+        logger.error("Failed to update patient data field %s.%s: %s", section, field, e)
         return False
 
+def append_patient_data_item(section, field, item):
+    """Append item to the list at patient_data[section][field] with a single read and an atomic rewrite"""
+    try:
+        file_path = get_session_file_path()
+        invalidate_request_patient_data()
+        patient_data = _read_patient_data_file(file_path)
+        patient_data.setdefault(section, {}).setdefault(field, []).append(item)
+        write_json_atomic(file_path, patient_data)
+        logger.debug("Appended to %s.%s in %s", section, field, file_path)
+        return True
+    except Exception as e:
+        logger.error("Failed to append to patient data field %s.%s: %s", section, field, e)
+        return False
+
+# Intermediate AI results (Aadhaar/EMR extraction, photo and report analyses, uploaded
+# image records) live in this section of the patient data file rather than in the
+# signed session cookie, which would otherwise be re-serialized on every request.
+SESSION_ARTIFACTS = 'session_artifacts'
+
+def get_session_artifact(field, default=None):
+    """Return an intermediate AI result stored by store_session_artifact/append_session_artifact"""
+    return load_patient_data_readonly().get(SESSION_ARTIFACTS, {}).get(field, default)
+
+def store_session_artifact(field, value):
+    return update_patient_data_field(SESSION_ARTIFACTS, field, value)
+
+def append_session_artifact(field, item):
+    return append_patient_data_item(SESSION_ARTIFACTS, field, item)
+
 def load_patient_data():
     """Load patient data from temporary file"""
     try:
         file_path = get_session_file_path()
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-            print(f"DEBUG: Loaded patient data from {file_path}")
-            return data
-        else:
-            print(f"DEBUG: No patient data file found at {file_path}")
+        try:
+            with open(file_path, 'rb') as f:
+                data = json_loads(f.read())
+        except FileNotFoundError:
+            logger.debug("No patient data file found at %s", file_path)
             return {}
+        logger.debug("Loaded patient data from %s", file_path)
+        return data
     except Exception as e:
-        print(f"ERROR: Failed to load patient data: {str(e)}")
+        logger.error("Failed to load patient data: %s", e)
+        return {}
+
+# Parsed patient data files keyed by path, tagged with the (mtime, size) they were read at
+patient_data_read_cache = TTLCache(maxsize=256, ttl=600)
+
+def load_patient_data_readonly():
+    """Load patient data for read-only use, reusing the last parse while the file is unchanged.
+
+    The result is also memoized for the current request (dropped whenever patient data is
+    written), so repeat calls skip the stat. The returned dict is shared between callers
+    and must not be modified.
+    """
+    if has_app_context() and 'patient_data_readonly' in g:
+        return g.patient_data_readonly
+    data = _load_patient_data_readonly()
+    if has_app_context():
+        g.patient_data_readonly = data
+    return data
+
+def _load_patient_data_readonly():
+    file_path = get_session_file_path()
+    try:
+        stat = os.stat(file_path)
+    except OSError:
         return {}
+    # st_ino changes on every atomic (rename) rewrite, even within mtime granularity
+    file_version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = patient_data_read_cache.get(file_path)
+    if cached and cached[0] == file_version:
+        return cached[1]
+    data = load_patient_data()
+    patient_data_read_cache.set(file_path, (file_version, data))
+    return data
 
 def clear_patient_data():
     """Clear patient data file"""
     try:
         file_path = get_session_file_path()
+        invalidate_request_patient_data()
+        session.pop('patient_context', None)
         if os.path.exists(file_path):
             os.remove(file_path)
             print(f"DEBUG: Cleared patient data file {file_path}")
@@ -227,9 +683,9 @@ def clear_all_patient_data():
         import glob
         import time
         
-        # Find all patient data files
+        # Find all patient data files and uploaded medical images
         pattern = os.path.join(APP_DATA_DIR, 'patient_data_*.json')
-        files = glob.glob(pattern)
+        files = glob.glob(pattern) + glob.glob(os.path.join(UPLOADS_DIR, '*'))
         
         # Calculate 12 hours ago in seconds
         twelve_hours_ago = time.time() - (12 * 60 * 60)  # 12 hours * 60 minutes * 60 seconds
@@ -363,6 +819,10 @@ def not_found_error(error):
         return jsonify({'success': False, 'error': 'Endpoint not found'}), 404
     return redirect('/')  # Redirect to home page instead of using missing 404.html
 
+@app.errorhandler(413)
+def request_entity_too_large(error):
+    return jsonify({'success': False, 'error': 'Uploaded file is too large'}), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     if request.is_json or request.path.startswith('/save') or request.path.startswith('/generate'):
@@ -437,20 +897,22 @@ def initialize_session():
 def validate_session_step(required_step):
     """Validate if user has completed required steps using file storage"""
     try:
-        print(f"DEBUG: Validating session for required step {required_step}")
-        patient_data = load_patient_data()
+        logger.debug("Validating session for required step %s", required_step)
+        # Read-only view: memoized for the request and dropped when patient data is written,
+        # so repeat checks in one request don't re-read the file and never see stale data
+        patient_data = load_patient_data_readonly()
         if not patient_data:
-            print(f"ERROR: Session validation failed: no patient data found")
-            print(f"DEBUG: Session ID: {session.get('session_id', 'No session ID')}")
+            logger.warning("Session validation failed: no patient data found")
+            logger.debug("Session ID: %s", session.get('session_id', 'No session ID'))
             return False
         
         current_step = patient_data.get('step_completed', 0)
         result = current_step >= required_step
-        print(f"DEBUG: Session validation for step {required_step}: {result} (current step: {current_step})")
-        print(f"DEBUG: Patient data keys: {list(patient_data.keys())}")
+        logger.debug("Session validation for step %s: %s (current step: %s)", required_step, result, current_step)
+        logger.debug("Patient data keys: %s", list(patient_data.keys()))
         return result
     except Exception as e:
-        print(f"ERROR: Error in validate_session_step: {str(e)}")
+        logger.error("Error in validate_session_step: %s", e)
         import traceback
         traceback.print_exc()
         return False
@@ -520,11 +982,14 @@ def update_llm_timestamp(step_number):
     except Exception as e:
         print(f"Error updating LLM timestamp for step {step_number}: {str(e)}")
 
-def call_gpt4(prompt, context_data=None):
-    """Call GPT-4 API with medical expertise"""
+def call_gpt4(prompt, context_data=None, timeout=None):
+    """Call GPT-4 API with medical expertise
+
+    timeout: optional per-request timeout in seconds, overriding the client default.
+    """
     try:
         # Load system prompt from external file
-        system_prompt = load_prompt("medical_assistant_system")
+        system_prompt = load_prompt_cached("medical_assistant_system")
 
         messages = [
             {"role": "system", "content": system_prompt},
@@ -545,16 +1010,17 @@ def call_gpt4(prompt, context_data=None):
         print(f"DEBUG: Using API key: {api_key[:15]}...{api_key[-4:]}")
         print(f"Making API call to GPT-4 with {len(messages)} messages")
         
-        # Create a fresh OpenAI client to ensure we're using the correct API key
-        from openai import OpenAI
-        fresh_client = OpenAI(api_key=api_key)
+        # Use a client for the current API key (cached, sharing the connection pool)
+        fresh_client = get_openai_client(api_key)
         
         # Use the new OpenAI API format (v1.0.0+)
+        request_options = {'timeout': timeout} if timeout else {}
         response = fresh_client.chat.completions.create(
             model="gpt-4.1-nano",
             messages=messages,
             max_tokens=2000,
-            temperature=0.3
+            temperature=0.3,
+            **request_options
         )
         
         result = response.choices[0].message.content
@@ -835,7 +1301,7 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
         
         # Migrate old data structure to new step-based structure (backward compatibility)
         if 'case_category' in patient_data and 'step1' not in patient_data:
-            print("🔄 Migrating old data structure to new step-based format...")
+            logger.debug("Migrating old data structure to new step-based format...")
             # Move old data to appropriate steps
             old_case_category = patient_data.pop('case_category', {})
             old_registration = patient_data.pop('registration', {})
@@ -870,19 +1336,19 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
         
         def is_valid_value(value, field_name=None):
             """Check if a value should be saved (not None, not empty string, not just whitespace, not 'none' values for certain fields)"""
-            print(f"🔍 is_valid_value called: field='{field_name}', value='{value}'")
+            logger.debug("is_valid_value called: field='%s', value='%s'", field_name, value)
             
             if value is None:
-                print(f"❌ REJECTED: {field_name} - value is None")
+                logger.debug("REJECTED: %s - value is None", field_name)
                 return False
             if isinstance(value, str):
                 # Convert to lowercase for comparison
                 clean_value = value.strip().lower()
-                print(f"🔤 Cleaned value: '{clean_value}'")
+                logger.debug("Cleaned value: '%s'", clean_value)
                 
                 # Don't save empty strings or whitespace
                 if not clean_value:
-                    print(f"❌ REJECTED: {field_name} - empty string")
+                    logger.debug("REJECTED: %s - empty string", field_name)
                     return False
                 
                 # Field-specific filtering for medical conditions that use "none"/"no" to indicate absence
@@ -893,53 +1359,53 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
                 ]
                 
                 if field_name and field_name in text_input_medical_fields:
-                    print(f"🏥 Text medical field detected: {field_name}")
+                    logger.debug("Text medical field detected: %s", field_name)
                     # For text input medical condition fields, "none", "no", "normal" etc. mean "no condition present"
                     if clean_value in ['none', 'no', 'normal', 'n/a', 'na', 'not applicable', 'nil', 'nothing']:
-                        print(f"❌ REJECTED: {field_name} - medical condition 'none' value: '{clean_value}'")
+                        logger.debug("REJECTED: %s - medical condition 'none' value: '%s'", field_name, clean_value)
                         return False
                 
                 # Special handling for ECG availability
                 if field_name == 'ecg_available' and clean_value == 'no':
-                    print(f"✅ ACCEPTED: {field_name} - ECG 'no' is valid")
+                    logger.debug("ACCEPTED: %s - ECG 'no' is valid", field_name)
                     # For ECG availability, "no" is a valid response meaning "ECG not available"
                     return True
                     
             if isinstance(value, dict) and not value:
-                print(f"❌ REJECTED: {field_name} - empty dict")
+                logger.debug("REJECTED: %s - empty dict", field_name)
                 return False
             if isinstance(value, list) and not value:
-                print(f"❌ REJECTED: {field_name} - empty list")
+                logger.debug("REJECTED: %s - empty list", field_name)
                 return False
             
-            print(f"✅ ACCEPTED: {field_name} - value passed all checks")
+            logger.debug("ACCEPTED: %s - value passed all checks", field_name)
             return True
         
         # Clean and filter form data - only save valid values
         cleaned_form_data = {}
         for key, value in form_data.items():
-            print(f"🔍 FILTERING: {key} = '{value}'")
+            logger.debug("FILTERING: %s = '%s'", key, value)
             if is_valid_value(value, key):
                 cleaned_form_data[key] = clean_value(value)
-                print(f"✅ KEPT: {key} = '{clean_value(value)}'")
+                logger.debug("KEPT: %s = '%s'", key, clean_value(value))
             else:
-                print(f"❌ REMOVED: {key} = '{value}' (filtered out by is_valid_value)")
+                logger.debug("REMOVED: %s = '%s' (filtered out by is_valid_value)", key, value)
         
-        print(f"📝 FINAL CLEANED DATA: {cleaned_form_data}")
+        logger.debug("FINAL CLEANED DATA: %s", cleaned_form_data)
         
         # Clean and filter AI data - only save valid values
         cleaned_ai_data = {}
         if ai_data:
-            print(f"🔍 DEBUG: Processing ai_data with keys: {list(ai_data.keys())}")
+            logger.debug("Processing ai_data with keys: %s", list(ai_data.keys()))
             for key, value in ai_data.items():
-                print(f"🔍 DEBUG: Processing ai_data field: {key} = {value}")
+                logger.debug("Processing ai_data field: %s = %s", key, value)
                 if is_valid_value(value, key):
                     cleaned_ai_data[key] = clean_value(value)
-                    print(f"✅ DEBUG: Kept ai_data field: {key}")
+                    logger.debug("Kept ai_data field: %s", key)
                 else:
-                    print(f"❌ DEBUG: Rejected ai_data field: {key}")
+                    logger.debug("Rejected ai_data field: %s", key)
         else:
-            print(f"⚠️ DEBUG: No ai_data provided to save")
+            logger.debug("No ai_data provided to save")
         
         # Clean and filter files data - only save valid values
         cleaned_files_data = {}
@@ -948,10 +1414,10 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
                 if is_valid_value(value, key):
                     cleaned_files_data[key] = value
         
-        print(f"📝 OVERWRITE MODE - Step {step_number} data being completely replaced")
-        print(f"   Form fields being saved: {list(cleaned_form_data.keys())}")
-        print(f"   AI fields being saved: {list(cleaned_ai_data.keys())}")
-        print(f"   File fields being saved: {list(cleaned_files_data.keys())}")
+        logger.debug("OVERWRITE MODE - Step %s data being completely replaced", step_number)
+        logger.debug("Form fields being saved: %s", list(cleaned_form_data.keys()))
+        logger.debug("AI fields being saved: %s", list(cleaned_ai_data.keys()))
+        logger.debug("File fields being saved: %s", list(cleaned_files_data.keys()))
         
         # Update session metadata
         patient_data['session_info']['last_updated'] = datetime.now().isoformat()
@@ -974,7 +1440,7 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
                 'data_source': 'user_input',
                 'step_completed': True
             }
-            print(f"✅ Step 1 data completely overwritten")
+            logger.debug("Step 1 data completely overwritten")
         
         # STEP 2: Patient Registration
         elif step_number == 2:
@@ -988,7 +1454,7 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
                 'data_source': 'user_input_and_extraction',
                 'step_completed': True
             }
-            print(f"✅ Step 2 data completely overwritten")
+            logger.debug("Step 2 data completely overwritten")
         
         # STEP 3: Vital Signs and Medical Photos
         elif step_number == 3:
@@ -998,7 +1464,7 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
                 for img_data in custom_medical_images:
                     if isinstance(img_data, dict) and img_data.get('filename'):
                         cleaned_custom_images.append(img_data)
-                print(f"📸 Processed {len(cleaned_custom_images)} custom medical images")
+                logger.debug("Processed %s custom medical images", len(cleaned_custom_images))
             
             # Completely replace step3 data with new data (overwrite mode)
             patient_data['step3'] = {
@@ -1011,7 +1477,7 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
                 'data_source': 'user_input_and_analysis',
                 'step_completed': True
             }
-            print(f"✅ Step 3 data completely overwritten with {len(cleaned_custom_images)} custom medical images")
+            logger.debug("Step 3 data completely overwritten with %s custom medical images", len(cleaned_custom_images))
         
         # STEP 4: Medical Records, Contact & Medications
         elif step_number == 4:
@@ -1025,7 +1491,7 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
                 'data_source': 'user_input_and_analysis',
                 'step_completed': True
             }
-            print(f"✅ Step 4 data completely overwritten")
+            logger.debug("Step 4 data completely overwritten")
         
         # STEP 5: Complaints and Symptoms
         elif step_number == 5:
@@ -1039,7 +1505,7 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
                 'data_source': 'user_input_and_ai_analysis',
                 'step_completed': True
             }
-            print(f"✅ Step 5 data completely overwritten")
+            logger.debug("Step 5 data completely overwritten")
         
         # STEP 6: Analysis and Diagnosis
         elif step_number == 6:
@@ -1053,7 +1519,7 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
                 'data_source': 'ai_analysis',
                 'step_completed': True
             }
-            print(f"✅ Step 6 data completely overwritten")
+            logger.debug("Step 6 data completely overwritten")
         
         # STEP 7: ICD11 Code Generation and Analysis
         elif step_number == 7:
@@ -1065,10 +1531,10 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
             merged_form_data = existing_form_data.copy()
             merged_form_data.update(cleaned_form_data)
             
-            print(f"🔄 Step 7 - Merging form data:")
-            print(f"   Existing: {list(existing_form_data.keys())}")
-            print(f"   New: {list(cleaned_form_data.keys())}")
-            print(f"   Merged: {list(merged_form_data.keys())}")
+            logger.debug("Step 7 - Merging form data:")
+            logger.debug("Existing: %s", list(existing_form_data.keys()))
+            logger.debug("New: %s", list(cleaned_form_data.keys()))
+            logger.debug("Merged: %s", list(merged_form_data.keys()))
             
             patient_data['step7'] = {
                 'step_name': 'ICD11 Code Generation & Analysis',
@@ -1079,7 +1545,7 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
                 'data_source': 'icd_generation',
                 'step_completed': True
             }
-            print(f"✅ Step 7 data merged successfully")
+            logger.debug("Step 7 data merged successfully")
         
         # Update step completion status
         step_key = f'step{step_number}'
@@ -1094,22 +1560,24 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
         # Update the step_completed field that validate_session_step checks
         current_step_completed = patient_data.get('step_completed', 0)
         patient_data['step_completed'] = max(current_step_completed, step_number)
-        print(f"✅ Updated step_completed to {patient_data['step_completed']}")
+        logger.debug("Updated step_completed to %s", patient_data['step_completed'])
         
         # Save to file with overwrite protection
         success = save_patient_data(patient_data)
         if success:
-            print(f"✅ Step-based data saved successfully for step {step_number}")
-            print(f"   📋 Form fields: {len(cleaned_form_data)}")
-            print(f"   🤖 AI fields: {len(cleaned_ai_data)}")
-            print(f"   📎 Files: {len(cleaned_files_data)}")
+            if step_number == 2:
+                session['patient_context'] = build_patient_context(patient_data['step2'].get('form_data', {}))
+            logger.debug("Step-based data saved successfully for step %s", step_number)
+            logger.debug("Form fields: %s", len(cleaned_form_data))
+            logger.debug("AI fields: %s", len(cleaned_ai_data))
+            logger.debug("Files: %s", len(cleaned_files_data))
             return True
         else:
-            print(f"❌ Failed to save step-based data for step {step_number}")
+            logger.error("Failed to save step-based data for step %s", step_number)
             return False
             
     except Exception as e:
-        print(f"❌ Error in save_step_based_patient_data: {str(e)}")
+        logger.error("Error in save_step_based_patient_data: %s", e)
         import traceback
         traceback.print_exc()
         return False
@@ -1117,8 +1585,12 @@ def save_step_based_patient_data(step_number, form_data, ai_data=None, files_dat
 def get_step_data(step_number):
     """
     Retrieve data for a specific step from the step-based structure
+    Steps 1-6 are served from the per-request get_all_patient_data() memo.
     """
     try:
+        if 1 <= step_number <= 6:
+            return get_all_patient_data().get('steps', {}).get(f'step{step_number}', {})
+        
         patient_data = load_patient_data()
         if not patient_data:
             return {}
@@ -1134,8 +1606,20 @@ def get_step_data(step_number):
 
 def get_all_patient_data():
     """
-    Retrieve all patient data in organized step-based format
+    Retrieve all patient data in organized step-based format.
+    The result is memoized for the current request and dropped whenever patient data is written.
     """
+    if 'all_patient_data' not in g:
+        g.all_patient_data = _load_all_patient_data()
+    return g.all_patient_data
+
+def invalidate_request_patient_data():
+    """Drop the per-request get_all_patient_data() and load_patient_data_readonly() memos after a write"""
+    if has_app_context():
+        g.pop('all_patient_data', None)
+        g.pop('patient_data_readonly', None)
+
+def _load_all_patient_data():
     try:
         patient_data = load_patient_data()
         if not patient_data:
@@ -1158,6 +1642,27 @@ def get_all_patient_data():
         print(f"Error retrieving all patient data: {str(e)}")
         return {}
 
+def build_patient_context(step2_form_data):
+    """Return the name/age/gender summary shown on later steps, from step2 form data"""
+    return {
+        'name': step2_form_data.get('full_name', 'Patient'),
+        'age': step2_form_data.get('calculated_age', 'Unknown'),
+        'gender': step2_form_data.get('gender', 'Unknown')
+    }
+
+def get_patient_context():
+    """
+    Return the patient name/age/gender summary.
+    It is stored in the session when step 2 is saved; older sessions rebuild it once from step2 data.
+    """
+    context = session.get('patient_context')
+    if context is None:
+        step2_form_data = get_all_patient_data().get('steps', {}).get('step2', {}).get('form_data', {})
+        context = build_patient_context(step2_form_data)
+        if step2_form_data:
+            session['patient_context'] = context
+    return context
+
 def save_comprehensive_patient_data(step_number, form_data, ai_data=None, files_data=None):
     """
     Legacy function that now calls the new step-based save function
@@ -1310,6 +1815,10 @@ def panelist_dashboard():
         print(f"❌ Error fetching cases for panelist: {e}")
         return render_template('p_step1.html', cases=[], error="Failed to load cases")
 
+# Short-lived cache of parsed case records for the panelist case view, so
+# back-to-back refreshes of /p_step2 skip the DB query and JSON parse
+case_details_cache = TTLCache(maxsize=1024, ttl=30)
+
 @app.route('/p_step2/<case_number>')
 @login_required
 def view_case_details(case_number):
@@ -1319,8 +1828,14 @@ def view_case_details(case_number):
         return redirect('/dashboard')
     
     try:
-        connection = get_sqlite_connection()
-        if connection:
+        cached = case_details_cache.get(case_number)
+        if cached:
+            case_data, case_details = cached
+        else:
+            connection = get_sqlite_connection()
+            if not connection:
+                return render_template('p_step2.html', error="Database connection failed", case_number=case_number)
+            
             cursor = connection.cursor()
             
             # Fetch the specific case
@@ -1338,62 +1853,60 @@ def view_case_details(case_number):
             
             # Parse the case details
             try:
-                import json
                 case_details = json.loads(case_data[2])
-                
-                # Format the created date
-                created_date = case_data[3] if case_data[3] else 'Unknown'
-                if created_date != 'Unknown':
-                    try:
-                        from datetime import datetime
-                        if 'T' in created_date:
-                            dt = datetime.fromisoformat(created_date.replace('Z', '+00:00'))
-                        else:
-                            dt = datetime.strptime(created_date, '%Y-%m-%d %H:%M:%S')
-                        created_date = dt.strftime('%Y-%m-%d %H:%M')
-                    except:
-                        created_date = str(case_data[3])[:16]
-                
-                # Extract structured data for display
-                case_info = {
-                    'case_number': case_data[0],
-                    'status': case_data[1],
-                    'created_date': created_date,
-                    'raw_details': case_details,
-                    # Clinical summary - try AI generated first, then fall back to form data
-                    'clinical_summary': (
-                        case_details.get('ai_generated_data', {}).get('clinical_summary') or 
-                        case_details.get('form_data', {}).get('clinical_summary_edited') or 
-                        case_details.get('ai_generated_data', {}).get('original_clinical_summary') or
-                        'No clinical summary available'
-                    ),
-                    'icd_codes': case_details.get('ai_generated_data', {}).get('icd_codes_generated', []),
-                    'elimination_history': case_details.get('ai_generated_data', {}).get('elimination_history', []),
-                    'lab_tests': case_details.get('ai_generated_data', {}).get('recommended_lab_tests', []),
-                    # Patient summary - try AI generated first, then build from available data
-                    'patient_summary': (
-                        case_details.get('ai_generated_data', {}).get('patient_data_summary') or 
-                        build_patient_summary_fallback(case_details) or
-                        'Patient summary not available - please review individual sections'
-                    ),
-                    'differential_questions': case_details.get('ai_generated_data', {}).get('differential_questions', []),
-                    # Contact information - check both form_data and top-level
-                    'patient_email': case_details.get('form_data', {}).get('patient_email') or case_details.get('patient_email', 'Not provided'),
-                    'patient_phone': case_details.get('form_data', {}).get('patient_phone') or case_details.get('patient_phone', 'Not provided'),
-                    'referring_doctor_id': case_details.get('form_data', {}).get('referring_doctor_id') or case_details.get('referring_doctor_id', 'Not available'),
-                    'referring_doctor_name': case_details.get('form_data', {}).get('referring_doctor_name') or case_details.get('referring_doctor_name', 'Not available'),
-                    'referring_doctor_phone': case_details.get('form_data', {}).get('referring_doctor_phone') or case_details.get('referring_doctor_phone', 'Not provided'),
-                    'referring_doctor_email': case_details.get('form_data', {}).get('referring_doctor_email') or case_details.get('referring_doctor_email', 'Not provided'),
-                    'referring_doctor_details': case_details.get('form_data', {}).get('referring_doctor_details') or case_details.get('referring_doctor_details', {})
-                }
-                
-                return render_template('p_step2.html', case=case_info)
-                
             except json.JSONDecodeError as e:
                 print(f"❌ Error parsing case details JSON: {e}")
                 return render_template('p_step2.html', error="Failed to parse case details", case_number=case_number)
-        else:
-            return render_template('p_step2.html', error="Database connection failed", case_number=case_number)
+            
+            case_details_cache.set(case_number, (tuple(case_data), case_details))
+        
+        # Format the created date
+        created_date = case_data[3] if case_data[3] else 'Unknown'
+        if created_date != 'Unknown':
+            try:
+                from datetime import datetime
+                if 'T' in created_date:
+                    dt = datetime.fromisoformat(created_date.replace('Z', '+00:00'))
+                else:
+                    dt = datetime.strptime(created_date, '%Y-%m-%d %H:%M:%S')
+                created_date = dt.strftime('%Y-%m-%d %H:%M')
+            except:
+                created_date = str(case_data[3])[:16]
+        
+        # Extract structured data for display
+        case_info = {
+            'case_number': case_data[0],
+            'status': case_data[1],
+            'created_date': created_date,
+            'raw_details': case_details,
+            # Clinical summary - try AI generated first, then fall back to form data
+            'clinical_summary': (
+                case_details.get('ai_generated_data', {}).get('clinical_summary') or 
+                case_details.get('form_data', {}).get('clinical_summary_edited') or 
+                case_details.get('ai_generated_data', {}).get('original_clinical_summary') or
+                'No clinical summary available'
+            ),
+            'icd_codes': case_details.get('ai_generated_data', {}).get('icd_codes_generated', []),
+            'elimination_history': case_details.get('ai_generated_data', {}).get('elimination_history', []),
+            'lab_tests': case_details.get('ai_generated_data', {}).get('recommended_lab_tests', []),
+            # Patient summary - try AI generated first, then build from available data
+            'patient_summary': (
+                case_details.get('ai_generated_data', {}).get('patient_data_summary') or 
+                build_patient_summary_fallback(case_details) or
+                'Patient summary not available - please review individual sections'
+            ),
+            'differential_questions': case_details.get('ai_generated_data', {}).get('differential_questions', []),
+            # Contact information - check both form_data and top-level
+            'patient_email': case_details.get('form_data', {}).get('patient_email') or case_details.get('patient_email', 'Not provided'),
+            'patient_phone': case_details.get('form_data', {}).get('patient_phone') or case_details.get('patient_phone', 'Not provided'),
+            'referring_doctor_id': case_details.get('form_data', {}).get('referring_doctor_id') or case_details.get('referring_doctor_id', 'Not available'),
+            'referring_doctor_name': case_details.get('form_data', {}).get('referring_doctor_name') or case_details.get('referring_doctor_name', 'Not available'),
+            'referring_doctor_phone': case_details.get('form_data', {}).get('referring_doctor_phone') or case_details.get('referring_doctor_phone', 'Not provided'),
+            'referring_doctor_email': case_details.get('form_data', {}).get('referring_doctor_email') or case_details.get('referring_doctor_email', 'Not provided'),
+            'referring_doctor_details': case_details.get('form_data', {}).get('referring_doctor_details') or case_details.get('referring_doctor_details', {})
+        }
+        
+        return render_template('p_step2.html', case=case_info)
             
     except Exception as e:
         print(f"❌ Error fetching case details: {e}")
@@ -1436,25 +1949,25 @@ def step1():
 @login_required
 def save_case_category():
     try:
-        print("✅ Starting save_case_category")
-        print(f"   Session before initialize: {session.get('session_id', 'NO SESSION')}")
+        logger.debug("Starting save_case_category")
+        logger.debug("Session before initialize: %s", session.get('session_id', 'NO SESSION'))
         
         initialize_session()
         
-        print(f"   Session after initialize: {session.get('session_id', 'NO SESSION')}")
+        logger.debug("Session after initialize: %s", session.get('session_id', 'NO SESSION'))
         
         # Get request data
-        data = request.get_json()
-        print(f"   Request data: {data}")
+        data = request.get_json(cache=False)
+        logger.debug("Request data: %s", data)
         
         case_category = data.get('case_category')
         case_description = data.get('case_description', '')
         
-        print(f"   Case category: {case_category}")
-        print(f"   Case description: {case_description}")
+        logger.debug("Case category: %s", case_category)
+        logger.debug("Case description: %s", case_description)
         
         if not case_category or case_category not in ['accident', 'illness']:
-            print(f"❌ Invalid case category: {case_category}")
+            logger.warning("Invalid case category: %s", case_category)
             return jsonify({'success': False, 'error': 'Invalid case category selected'})
         
         # Prepare form data for step-based saving
@@ -1463,10 +1976,10 @@ def save_case_category():
             'case_description': case_description if case_description else ''
         }
         
-        print(f"   Form data prepared: {form_data}")
+        logger.debug("Form data prepared: %s", form_data)
         
         # Use new step-based save function
-        print("   Calling save_step_based_patient_data...")
+        logger.debug("Calling save_step_based_patient_data...")
         success = save_step_based_patient_data(
             step_number=1,
             form_data=form_data,
@@ -1474,10 +1987,10 @@ def save_case_category():
             files_data={}
         )
         
-        print(f"   Save result: {success}")
+        logger.debug("Save result: %s", success)
         
         if not success:
-            print("❌ save_step_based_patient_data returned False")
+            logger.error("save_step_based_patient_data returned False")
             return jsonify({'success': False, 'error': 'Failed to save case category data'})
         
         # Keep minimal data in session for navigation
@@ -1486,13 +1999,11 @@ def save_case_category():
         session['patient_data']['step_completed'] = 1
         session.modified = True
         
-        print(f"✅ Case category saved successfully: {case_category}")
+        logger.debug("Case category saved successfully: %s", case_category)
         return jsonify({'success': True, 'message': 'Case category saved successfully'})
         
     except Exception as e:
-        print(f"❌ Error in save_case_category: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in save_case_category")
         return jsonify({'success': False, 'error': f'Failed to save case category: {str(e)}'})
 
 def invalidate_downstream_steps(from_step):
@@ -1605,7 +2116,7 @@ def categorize_step2_data(form_data):
 @app.route('/save_registration', methods=['POST'])
 def save_registration():
     try:
-        print("✅ Starting save_registration")
+        logger.debug("Starting save_registration")
         initialize_session()
         
         # Validate that Step 1 (case category) is completed
@@ -1635,8 +2146,9 @@ def save_registration():
             if value:  # Only store non-empty values
                 form_data[field] = value.strip()
         
-        # Handle file uploads
+        # Handle file uploads (all files in this request share one upload timestamp)
         files_data = {}
+        upload_timestamp = datetime.now().isoformat()
         file_fields = ['aadhar_front', 'aadhar_back', 'aadhar_combined', 'insurance_doc', 'vaccine_doc', 'health_card']
         for field in file_fields:
             if field in request.files:
@@ -1644,22 +2156,23 @@ def save_registration():
                 if file and file.filename:
                     files_data[field] = {
                         'filename': file.filename,
-                        'upload_timestamp': datetime.now().isoformat(),
+                        'upload_timestamp': upload_timestamp,
                         'field_name': field,
                         'content_type': getattr(file, 'content_type', 'unknown')
                     }
-                    print(f"📎 File uploaded for {field}: {file.filename}")
+                    logger.debug("File uploaded for %s: %s", field, file.filename)
         
         # Collect AI data (like Aadhaar extraction, EMR analysis)
         ai_data = {}
-        if 'aadhaar_extraction' in session.get('patient_data', {}).get('registration', {}):
-            ai_data['aadhaar_extraction'] = session['patient_data']['registration']['aadhaar_extraction']
-        if 'emr_insights' in session.get('patient_data', {}).get('registration', {}):
-            ai_data['emr_insights'] = session['patient_data']['registration']['emr_insights']
+        legacy_registration = session.get('patient_data', {}).get('registration', {})
+        for field in ('aadhaar_extraction', 'emr_insights'):
+            value = get_session_artifact(field, legacy_registration.get(field))
+            if value is not None:
+                ai_data[field] = value
         
-        print(f"📋 Registration data collected: {len(form_data)} form fields")
-        print(f"📎 Files uploaded: {len(files_data)}")
-        print(f"🤖 AI data collected: {len(ai_data)}")
+        logger.debug("Registration data collected: %d form fields", len(form_data))
+        logger.debug("Files uploaded: %d", len(files_data))
+        logger.debug("AI data collected: %d", len(ai_data))
         
         # Use new step-based save function
         success = save_step_based_patient_data(
@@ -1682,7 +2195,7 @@ def save_registration():
         session['patient_data']['step_completed'] = 2
         session.modified = True
         
-        print("✅ Registration saved successfully")
+        logger.debug("Registration saved successfully")
         return jsonify({
             'success': True, 
             'message': 'Registration completed successfully',
@@ -1692,7 +2205,7 @@ def save_registration():
         })
         
     except Exception as e:
-        print(f"❌ Error in save_registration: {str(e)}")
+        logger.exception("Error in save_registration")
         return jsonify({'success': False, 'error': f'Failed to save registration: {str(e)}'})
 
 # Helper function to get diagnosis-relevant data from Step 1
@@ -1715,24 +2228,22 @@ def analyze_emr():
         if file.filename == '':
             return jsonify({'success': False, 'error': 'No file selected'})
         
-        # Read file content
-        file_content = file.read()
+        # Validate file type before reading the upload
         file_type = file.content_type
-        
-        # Encode file content for API
         if file_type.startswith('image/'):
-            # For images, use base64 encoding
-            encoded_content = base64.b64encode(file_content).decode('utf-8')
             content_type = "image"
         elif file_type == 'application/pdf':
-            # For PDFs, use base64 encoding (OpenAI can handle PDF analysis)
-            encoded_content = base64.b64encode(file_content).decode('utf-8')
             content_type = "pdf"
         else:
             return jsonify({'success': False, 'error': 'Unsupported file type'})
         
+        # Read file content and base64-encode it for the API
+        # (OpenAI can handle both image and PDF analysis)
+        file_content = file.read()
+        encoded_content = b64encode_to_str(file_content)
+        
         # Prepare LLM prompt for EMR analysis
-        prompt = load_prompt("emr_analysis")
+        prompt = load_prompt_cached("emr_analysis")
 
         # Make API call to OpenAI
         response = openai_client.chat.completions.create(
@@ -1740,7 +2251,7 @@ def analyze_emr():
             messages=[
                 {
                     "role": "system", 
-                    "content": load_prompt("emr_system")
+                    "content": load_prompt_cached("emr_system")
                 },
                 {
                     "role": "user",
@@ -1761,15 +2272,8 @@ def analyze_emr():
         
         insights = response.choices[0].message.content.strip()
         
-        # Store abbreviated EMR insights to reduce session size
-        if 'patient_data' not in session:
-            session['patient_data'] = {}
-        if 'registration' not in session['patient_data']:
-            session['patient_data']['registration'] = {}
-        
-        # Store only abbreviated insights to avoid session size issues
-        abbreviated_insights = insights[:300] + "..." if len(insights) > 300 else insights
-        session['patient_data']['registration']['emr_insights'] = abbreviated_insights
+        # Store EMR insights server-side for save_registration
+        store_session_artifact('emr_insights', insights)
         
         return jsonify({
             'success': True,
@@ -1794,19 +2298,19 @@ def process_aadhaar():
         if file.filename == '':
             return jsonify({'success': False, 'error': 'No file selected'})
         
-        # Read file content
-        file_content = file.read()
+        # Validate file type (only images) before reading the upload
         file_type = file.content_type
-        
-        # Validate file type (only images)
         if not file_type.startswith('image/'):
             return jsonify({'success': False, 'error': 'Please upload a valid image file (JPG, PNG, etc.)'})
         
+        # Read file content
+        file_content = file.read()
+        
         # Encode image content for API
-        encoded_content = base64.b64encode(file_content).decode('utf-8')
+        encoded_content = b64encode_to_str(file_content)
         
         # Prepare LLM prompt for Aadhaar analysis
-        prompt = load_prompt("aadhaar_analysis")
+        prompt = load_prompt_cached("aadhaar_analysis")
 
         # Make API call to OpenAI for Aadhaar analysis
         response = openai_client.chat.completions.create(
@@ -1814,7 +2318,7 @@ def process_aadhaar():
             messages=[
                 {
                     "role": "system", 
-                    "content": load_prompt("aadhaar_system")
+                    "content": load_prompt_cached("aadhaar_system")
                 },
                 {
                     "role": "user",
@@ -1855,14 +2359,8 @@ def process_aadhaar():
             extraction_result = json.loads(json_content)
             
             if extraction_result.get('success'):
-                # Store Aadhaar data in session
-                if 'patient_data' not in session:
-                    session['patient_data'] = {}
-                if 'registration' not in session['patient_data']:
-                    session['patient_data']['registration'] = {}
-                
-                session['patient_data']['registration']['aadhaar_extraction'] = extraction_result['extracted_data']
-                session.modified = True
+                # Store Aadhaar data server-side for save_registration
+                store_session_artifact('aadhaar_extraction', extraction_result['extracted_data'])
                 
                 return jsonify(extraction_result)
             else:
@@ -1885,6 +2383,37 @@ def process_aadhaar():
             'error': f'Error processing Aadhaar card: {str(e)}'
         })
 
+# Most insurance PDF pages OCR'd at once per request, so one large document can't occupy
+# the whole shared LLM pool (or hold every rendered page in memory)
+PDF_OCR_MAX_CONCURRENCY = int(os.getenv('PDF_OCR_MAX_CONCURRENCY', '4'))
+
+def ocr_pdf_page(page_png):
+    """OCR one rendered PDF page (PNG bytes) with the vision model (runs on llm_call_pool)"""
+    ocr_response = openai_client.chat.completions.create(
+        model="gpt-4.1-nano",  # Best model for comprehensive OCR
+        messages=[
+            {
+                "role": "system",
+                "content": load_prompt_cached("pdf_ocr_system")
+            },
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": load_prompt_cached("pdf_ocr_analysis")},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/png;base64,{b64encode_to_str(page_png)}"
+                        }
+                    }
+                ]
+            }
+        ],
+        max_tokens=2000,
+        temperature=0.0  # Minimum temperature for maximum accuracy
+    )
+    return ocr_response.choices[0].message.content.strip()
+
 @app.route('/process_insurance_pdf', methods=['POST'])
 def process_insurance_pdf():
     """Process uploaded insurance PDF document and extract ALL text using best model"""
@@ -1896,14 +2425,14 @@ def process_insurance_pdf():
         if file.filename == '':
             return jsonify({'success': False, 'error': 'No file selected'})
         
-        # Read file content
-        file_content = file.read()
+        # Validate file type (PDF or images) before reading the upload
         file_type = file.content_type
-        
-        # Validate file type (PDF or images)
         if not (file_type == 'application/pdf' or file_type.startswith('image/')):
             return jsonify({'success': False, 'error': 'Please upload a valid PDF file or image'})
         
+        # Read file content
+        file_content = file.read()
+        
         # Handle PDF files with comprehensive text extraction
         if file_type == 'application/pdf':
             try:
@@ -1928,48 +2457,31 @@ def process_insurance_pdf():
                     
                     pdf_document = fitz.open(stream=file_content, filetype="pdf")
                     
-                    for page_num in range(len(pdf_document)):
-                        page = pdf_document.load_page(page_num)
-                        # Convert page to image
-                        mat = fitz.Matrix(2.0, 2.0)  # High resolution
-                        pix = page.get_pixmap(matrix=mat)
-                        img_data = pix.tobytes("png")
-                        
-                        # Encode image for GPT-4o
-                        encoded_image = base64.b64encode(img_data).decode('utf-8')
-                        
-                        # Use GPT-4o for comprehensive OCR
-                        ocr_prompt = load_prompt("pdf_ocr_analysis")
-                        
-                        ocr_response = openai_client.chat.completions.create(
-                            model="gpt-4.1-nano",  # Best model for comprehensive OCR
-                            messages=[
-                                {
-                                    "role": "system",
-                                    "content": load_prompt("pdf_ocr_system")
-                                },
-                                {
-                                    "role": "user",
-                                    "content": [
-                                        {"type": "text", "text": ocr_prompt},
-                                        {
-                                            "type": "image_url",
-                                            "image_url": {
-                                                "url": f"data:image/png;base64,{encoded_image}"
-                                            }
-                                        }
-                                    ]
-                                }
-                            ],
-                            max_tokens=2000,
-                            temperature=0.0  # Minimum temperature for maximum accuracy
-                        )
-                        
-                        page_ocr_text = ocr_response.choices[0].message.content.strip()
-                        if page_ocr_text:
-                            embedded_image_text += f"=== PAGE {page_num + 1} (COMPREHENSIVE OCR) ===\n{page_ocr_text}\n\n"
-                    
-                    pdf_document.close()
+                    # Render pages here (a PyMuPDF document is not thread-safe) and OCR them on the
+                    # LLM pool, at most PDF_OCR_MAX_CONCURRENCY at a time, collecting text in page
+                    # order. If a page fails, the pages still queued are cancelled.
+                    pending_pages = deque()
+                    try:
+                        page_count = len(pdf_document)
+                        next_page = 0
+                        while next_page < page_count or pending_pages:
+                            if next_page < page_count and len(pending_pages) < PDF_OCR_MAX_CONCURRENCY:
+                                page = pdf_document.load_page(next_page)
+                                # Convert page to image
+                                mat = fitz.Matrix(2.0, 2.0)  # High resolution
+                                pix = page.get_pixmap(matrix=mat)
+                                next_page += 1
+                                pending_pages.append((next_page, llm_call_pool.submit(ocr_pdf_page, pix.tobytes("png"))))
+                                continue
+                            
+                            page_num, ocr_future = pending_pages.popleft()
+                            page_ocr_text = ocr_future.result()
+                            if page_ocr_text:
+                                embedded_image_text += f"=== PAGE {page_num} (COMPREHENSIVE OCR) ===\n{page_ocr_text}\n\n"
+                    finally:
+                        for _, ocr_future in pending_pages:
+                            ocr_future.cancel()
+                        pdf_document.close()
                     
                 except ImportError:
                     # Fallback if PyMuPDF not available
@@ -1988,19 +2500,13 @@ def process_insurance_pdf():
                     return jsonify({'success': False, 'error': 'Could not extract any text from PDF. Please try with an image version.'})
                 
                 # Store extracted text in patient data
-                patient_data = load_patient_data()
-                if 'registration' not in patient_data:
-                    patient_data['registration'] = {}
-                
-                patient_data['registration']['insurance_extracted_text'] = {
+                update_patient_data_field('registration', 'insurance_extracted_text', {
                     'text': final_text,
                     'extraction_method': 'comprehensive_pdf_ocr',
                     'file_type': 'PDF',
-                    'extracted_at': datetime.now().isoformat(),
+                    'extracted_at': iso_timestamp(),
                     'file_name': file.filename
-                }
-                
-                save_patient_data(patient_data)
+                })
                 
                 return jsonify({
                     'success': True,
@@ -2018,14 +2524,14 @@ def process_insurance_pdf():
             # Handle image files with comprehensive OCR
             encoded_content = base64.b64encode(file_content).decode('utf-8')
             
-            prompt = load_prompt("insurance_ocr_analysis")
+            prompt = load_prompt_cached("insurance_ocr_analysis")
 
             response = openai_client.chat.completions.create(
                 model="gpt-4.1-nano",  # Best model for comprehensive OCR
                 messages=[
                     {
                         "role": "system", 
-                        "content": load_prompt("insurance_ocr_system")
+                        "content": load_prompt_cached("insurance_ocr_system")
                     },
                     {
                         "role": "user",
@@ -2047,19 +2553,13 @@ def process_insurance_pdf():
             result = response.choices[0].message.content.strip()
             
             # Store extracted text in patient data
-            patient_data = load_patient_data()
-            if 'registration' not in patient_data:
-                patient_data['registration'] = {}
-            
-            patient_data['registration']['insurance_extracted_text'] = {
+            update_patient_data_field('registration', 'insurance_extracted_text', {
                 'text': result,
                 'extraction_method': 'comprehensive_image_ocr',
                 'file_type': 'Image',
-                'extracted_at': datetime.now().isoformat(),
+                'extracted_at': iso_timestamp(),
                 'file_name': file.filename
-            }
-            
-            save_patient_data(patient_data)
+            })
             
             return jsonify({
                 'success': True,
@@ -2079,7 +2579,7 @@ def process_insurance_pdf():
 def get_insurance_text():
     """Retrieve saved insurance extracted text"""
     try:
-        patient_data = load_patient_data()
+        patient_data = load_patient_data_readonly()
         
         if 'registration' in patient_data and 'insurance_extracted_text' in patient_data['registration']:
             return jsonify({
@@ -2099,39 +2599,10 @@ def get_insurance_text():
             'error': f'Error retrieving insurance text: {str(e)}'
         })
 
-@app.route('/analyze_medical_photo', methods=['POST'])
-def analyze_medical_photo():
-    """Analyze uploaded medical photos (tongue, throat, skin/infection) using LLM"""
-    try:
-        if 'image' not in request.files:
-            return jsonify({'success': False, 'error': 'No image uploaded'})
-        
-        file = request.files['image']
-        photo_type = request.form.get('photo_type', 'unknown')
-        category = request.form.get('category', photo_type)  # Support Step 3 categories
-        report_type = request.form.get('report_type', '')   # Support Step 3 report types
-        
-        if file.filename == '':
-            return jsonify({'success': False, 'error': 'No file selected'})
-        
-        # Read and encode file content
-        file_content = file.read()
-        file_type = file.content_type
-        
-        # Validate file type (only images)
-        if not file_type.startswith('image/'):
-            return jsonify({'success': False, 'error': 'Please upload a valid image file'})
-        
-        # Encode image content for API
-        encoded_content = base64.b64encode(file_content).decode('utf-8')
-        
-        # Get the appropriate photo analysis prompt from external files
-        if category in ['laboratory', 'medical_image', 'signal']:
-            base_prompt = get_photo_analysis_prompt(category, report_type)
-        else:
-            base_prompt = get_photo_analysis_prompt(photo_type, report_type)
-        
-        full_prompt = f"""
+@lru_cache(maxsize=64)
+def _compose_photo_analysis_prompt(prompt_type, report_type, prompt_mtime):
+    base_prompt = get_photo_analysis_prompt(prompt_type, report_type)
+    return f"""
         {base_prompt}
         
         RESPONSE FORMAT (JSON):
@@ -2157,65 +2628,163 @@ def analyze_medical_photo():
         - Suggest appropriate medical follow-up when needed
         """
 
-        # Make API call to OpenAI for medical photo analysis
+def get_photo_analysis_full_prompt(prompt_type, report_type):
+    """Return the full photo analysis prompt (base prompt + response format) for a photo type/category"""
+    prompt_name = PHOTO_PROMPT_MAPPING.get(prompt_type, 'photo_infection_analysis')
+    return _compose_photo_analysis_prompt(prompt_type, report_type, get_prompt_mtime(prompt_name))
+
+# Externally reachable base URL of this app. When set, images for analysis are handed to
+# OpenAI as short-lived signed URLs instead of being base64-encoded into the request.
+PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL', '').rstrip('/')
+ANALYSIS_IMAGE_URL_MAX_AGE = 10 * 60  # seconds
+analysis_image_signer = URLSafeTimedSerializer(app.secret_key, salt='analysis-image')
+
+def save_image_for_analysis(file, hasher=None):
+    """Save an upload under UPLOADS_DIR and return (signed public URL, bytes written)"""
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    file_extension = os.path.splitext(file.filename)[1].lower() or '.jpg'
+    stored_filename = f"analysis_{uuid.uuid4().hex}{file_extension}"
+    total_bytes = save_upload_stream(file.stream, os.path.join(UPLOADS_DIR, stored_filename), hasher)
+    token = analysis_image_signer.dumps(stored_filename)
+    return f"{PUBLIC_BASE_URL}/analysis_image/{token}", total_bytes
+
+def prepare_image_for_analysis(file, hasher=None):
+    """Return (image URL for the vision API, raw size): a signed URL if PUBLIC_BASE_URL is set, else a data URI"""
+    if PUBLIC_BASE_URL:
+        return save_image_for_analysis(file, hasher)
+    return stream_b64_data_uri(file.stream, file.content_type, hasher)
+
+def run_image_analysis(file, build_prompts, model, max_tokens, temperature, cache_key_parts=(), max_file_size=None):
+    """
+    Run a vision-model analysis of an uploaded image and return (success, result dict).
+
+    The image is encoded (or saved for a signed URL) in the background while
+    build_prompts() composes the (system_prompt, user_prompt) pair. Successful
+    analyses are cached by image hash, cache_key_parts and model. Raises
+    json.JSONDecodeError if the model response cannot be parsed.
+    """
+    image_hasher = hashlib.blake2b(digest_size=16)
+    encode_future = upload_encode_pool.submit(prepare_image_for_analysis, file, image_hasher)
+
+    system_prompt, user_prompt = build_prompts()
+    image_url, file_size = encode_future.result()
+
+    if max_file_size is not None and file_size > max_file_size:
+        return False, {'success': False, 'error': f'File size must be less than {max_file_size // (1024 * 1024)}MB'}
+
+    # Reuse a previous analysis of the same image bytes, prompt settings and model
+    cache_key = (image_hasher.hexdigest(), *cache_key_parts, model)
+    result = image_analysis_cache.get(cache_key)
+    if result is None:
+        started = time.perf_counter()
         response = openai_client.chat.completions.create(
-            model="gpt-4.1-nano",
+            model=model,
             messages=[
                 {
                     "role": "system", 
-                    "content": load_prompt("photo_analysis_system")
+                    "content": system_prompt
                 },
                 {
                     "role": "user",
                     "content": [
-                        {"type": "text", "text": full_prompt},
+                        {"type": "text", "text": user_prompt},
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:{file_type};base64,{encoded_content}"
+                                "url": image_url
                             }
                         }
                     ]
                 }
             ],
-            max_tokens=1000,
-            temperature=0.3  # Lower temperature for more consistent medical analysis
+            max_tokens=max_tokens,
+            temperature=temperature,
+            response_format={"type": "json_object"}
         )
+        logger.debug("Image analysis with %s took %.0f ms", model, (time.perf_counter() - started) * 1000)
+        result = response.choices[0].message.content
+
+    try:
+        # JSON mode guarantees a bare JSON object, so parse it directly
+        analysis_result = json_loads(result)
+    except json.JSONDecodeError:
+        logger.debug("Raw response: %s...", result[:500])
+        raise
+
+    if not analysis_result.get('success'):
+        return False, {
+            'success': False,
+            'error': analysis_result.get('error', 'Failed to analyze medical photo')
+        }
+
+    image_analysis_cache.set(cache_key, result)
+    return True, analysis_result
+
+def abbreviate_photo_insights(insights, max_length=200):
+    """Return a size-bounded summary of photo analysis insights for storing in the session"""
+    def truncate(text):
+        text = str(text)
+        return text[:max_length] + "..." if len(text) > max_length else text
+
+    if not isinstance(insights, dict):
+        return truncate(insights)
+    return {
+        'general_findings': truncate(insights.get('general_findings', '')),
+        'confidence_level': insights.get('confidence_level', ''),
+        'follow_up_needed': truncate(insights.get('follow_up_needed', '')),
+    }
+
+@app.route('/analysis_image/<token>')
+def serve_analysis_image(token):
+    """Serve an uploaded image to the vision API via a short-lived signed token"""
+    try:
+        stored_filename = analysis_image_signer.loads(token, max_age=ANALYSIS_IMAGE_URL_MAX_AGE)
+    except BadSignature:
+        return '', 404
+    return send_from_directory(UPLOADS_DIR, stored_filename)
+
+@app.route('/analyze_medical_photo', methods=['POST'])
+def analyze_medical_photo():
+    """Analyze uploaded medical photos (tongue, throat, skin/infection) using LLM"""
+    try:
+        if 'image' not in request.files:
+            return jsonify({'success': False, 'error': 'No image uploaded'})
         
-        result = response.choices[0].message.content.strip()
+        file = request.files['image']
+        photo_type = request.form.get('photo_type', 'unknown')
+        category = request.form.get('category', photo_type)  # Support Step 3 categories
+        report_type = request.form.get('report_type', '')   # Support Step 3 report types
         
-        # Parse the JSON response
-        if result.startswith('```json'):
-            result = result[7:-3]
-        elif result.startswith('```'):
-            result = result[3:-3]
+        if file.filename == '':
+            return jsonify({'success': False, 'error': 'No file selected'})
         
-        result = result.strip()
+        file_type = file.content_type
         
-        try:
-            # Extract JSON from response
-            json_start = result.find('{')
-            json_end = result.rfind('}') + 1
-            
-            if json_start == -1 or json_end == 0:
-                raise Exception("No valid JSON found in response")
-            
-            json_content = result[json_start:json_end]
-            analysis_result = json.loads(json_content)
+        # Validate file type (only images)
+        if not file_type.startswith('image/'):
+            return jsonify({'success': False, 'error': 'Please upload a valid image file'})
+        
+        def build_prompts():
+            # Get the appropriate photo analysis prompt (composed once per prompt file version)
+            if category in ['laboratory', 'medical_image', 'signal']:
+                full_prompt = get_photo_analysis_full_prompt(category, report_type)
+            else:
+                full_prompt = get_photo_analysis_full_prompt(photo_type, report_type)
+            return load_prompt_cached("photo_analysis_system"), full_prompt
+        
+        try:
+            # Lower temperature for more consistent medical analysis
+            success, analysis_result = run_image_analysis(
+                file, build_prompts, "gpt-4.1-nano", max_tokens=1000, temperature=0.3,
+                cache_key_parts=(photo_type, category, report_type)
+            )
             
-            if analysis_result.get('success'):
-                # Store medical photo analysis in session
-                if 'patient_data' not in session:
-                    session['patient_data'] = {}
-                
+            if success:
+                # Record the medical photo analysis server-side
                 # Handle Step 3 categories differently from Step 2
                 if category in ['laboratory', 'medical_image', 'signal']:
-                    # Step 3: Store minimal data to avoid session size issues
-                    if 'medical_reports_analysis' not in session['patient_data']:
-                        session['patient_data']['medical_reports_analysis'] = []
-                    
-                    # Store only essential metadata, not full analysis to reduce session size
-                    session['patient_data']['medical_reports_analysis'].append({
+                    # Step 3: Store only essential metadata, not the full analysis
+                    append_session_artifact('medical_reports_analysis', {
                         'file_name': file.filename,
                         'category': category,
                         'report_type': report_type,
@@ -2223,22 +2792,13 @@ def analyze_medical_photo():
                         'analyzed_at': datetime.now().isoformat()
                     })
                 else:
-                    # Step 2: Store abbreviated vitals analysis
-                    if 'vitals' not in session['patient_data']:
-                        session['patient_data']['vitals'] = {}
-                    # Store only key points, not full analysis
-                    insights = analysis_result['insights']
-                    abbreviated_insights = insights[:200] + "..." if len(insights) > 200 else insights
-                    session['patient_data']['vitals'][f'{photo_type}_photo_analysis'] = abbreviated_insights
-                
-                session.modified = True
-                
-                return jsonify(analysis_result)
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': analysis_result.get('error', 'Failed to analyze medical photo')
-                })
+                    # Step 2: Store only key points of the vitals photo analysis
+                    store_session_artifact(
+                        f'{photo_type}_photo_analysis',
+                        abbreviate_photo_insights(analysis_result.get('insights', {}))
+                    )
+            
+            return jsonify(analysis_result)
                 
         except json.JSONDecodeError as e:
             print(f"JSON parsing error in medical photo analysis: {str(e)}")
@@ -2258,6 +2818,10 @@ def analyze_medical_photo():
 def analyze_medical_photo_custom():
     """Analyze uploaded medical photos with custom prompts and model selection"""
     try:
+        # Reject oversized uploads before the multipart body is parsed
+        if request.content_length and request.content_length > MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD_ALLOWANCE:
+            return jsonify({'success': False, 'error': 'File size must be less than 10MB'})
+        
         if 'image' not in request.files:
             return jsonify({'success': False, 'error': 'No image uploaded'})
         
@@ -2272,25 +2836,15 @@ def analyze_medical_photo_custom():
             return jsonify({'success': False, 'error': 'Please provide an analysis prompt'})
         
         # Validate selected model
-        available_models = ['gpt-4o', 'gpt-4o-mini', 'gpt-4-turbo', 'gpt-4', 'gpt-3.5-turbo']
-        if selected_model not in available_models:
+        if selected_model not in AVAILABLE_MODELS_SET:
             selected_model = 'gpt-4o-mini'  # Fallback to default
         
-        # Read and encode file content
-        file_content = file.read()
         file_type = file.content_type
         
         # Validate file type (only images)
         if not file_type.startswith('image/'):
             return jsonify({'success': False, 'error': 'Please upload a valid image file'})
         
-        # Validate file size (10MB limit)
-        if len(file_content) > 10 * 1024 * 1024:
-            return jsonify({'success': False, 'error': 'File size must be less than 10MB'})
-        
-        # Encode image content for API
-        encoded_content = base64.b64encode(file_content).decode('utf-8')
-        
         # Create comprehensive medical analysis prompt
         full_prompt = f"""
         You are an expert medical AI assistant analyzing a medical image. The user has provided the following specific analysis request:
@@ -2325,72 +2879,29 @@ def analyze_medical_photo_custom():
         - Include any other medically relevant observations even if not specifically requested
         - If the image quality is poor or unclear, mention this in your assessment
         """
-
-        print(f"Custom medical photo analysis - Model: {selected_model}, Prompt length: {len(custom_prompt)}")
-
-        # Make API call to OpenAI with selected model
-        response = openai_client.chat.completions.create(
-            model=selected_model,
-            messages=[
-                {
-                    "role": "system", 
-                    "content": """You are an expert medical AI assistant specializing in medical image analysis. 
+        system_prompt = """You are an expert medical AI assistant specializing in medical image analysis. 
                     You provide detailed, professional medical observations while being careful not to provide 
                     definitive diagnoses. You focus on what can be visually observed and suggest appropriate 
                     medical follow-up when necessary."""
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": full_prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{file_type};base64,{encoded_content}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=1500,  # Increased for more detailed analysis
-            temperature=0.2   # Lower temperature for more consistent medical analysis
-        )
-        
-        result = response.choices[0].message.content.strip()
-        
-        # Parse the JSON response
-        if result.startswith('```json'):
-            result = result[7:-3]
-        elif result.startswith('```'):
-            result = result[3:-3]
-        
-        result = result.strip()
         
         try:
-            # Extract JSON from response
-            json_start = result.find('{')
-            json_end = result.rfind('}') + 1
+            print(f"Custom medical photo analysis - Model: {selected_model}, Prompt length: {len(custom_prompt)}")
             
-            if json_start == -1 or json_end == 0:
-                raise Exception("No valid JSON found in response")
-            
-            json_content = result[json_start:json_end]
-            analysis_result = json.loads(json_content)
+            # Lower temperature and more tokens for detailed, consistent analysis
+            success, analysis_result = run_image_analysis(
+                file, lambda: (system_prompt, full_prompt), selected_model,
+                max_tokens=1500, temperature=0.2,
+                cache_key_parts=(custom_prompt,), max_file_size=MAX_UPLOAD_SIZE
+            )
             
-            if analysis_result.get('success'):
+            if success:
                 # Analysis completed successfully - return results
                 # Note: Data will be saved when the step3 form is submitted
                 print(f"✅ Custom medical photo analysis completed successfully with {selected_model}")
-                return jsonify(analysis_result)
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': analysis_result.get('error', 'Failed to analyze medical photo')
-                })
+            return jsonify(analysis_result)
                 
         except json.JSONDecodeError as e:
             print(f"JSON parsing error in custom medical photo analysis: {str(e)}")
-            print(f"Raw response: {result[:500]}...")  # Debug: show first 500 chars
             return jsonify({
                 'success': False,
                 'error': 'Failed to parse analysis results. The AI response was not in the expected format. Please try again.'
@@ -2407,20 +2918,10 @@ def analyze_medical_photo_custom():
 def get_available_models():
     """Get list of available AI models for medical analysis"""
     try:
-        # Get models from environment variable
-        available_models_str = os.getenv('AVAILABLE_MODELS', 'gpt-4o,gpt-4o-mini,gpt-4-turbo,gpt-3.5-turbo')
-        print(f"DEBUG: Raw AVAILABLE_MODELS from env: '{available_models_str}'")
-        available_models = [model.strip() for model in available_models_str.split(',')]
-        print(f"DEBUG: Parsed available_models: {available_models}")
-        
-        # Get default model from environment
-        default_model = os.getenv('MODEL', 'gpt-4o-mini')
-        print(f"DEBUG: Default model from env: '{default_model}'")
-        
         return jsonify({
             'success': True,
-            'models': available_models,
-            'default_model': default_model
+            'models': list(AVAILABLE_MODELS),
+            'default_model': DEFAULT_MODEL
         })
     except Exception as e:
         print(f"Error getting available models: {str(e)}")
@@ -2445,33 +2946,29 @@ def upload_medical_image():
         if file.filename == '':
             return jsonify({'success': False, 'error': 'No file selected'})
         
-        # Read and encode file content
-        file_content = file.read()
         file_type = file.content_type
         
         # Validate file type (only images)
         if not file_type.startswith('image/'):
             return jsonify({'success': False, 'error': 'Please upload a valid image file'})
         
-        # Encode to base64 for storage/processing
-        import base64
-        file_data = base64.b64encode(file_content).decode('utf-8')
+        # Save the image to disk; only its metadata goes into the session cookie
+        os.makedirs(UPLOADS_DIR, exist_ok=True)
+        file_extension = os.path.splitext(file.filename)[1].lower() or '.jpg'
+        stored_filename = f"{session.get('session_id', 'unknown')}_{uuid.uuid4().hex[:8]}{file_extension}"
+        image_path = os.path.join(UPLOADS_DIR, stored_filename)
+        image_size = save_upload_stream(file.stream, image_path)
         
-        # Store the uploaded image info in session
-        if 'patient_data' not in session:
-            session['patient_data'] = {}
-        if 'uploaded_images' not in session['patient_data']:
-            session['patient_data']['uploaded_images'] = []
-        
-        session['patient_data']['uploaded_images'].append({
+        # Record the uploaded image server-side
+        append_session_artifact('uploaded_images', {
             'filename': file.filename,
             'type': image_type,
             'description': description,
             'upload_timestamp': datetime.now().isoformat(),
-            'file_data': file_data,
+            'path': image_path,
+            'size': image_size,
             'mime_type': file_type
         })
-        session.modified = True
         
         return jsonify({
             'success': True,
@@ -2486,6 +2983,12 @@ def upload_medical_image():
             'error': f'Error uploading medical image: {str(e)}'
         })
 
+# Unit conversion factors to the stored standard units (kg / cm)
+WEIGHT_TO_KG = {'kg': 1.0, 'lbs': 0.453592}
+HEIGHT_TO_CM = {'cm': 1.0, 'inches': 2.54}
+# Feet/inches heights such as 5'10", 5'10 or 5'
+FEET_INCHES_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*'\s*(\d+(?:\.\d+)?)?\s*\"?\s*$")
+
 @app.route('/save_weight_height', methods=['POST'])
 @login_required
 def save_weight_height():
@@ -2494,7 +2997,7 @@ def save_weight_height():
         print("✅ Starting save_weight_height")
         
         # Get the JSON data
-        data = request.get_json()
+        data = request.get_json(cache=False)
         weight = data.get('weight')
         weight_unit = data.get('weight_unit', 'kg')
         height = data.get('height', '')
@@ -2511,25 +3014,20 @@ def save_weight_height():
             })
         
         # Convert weight to kg for standardization
-        weight_kg = weight
-        if weight_unit == 'lbs':
-            weight_kg = weight * 0.453592
+        weight_kg = weight * WEIGHT_TO_KG.get(weight_unit, 1.0)
         
         # Convert height to cm for standardization
         height_cm = None
         if height:
-            if height_unit == 'cm':
-                height_cm = float(height)
-            elif height_unit == 'inches':
-                height_cm = float(height) * 2.54
+            if height_unit in HEIGHT_TO_CM:
+                height_cm = float(height) * HEIGHT_TO_CM[height_unit]
             elif height_unit == 'ft_in':
                 # Parse feet'inches" format
-                if "'" in str(height) and '"' in str(height):
-                    parts = str(height).replace('"', '').split("'")
-                    if len(parts) == 2:
-                        feet = float(parts[0]) if parts[0] else 0
-                        inches = float(parts[1]) if parts[1] else 0
-                        height_cm = (feet * 12 + inches) * 2.54
+                match = FEET_INCHES_PATTERN.match(str(height))
+                if match:
+                    feet = float(match.group(1))
+                    inches = float(match.group(2) or 0)
+                    height_cm = (feet * 12 + inches) * 2.54
         
         # Prepare weight/height data for storage
         weight_height_data = {
@@ -2539,7 +3037,7 @@ def save_weight_height():
             'height': height,
             'height_unit': height_unit,
             'height_cm': round(height_cm, 2) if height_cm else None,
-            'collected_at': datetime.now().isoformat()
+            'collected_at': iso_timestamp()
         }
         
         print(f"   Standardized - Weight: {weight_kg} kg, Height: {height_cm} cm")
@@ -2576,19 +3074,21 @@ def save_weight_height():
 
 def calculate_age_from_dob(date_of_birth):
     """Calculate age from date of birth string"""
+    if not date_of_birth:
+        return None
+    # Cached per (DOB, today) so repeat lookups are free but ages still roll over at midnight
+    return _calculate_age_on(date_of_birth, datetime.now().date())
+
+@lru_cache(maxsize=1024)
+def _calculate_age_on(date_of_birth, today):
     try:
-        if not date_of_birth:
-            return None
-        
-        # Parse different date formats
+        # Parse different date formats; HTML date inputs give ISO dates, so try the fast path first
         try:
-            from dateutil import parser
-            birth_date = parser.parse(date_of_birth)
-        except ImportError:
-            # Fallback to basic datetime parsing if dateutil not available
-            birth_date = datetime.strptime(date_of_birth, '%Y-%m-%d')
-        
-        today = datetime.now()
+            birth_date = datetime.fromisoformat(date_of_birth)
+        except ValueError:
+            if date_parser is None:
+                raise
+            birth_date = date_parser.parse(date_of_birth)
         
         age = today.year - birth_date.year
         if today.month < birth_date.month or (today.month == birth_date.month and today.day < birth_date.day):
@@ -2599,6 +3099,104 @@ def calculate_age_from_dob(date_of_birth):
         print(f"Error calculating age: {str(e)}")
         return None
 
+# Default (adult) vital sign ranges; copied per call since they are adjusted in place
+DEFAULT_VITAL_RANGES = {
+    'temperature': {'min': 36.1, 'max': 37.5, 'unit': '°C'},
+    'pulse_rate': {'min': 60, 'max': 100, 'unit': 'bpm'},
+    'respiratory_rate': {'min': 12, 'max': 20, 'unit': 'bpm'},
+    'systolic_bp': {'min': 90, 'max': 120, 'unit': 'mmHg'},
+    'diastolic_bp': {'min': 60, 'max': 80, 'unit': 'mmHg'},
+    'oxygen_saturation': {'min': 95, 'max': 100, 'unit': '%'},
+    'blood_glucose': {'min': 70, 'max': 140, 'unit': 'mg/dL'},
+    'bmi': {'min': 18.5, 'max': 24.9, 'unit': 'kg/m²'}
+}
+
+# Age bucket upper bounds and the range overrides for each bucket (bisect_right index)
+VITAL_RANGE_AGE_BOUNDS = (1, 3, 12, 18, 65)
+VITAL_RANGE_AGE_OVERRIDES = (
+    {  # Infant
+        'pulse_rate': {'min': 100, 'max': 160, 'unit': 'bpm'},
+        'respiratory_rate': {'min': 30, 'max': 60, 'unit': 'bpm'},
+        'systolic_bp': {'min': 65, 'max': 85, 'unit': 'mmHg'},
+        'diastolic_bp': {'min': 45, 'max': 55, 'unit': 'mmHg'}
+    },
+    {  # Toddler
+        'pulse_rate': {'min': 90, 'max': 150, 'unit': 'bpm'},
+        'respiratory_rate': {'min': 24, 'max': 40, 'unit': 'bpm'},
+        'systolic_bp': {'min': 70, 'max': 90, 'unit': 'mmHg'},
+        'diastolic_bp': {'min': 50, 'max': 65, 'unit': 'mmHg'}
+    },
+    {  # Child
+        'pulse_rate': {'min': 80, 'max': 120, 'unit': 'bpm'},
+        'respiratory_rate': {'min': 18, 'max': 30, 'unit': 'bpm'},
+        'systolic_bp': {'min': 80, 'max': 110, 'unit': 'mmHg'},
+        'diastolic_bp': {'min': 50, 'max': 70, 'unit': 'mmHg'}
+    },
+    {  # Adolescent
+        'pulse_rate': {'min': 70, 'max': 110, 'unit': 'bpm'},
+        'respiratory_rate': {'min': 12, 'max': 22, 'unit': 'bpm'},
+        'systolic_bp': {'min': 85, 'max': 115, 'unit': 'mmHg'},
+        'diastolic_bp': {'min': 55, 'max': 75, 'unit': 'mmHg'}
+    },
+    {},  # Adult: defaults apply
+    {  # Elderly
+        'pulse_rate': {'min': 60, 'max': 90, 'unit': 'bpm'},
+        'systolic_bp': {'min': 95, 'max': 140, 'unit': 'mmHg'},
+        'diastolic_bp': {'min': 60, 'max': 90, 'unit': 'mmHg'}
+    }
+)
+
+# BMI category lower bounds and labels (bisect_right index)
+BMI_STATUS_BOUNDS = (18.5, 25, 30)
+BMI_STATUS_LABELS = ('Underweight', 'Normal', 'Overweight', 'Obese')
+
+@lru_cache(maxsize=256)
+def _compute_vital_ranges(age, gender, weight_kg, height_cm):
+    """Compute vital sign ranges for a demographic profile (cached; callers must copy before mutating)"""
+    print(f"🔍 Calculating ranges for: Age={age}, Gender={gender}, Weight={weight_kg}kg, Height={height_cm}cm")
+    
+    # Default ranges (adult)
+    ranges = {vital: dict(range_data) for vital, range_data in DEFAULT_VITAL_RANGES.items()}
+    
+    # Age-based adjustments
+    if age:
+        age_overrides = VITAL_RANGE_AGE_OVERRIDES[bisect.bisect_right(VITAL_RANGE_AGE_BOUNDS, age)]
+        for vital, range_data in age_overrides.items():
+            ranges[vital] = dict(range_data)
+    
+    # Gender-based adjustments
+    if gender == 'female':
+        # Slightly higher pulse rate for females
+        ranges['pulse_rate']['min'] += 5
+        ranges['pulse_rate']['max'] += 5
+    
+    # Weight-based adjustments
+    if weight_kg:
+        # Adjust for obesity (affects BP and pulse)
+        if height_cm:
+            bmi = weight_kg / ((height_cm / 100) ** 2)
+            ranges['bmi']['current'] = round(bmi, 1)
+            
+            if bmi >= 30:  # Obese
+                ranges['systolic_bp']['max'] += 10
+                ranges['diastolic_bp']['max'] += 5
+                ranges['pulse_rate']['max'] += 10
+            elif bmi < 18.5:  # Underweight
+                ranges['systolic_bp']['min'] -= 5
+                ranges['pulse_rate']['min'] -= 5
+    
+    # Add interpretive notes
+    for vital, range_data in ranges.items():
+        if vital != 'bmi':
+            range_data['display'] = f"Normal: {range_data['min']}-{range_data['max']} {range_data['unit']}"
+        else:
+            range_data['display'] = f"Normal BMI: {range_data['min']}-{range_data['max']} {range_data['unit']}"
+            if 'current' in range_data:
+                range_data['status'] = BMI_STATUS_LABELS[bisect.bisect_right(BMI_STATUS_BOUNDS, range_data['current'])]
+    
+    print(f"✅ Calculated personalized ranges: {ranges}")
+    return ranges
+
 def calculate_personalized_vital_ranges():
     """Calculate personalized vital sign ranges based on age, gender, weight, and height"""
     try:
@@ -2625,86 +3223,9 @@ def calculate_personalized_vital_ranges():
         weight_kg = step3_data.get('weight_kg')
         height_cm = step3_data.get('height_cm')
         
-        print(f"🔍 Calculating ranges for: Age={age}, Gender={gender}, Weight={weight_kg}kg, Height={height_cm}cm")
-        
-        # Default ranges (adult)
-        ranges = {
-            'temperature': {'min': 36.1, 'max': 37.5, 'unit': '°C'},
-            'pulse_rate': {'min': 60, 'max': 100, 'unit': 'bpm'},
-            'respiratory_rate': {'min': 12, 'max': 20, 'unit': 'bpm'},
-            'systolic_bp': {'min': 90, 'max': 120, 'unit': 'mmHg'},
-            'diastolic_bp': {'min': 60, 'max': 80, 'unit': 'mmHg'},
-            'oxygen_saturation': {'min': 95, 'max': 100, 'unit': '%'},
-            'blood_glucose': {'min': 70, 'max': 140, 'unit': 'mg/dL'},
-            'bmi': {'min': 18.5, 'max': 24.9, 'unit': 'kg/m²'}
-        }
-        
-        # Age-based adjustments
-        if age:
-            if age < 1:  # Infant
-                ranges['pulse_rate'] = {'min': 100, 'max': 160, 'unit': 'bpm'}
-                ranges['respiratory_rate'] = {'min': 30, 'max': 60, 'unit': 'bpm'}
-                ranges['systolic_bp'] = {'min': 65, 'max': 85, 'unit': 'mmHg'}
-                ranges['diastolic_bp'] = {'min': 45, 'max': 55, 'unit': 'mmHg'}
-            elif age < 3:  # Toddler
-                ranges['pulse_rate'] = {'min': 90, 'max': 150, 'unit': 'bpm'}
-                ranges['respiratory_rate'] = {'min': 24, 'max': 40, 'unit': 'bpm'}
-                ranges['systolic_bp'] = {'min': 70, 'max': 90, 'unit': 'mmHg'}
-                ranges['diastolic_bp'] = {'min': 50, 'max': 65, 'unit': 'mmHg'}
-            elif age < 12:  # Child
-                ranges['pulse_rate'] = {'min': 80, 'max': 120, 'unit': 'bpm'}
-                ranges['respiratory_rate'] = {'min': 18, 'max': 30, 'unit': 'bpm'}
-                ranges['systolic_bp'] = {'min': 80, 'max': 110, 'unit': 'mmHg'}
-                ranges['diastolic_bp'] = {'min': 50, 'max': 70, 'unit': 'mmHg'}
-            elif age < 18:  # Adolescent
-                ranges['pulse_rate'] = {'min': 70, 'max': 110, 'unit': 'bpm'}
-                ranges['respiratory_rate'] = {'min': 12, 'max': 22, 'unit': 'bpm'}
-                ranges['systolic_bp'] = {'min': 85, 'max': 115, 'unit': 'mmHg'}
-                ranges['diastolic_bp'] = {'min': 55, 'max': 75, 'unit': 'mmHg'}
-            elif age >= 65:  # Elderly
-                ranges['pulse_rate'] = {'min': 60, 'max': 90, 'unit': 'bpm'}
-                ranges['systolic_bp'] = {'min': 95, 'max': 140, 'unit': 'mmHg'}
-                ranges['diastolic_bp'] = {'min': 60, 'max': 90, 'unit': 'mmHg'}
-        
-        # Gender-based adjustments
-        if gender == 'female':
-            # Slightly higher pulse rate for females
-            ranges['pulse_rate']['min'] += 5
-            ranges['pulse_rate']['max'] += 5
-        
-        # Weight-based adjustments
-        if weight_kg:
-            # Adjust for obesity (affects BP and pulse)
-            if height_cm:
-                bmi = weight_kg / ((height_cm / 100) ** 2)
-                ranges['bmi']['current'] = round(bmi, 1)
-                
-                if bmi >= 30:  # Obese
-                    ranges['systolic_bp']['max'] += 10
-                    ranges['diastolic_bp']['max'] += 5
-                    ranges['pulse_rate']['max'] += 10
-                elif bmi < 18.5:  # Underweight
-                    ranges['systolic_bp']['min'] -= 5
-                    ranges['pulse_rate']['min'] -= 5
-        
-        # Add interpretive notes
-        for vital, range_data in ranges.items():
-            if vital != 'bmi':
-                range_data['display'] = f"Normal: {range_data['min']}-{range_data['max']} {range_data['unit']}"
-            else:
-                range_data['display'] = f"Normal BMI: {range_data['min']}-{range_data['max']} {range_data['unit']}"
-                if 'current' in range_data:
-                    if range_data['current'] < 18.5:
-                        range_data['status'] = 'Underweight'
-                    elif range_data['current'] < 25:
-                        range_data['status'] = 'Normal'
-                    elif range_data['current'] < 30:
-                        range_data['status'] = 'Overweight'
-                    else:
-                        range_data['status'] = 'Obese'
-        
-        print(f"✅ Calculated personalized ranges: {ranges}")
-        return ranges
+        # Ranges depend only on these inputs, so they are computed once per distinct combination
+        ranges = _compute_vital_ranges(age, gender, weight_kg, height_cm)
+        return {vital: dict(range_data) for vital, range_data in ranges.items()}
         
     except Exception as e:
         print(f"❌ Error calculating vital ranges: {str(e)}")
@@ -2732,7 +3253,7 @@ def step3():
     step3_data = {}
     if 'steps' in all_data and 'step3' in all_data['steps']:
         step3_data = all_data['steps']['step3'].get('form_data', {})
-        print(f"✅ Loading existing step3 data for editing: {len(step3_data)} fields")
+        logger.debug("Loading existing step3 data for editing: %s fields", len(step3_data))
     
     # Calculate personalized vital ranges based on patient data
     vital_ranges = calculate_personalized_vital_ranges()
@@ -2746,62 +3267,44 @@ def step4():
     if not validate_session_step(3):
         return redirect('/')
     
-    # Get patient data for display using new structure
-    all_data = get_all_patient_data()
-    patient_name = "Patient"
-    patient_age = "Unknown"
-    patient_gender = "Unknown"
-    
-    # Try to get patient info from step2
-    if 'steps' in all_data and 'step2' in all_data['steps']:
-        step2_data = all_data['steps']['step2'].get('form_data', {})
-        patient_name = step2_data.get('full_name', 'Patient')
-        patient_age = step2_data.get('calculated_age', 'Unknown')
-        patient_gender = step2_data.get('gender', 'Unknown')
+    # Get patient info for display (cached in the session when step 2 is saved)
+    patient_context = get_patient_context()
     
     # Load existing step4 data if available for editing
-    step4_data = {}
-    if 'steps' in all_data and 'step4' in all_data['steps']:
-        step4_data = all_data['steps']['step4'].get('form_data', {})
+    step4_data = get_step_data(4).get('form_data', {})
     
     return render_template('step4.html', 
-                         patient_name=patient_name,
-                         patient_age=patient_age,
-                         patient_gender=patient_gender,
+                         patient_name=patient_context['name'],
+                         patient_age=patient_context['age'],
+                         patient_gender=patient_context['gender'],
                          step4_data=step4_data)
 
 @app.route('/save_vitals', methods=['POST'])
 def save_vitals():
     try:
-        print("✅ Starting save_vitals function")
-        print(f"📋 Form data keys: {list(request.form.keys())}")
+        logger.debug("Starting save_vitals function")
+        logger.debug("Form data keys: %s", list(request.form.keys()))
         
         if not validate_session_step(2):
-            print("❌ Validation failed for step 2")
+            logger.warning("Validation failed for step 2")
             return jsonify({'success': False, 'error': 'Please complete registration first'})
         
-        print("✅ Validation passed for step 2")
+        logger.debug("Validation passed for step 2")
         
         # Check if this is a modification of existing data
         existing_step3 = get_step_data(3)
         is_modification = bool(existing_step3)
-        print(f"🔄 Is modification: {is_modification}")
+        logger.debug("Is modification: %s", is_modification)
         
         # Collect all form data
-        form_data = {}
-        for key, value in request.form.items():
-            print(f"🔍 RAW FORM DATA: {key} = '{value}' (type: {type(value)})")
-            if value and str(value).strip():  # Only include non-empty values
-                form_data[key] = value.strip()
-                print(f"📝 INCLUDED: {key} = '{value.strip()}'")
-            else:
-                print(f"🚫 EXCLUDED: {key} = '{value}' (empty or None)")
+        form_data = collect_form_data()
         
-        print(f"📋 Collected form data with {len(form_data)} fields")
-        print(f"📋 Form data contents: {form_data}")
+        logger.debug("Collected form data with %s fields", len(form_data))
+        logger.debug("Step 3 form data contents: %s", form_data)
         
-        # Handle file uploads for vitals (medical photos)
+        # Handle file uploads for vitals (medical photos); all files share one upload timestamp
         files_data = {}
+        upload_timestamp = datetime.now().isoformat()
         photo_fields = ['tongue_photo', 'throat_photo', 'infection_photo']
         for field in photo_fields:
             if field in request.files:
@@ -2809,13 +3312,12 @@ def save_vitals():
                 if file and file.filename:
                     files_data[field] = {
                         'filename': file.filename,
-                        'upload_timestamp': datetime.now().isoformat(),
-                        'file_size': len(file.read()),
+                        'upload_timestamp': upload_timestamp,
+                        'file_size': get_upload_size(file),
                         'content_type': file.content_type,
                         'photo_type': field.replace('_photo', '')
                     }
-                    file.seek(0)  # Reset file pointer
-                    print(f"📸 Medical photo uploaded: {file.filename} ({field})")
+                    logger.debug("Medical photo uploaded: %s (%s)", file.filename, field)
         
         # Collect AI-generated insights from photo analysis
         ai_data = {}
@@ -2829,83 +3331,79 @@ def save_vitals():
         # Handle custom medical images with AI insights from multi-upload section
         custom_medical_images = []
         
-        # First, check for new upload history format
-        total_uploads = int(form_data.get('total_medical_uploads', 0))
-        print(f"🔍 Processing {total_uploads} medical uploads from form data")
+        # First, check for new upload history format. Uploads are discovered from the
+        # medical_upload_<n>_filename keys actually sent rather than total_medical_uploads.
+        upload_numbers = sorted(
+            int(key[len('medical_upload_'):-len('_filename')])
+            for key in form_data
+            if key.startswith('medical_upload_') and key.endswith('_filename')
+            and key[len('medical_upload_'):-len('_filename')].isdigit()
+        )
+        logger.debug("Processing %s medical uploads from form data", len(upload_numbers))
+        upload_field_suffixes = ('id', 'filename', 'category', 'model', 'timestamp', 'size', 'insights')
+        
+        # Parse all JSON insights payloads in one batch
+        uploads = [
+            (f'medical_upload_{i}', form_data.get(f'medical_upload_{i}_insights', ''))
+            for i in upload_numbers
+            if form_data.get(f'medical_upload_{i}_filename') and form_data.get(f'medical_upload_{i}_insights')
+        ]
+        json_payloads = [insights_str for _, insights_str in uploads if insights_str.startswith('{')]
+        parsed_payloads = iter(json_loads_many(json_payloads))
         
-        for i in range(1, total_uploads + 1):
-            prefix = f'medical_upload_{i}'
-            upload_id = form_data.get(f'{prefix}_id', '')
+        for prefix, insights_str in uploads:
             filename = form_data.get(f'{prefix}_filename', '')
             category = form_data.get(f'{prefix}_category', '')
             model = form_data.get(f'{prefix}_model', '')
-            timestamp = form_data.get(f'{prefix}_timestamp', '')
-            size = form_data.get(f'{prefix}_size', '')
-            insights_str = form_data.get(f'{prefix}_insights', '')
+            insights = next(parsed_payloads) if insights_str.startswith('{') else insights_str
+            if isinstance(insights, json.JSONDecodeError):
+                logger.error("Failed to parse insights for %s: %s", filename, insights)
+                continue
             
-            if filename and insights_str:
-                try:
-                    # Parse insights JSON
-                    insights = json.loads(insights_str) if insights_str.startswith('{') else insights_str
-                    
-                    upload_data = {
-                        'upload_id': upload_id,
-                        'filename': filename,
-                        'category': category,
-                        'model_used': model,
-                        'upload_timestamp': timestamp,
-                        'file_size': size,
-                        'ai_insights': insights
-                    }
-                    
-                    custom_medical_images.append(upload_data)
-                    print(f"📄 Processed upload: {filename} (Category: {category}, Model: {model})")
-                    
-                    # Remove from form_data to avoid duplication
-                    for field_key in list(form_data.keys()):
-                        if field_key.startswith(prefix):
-                            del form_data[field_key]
-                            
-                except json.JSONDecodeError as e:
-                    print(f"❌ Failed to parse insights for {filename}: {str(e)}")
-                    continue
+            upload_data = {
+                'upload_id': form_data.get(f'{prefix}_id', ''),
+                'filename': filename,
+                'category': category,
+                'model_used': model,
+                'upload_timestamp': form_data.get(f'{prefix}_timestamp', ''),
+                'file_size': form_data.get(f'{prefix}_size', ''),
+                'ai_insights': insights
+            }
+            
+            custom_medical_images.append(upload_data)
+            logger.debug("Processed upload: %s (Category: %s, Model: %s)", filename, category, model)
+            
+            # Remove from form_data to avoid duplication
+            for suffix in upload_field_suffixes:
+                form_data.pop(f'{prefix}_{suffix}', None)
         
-        # Also handle legacy format for backwards compatibility
+        # Also handle legacy format for backwards compatibility. Legacy uploads are numbered
+        # from 1 without gaps, so a request without medical_image_1 skips this entirely.
         upload_counter = 1
         while True:
-            image_field = f'medical_image_{upload_counter}'
+            file = request.files.get(f'medical_image_{upload_counter}')
+            if file is None or not file.filename:
+                break  # No more uploads found
+            
             prompt_field = f'prompt_{upload_counter}'
             model_field = f'model_{upload_counter}'
             insights_field = f'ai_insights_{upload_counter}'
             
-            # Check if this upload exists
-            if image_field in request.files and request.files[image_field].filename:
-                file = request.files[image_field]
-                prompt = form_data.get(prompt_field, '')
-                model = form_data.get(model_field, 'gpt-4.1-nano')
-                insights = form_data.get(insights_field, '')
-                
-                custom_image_data = {
-                    'upload_id': upload_counter,
-                    'filename': file.filename,
-                    'file_size': len(file.read()),
-                    'content_type': file.content_type,
-                    'user_prompt': prompt,
-                    'model_used': model,
-                    'upload_timestamp': datetime.now().isoformat(),
-                    'ai_insights': insights
-                }
-                
-                custom_medical_images.append(custom_image_data)
-                file.seek(0)  # Reset file pointer
-                print(f"📸 Legacy custom medical image uploaded: {file.filename} (Upload #{upload_counter})")
-                
-                # Remove these fields from form_data to avoid duplication
-                for field_to_remove in [prompt_field, model_field, insights_field]:
-                    if field_to_remove in form_data:
-                        del form_data[field_to_remove]
-            else:
-                break  # No more uploads found
+            custom_medical_images.append({
+                'upload_id': upload_counter,
+                'filename': file.filename,
+                'file_size': get_upload_size(file),
+                'content_type': file.content_type,
+                'user_prompt': form_data.get(prompt_field, ''),
+                'model_used': form_data.get(model_field, 'gpt-4.1-nano'),
+                'upload_timestamp': upload_timestamp,
+                'ai_insights': form_data.get(insights_field, '')
+            })
+            logger.debug("Legacy custom medical image uploaded: %s (Upload #%s)", file.filename, upload_counter)
+            
+            # Remove these fields from form_data to avoid duplication
+            for field_to_remove in (prompt_field, model_field, insights_field):
+                form_data.pop(field_to_remove, None)
             
             upload_counter += 1
         
@@ -2917,39 +3415,40 @@ def save_vitals():
         session_custom_images = []
         if 'patient_data' in session and 'custom_medical_images' in session['patient_data']:
             session_custom_images = session['patient_data']['custom_medical_images']
-            print(f"📱 Found {len(session_custom_images)} custom medical images in session (legacy)")
+            logger.debug("Found %s custom medical images in session (legacy)", len(session_custom_images))
         
-        print(f"🤖 AI insights collected: {len(ai_data)} fields")
-        print(f"📎 Files uploaded: {len(files_data)}")
-        print(f"🖼️ Custom medical images: {len(custom_medical_images)} from form, {len(session_custom_images)} from session")
+        logger.debug("AI insights collected: %s fields", len(ai_data))
+        logger.debug("Files uploaded: %s", len(files_data))
+        logger.debug("Custom medical images: %s from form, %s from session", len(custom_medical_images), len(session_custom_images))
+        custom_medical_images.extend(session_custom_images)
         
         # Use new step-based save function
-        print("🔄 About to call save_step_based_patient_data...")
+        logger.debug("About to call save_step_based_patient_data...")
         try:
             success = save_step_based_patient_data(
                 step_number=3,
                 form_data=form_data,
                 ai_data=ai_data,
                 files_data=files_data,
-                custom_medical_images=custom_medical_images + session_custom_images
+                custom_medical_images=custom_medical_images
             )
-            print(f"💾 save_step_based_patient_data returned: {success}")
+            logger.debug("save_step_based_patient_data returned: %s", success)
         except Exception as save_error:
-            print(f"💥 Exception in save_step_based_patient_data: {str(save_error)}")
+            logger.error("Exception in save_step_based_patient_data: %s", save_error)
             import traceback
             traceback.print_exc()
             return jsonify({'success': False, 'error': f'Save error: {str(save_error)}'})
 
         if not success:
-            print("❌ Step-based save failed")
+            logger.error("Step-based save failed")
             return jsonify({'success': False, 'error': 'Failed to save vitals data'})
         
-        print("✅ Step-based save succeeded")
+        logger.debug("Step-based save succeeded")
         
         # Clear custom medical images from session after successful save (if any existed)
         if 'patient_data' in session and 'custom_medical_images' in session['patient_data']:
             del session['patient_data']['custom_medical_images']
-            print("🗑️ Cleared legacy custom medical images from session after save")
+            logger.debug("Cleared legacy custom medical images from session after save")
         
         # If this is a modification, invalidate downstream steps
         if is_modification:
@@ -2961,7 +3460,7 @@ def save_vitals():
         session['patient_data']['step_completed'] = 3
         session.modified = True
         
-        print("✅ Returning success response with redirect to step4")
+        logger.debug("Returning success response with redirect to step4")
         
         return jsonify({
             'success': True, 
@@ -2970,19 +3469,30 @@ def save_vitals():
             'form_fields': len(form_data),
             'ai_insights': len(ai_data),
             'photos_uploaded': len(files_data),
-            'custom_medical_images': len(custom_medical_images + session_custom_images)
+            'custom_medical_images': len(custom_medical_images)
         })
         
     except Exception as e:
-        print(f"❌ ERROR in save_vitals: {str(e)}")
+        logger.error("Error in save_vitals: %s", e)
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': f'Failed to save vitals: {str(e)}'})
 
+# Form field prefix for follow-up question answers (followup_answer_<question_id>)
+FOLLOWUP_ANSWER_PREFIX = 'followup_answer_'
+FOLLOWUP_ANSWER_PREFIX_LEN = len(FOLLOWUP_ANSWER_PREFIX)
+
+# Step 4 medication inputs and their display labels (e.g. 'bp_medication' -> 'Bp')
+MEDICATION_FIELDS = ('diabetes_medication', 'bp_medication', 'asthma_medication',
+                     'heart_medication', 'other_medication')
+MEDICATION_FIELD_LABELS = tuple(
+    (field, field[:-len('_medication')].replace('_', ' ').title()) for field in MEDICATION_FIELDS
+)
+
 @app.route('/save_step4', methods=['POST'])
 def save_step4():
     try:
-        print("✅ Starting save_step4")
+        logger.debug("Starting save_step4")
         
         if not validate_session_step(3):
             return jsonify({'success': False, 'error': 'Please complete vitals first'})
@@ -2990,18 +3500,16 @@ def save_step4():
         # Check if this is a modification of existing data
         existing_step4 = get_step_data(4)
         is_modification = bool(existing_step4)
-        print(f"🔄 Is modification: {is_modification}")
+        logger.debug("Is modification: %s", is_modification)
         
         # Collect all form data
-        form_data = {}
-        for key, value in request.form.items():
-            if value and str(value).strip():  # Only include non-empty values
-                form_data[key] = value.strip()
+        form_data = collect_form_data()
         
-        print(f"📋 Form data collected: {len(form_data)} fields")
+        logger.debug("Form data collected: %s fields", len(form_data))
         
         # Handle file uploads for medical documents
         files_data = {}
+        upload_timestamp = datetime.now().isoformat()
         file_mappings = {
             'lab_report_file': 'lab_report',
             'medical_image_file': 'medical_imaging',
@@ -3015,14 +3523,13 @@ def save_step4():
                 if file and file.filename:
                     files_data[report_type] = {
                         'filename': file.filename,
-                        'upload_timestamp': datetime.now().isoformat(),
-                        'file_size': len(file.read()),
+                        'upload_timestamp': upload_timestamp,
+                        'file_size': get_upload_size(file),
                         'content_type': file.content_type,
                         'report_type': form_data.get(f'{report_type}_type', ''),
                         'category': report_type
                     }
-                    file.seek(0)  # Reset file pointer
-                    print(f"📄 Medical document uploaded: {file.filename} ({report_type})")
+                    logger.debug("Medical document uploaded: %s (%s)", file.filename, report_type)
         
         # Collect AI-generated insights
         ai_data = {}
@@ -3037,23 +3544,23 @@ def save_step4():
                 # Remove from form_data to avoid duplication
                 del form_data[field]
         
-        # Collect follow-up question answers
+        # Collect follow-up question answers (and remove them from form_data)
         followup_answers = {}
-        for key in list(form_data.keys()):
-            if key.startswith('followup_answer_'):
-                question_id = key.replace('followup_answer_', '')
-                followup_answers[question_id] = {
-                    'answer': form_data[key],
-                    'answered_at': datetime.now().isoformat()
-                }
-                del form_data[key]  # Remove from form_data
+        answered_at = datetime.now().isoformat()
+        followup_keys = [key for key in form_data if key.startswith(FOLLOWUP_ANSWER_PREFIX)]
+        for key in followup_keys:
+            question_id = key[FOLLOWUP_ANSWER_PREFIX_LEN:]
+            followup_answers[question_id] = {
+                'answer': form_data.pop(key),
+                'answered_at': answered_at
+            }
         
         if followup_answers:
             ai_data['followup_answers'] = followup_answers
-            print(f"📝 Follow-up answers collected: {len(followup_answers)}")
+            logger.debug("Follow-up answers collected: %s", len(followup_answers))
         
-        print(f"🤖 AI insights collected: {len(ai_data)} fields")
-        print(f"📎 Files uploaded: {len(files_data)}")
+        logger.debug("AI insights collected: %s fields", len(ai_data))
+        logger.debug("Files uploaded: %s", len(files_data))
         
         # Use new step-based save function
         success = save_step_based_patient_data(
@@ -3084,16 +3591,15 @@ def save_step4():
                     break
         
         # Count active medications
-        active_medications = []
-        step4_form_data = form_data
-        for key in step4_form_data:
-            if key.endswith('_medication') and step4_form_data[key]:
-                med_type = key.replace('_medication', '').replace('_', ' ').title()
-                active_medications.append(f"{med_type}: {step4_form_data[key]}")
+        active_medications = [
+            f"{label}: {form_data[field]}"
+            for field, label in MEDICATION_FIELD_LABELS
+            if form_data.get(field)
+        ]
         
         # Emergency contact info
-        emergency_name = step4_form_data.get('emergency_name', 'Not provided')
-        emergency_relation = step4_form_data.get('emergency_relation', '')
+        emergency_name = form_data.get('emergency_name', 'Not provided')
+        emergency_relation = form_data.get('emergency_relation', '')
         emergency_contact_display = f"{emergency_name} ({emergency_relation})" if emergency_relation else emergency_name
         
         # Keep minimal data in session for navigation
@@ -3104,7 +3610,7 @@ def save_step4():
         session['patient_data']['step4_completed'] = True
         session.modified = True
         
-        print("✅ Step 4 data saved successfully")
+        logger.debug("Step 4 data saved successfully")
         
         return jsonify({
             'success': True, 
@@ -3122,11 +3628,44 @@ def save_step4():
         })
         
     except Exception as e:
-        print(f"❌ ERROR in save_step4: {str(e)}")
+        logger.error("Error in save_step4: %s", e)
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': f'Failed to save step 4: {str(e)}'})
 
+def _dedupe_abnormal_findings(generated_questions):
+    """Return the unique abnormal findings (by case-insensitive finding text) from step4 questions"""
+    unique_findings = {}
+    for question_data in generated_questions:
+        if isinstance(question_data, dict) and 'abnormal_finding' in question_data:
+            finding_key = question_data.get('abnormal_finding', '').lower().strip()
+            if finding_key and finding_key not in unique_findings:
+                unique_findings[finding_key] = {
+                    'finding': question_data.get('abnormal_finding', ''),
+                    'concern': question_data.get('medical_concern', ''),
+                    'priority': question_data.get('priority', 'normal'),
+                    'question': question_data.get('question', '')
+                }
+    return tuple(unique_findings.values())
+
+def _ensure_list(obj, default='[]'):
+    """Return obj if it is already a list, otherwise parse it as JSON (empty values parse as default)"""
+    return obj if isinstance(obj, list) else json_loads(obj or default)
+
+@lru_cache(maxsize=64)
+def _abnormal_findings_from_json(generated_questions_json):
+    return _dedupe_abnormal_findings(_ensure_list(generated_questions_json))
+
+def extract_abnormal_findings(generated_questions):
+    """
+    Extract unique abnormal findings from step4 generated_questions (a JSON string or a list).
+    JSON strings are parsed and deduplicated once and then served from an LRU cache;
+    already-parsed lists are used as-is.
+    """
+    if isinstance(generated_questions, list):
+        return list(_dedupe_abnormal_findings(generated_questions))
+    return list(_abnormal_findings_from_json(generated_questions or '[]'))
+
 # Step 5: Complaints and Symptoms
 @app.route('/step5')
 @login_required
@@ -3136,24 +3675,19 @@ def step5():
     
     # Get patient data for display
     all_data = get_all_patient_data()
-    patient_name = "Patient"
-    patient_age = "Unknown"
-    patient_gender = "Unknown"
+    patient_context = get_patient_context()
     
-    # Try to get patient info from step2
+    # Check step2 for uploaded medical reports
     has_medical_reports = False  # Default to false
     if 'steps' in all_data and 'step2' in all_data['steps']:
         step2_data = all_data['steps']['step2'].get('form_data', {})
-        patient_name = step2_data.get('full_name', 'Patient')
-        patient_age = step2_data.get('calculated_age', 'Unknown')
-        patient_gender = step2_data.get('gender', 'Unknown')
         has_medical_reports = step2_data.get('other_medical_reports', '') == 'yes'
     
     # Load existing step5 data if available for editing
     step5_data = {}
     if 'steps' in all_data and 'step5' in all_data['steps']:
         step5_data = all_data['steps']['step5'].get('form_data', {})
-        print(f"✅ Loading existing step5 data for editing: {len(step5_data)} fields")
+        logger.debug("Loading existing step5 data for editing: %s fields", len(step5_data))
     
     # Extract abnormal findings from step4 data
     abnormal_findings = []
@@ -3162,39 +3696,17 @@ def step5():
         generated_questions_str = step4_ai_data.get('generated_questions', '[]')
         
         try:
-            import json
-            if isinstance(generated_questions_str, str):
-                generated_questions = json.loads(generated_questions_str)
-            else:
-                generated_questions = generated_questions_str
-            
-            # Use a set to track unique findings and avoid duplicates
-            unique_findings = {}
-            
-            # Extract unique abnormal findings from the questions
-            for question_data in generated_questions:
-                if isinstance(question_data, dict) and 'abnormal_finding' in question_data:
-                    finding_key = question_data.get('abnormal_finding', '').lower().strip()
-                    if finding_key and finding_key not in unique_findings:
-                        unique_findings[finding_key] = {
-                            'finding': question_data.get('abnormal_finding', ''),
-                            'concern': question_data.get('medical_concern', ''),
-                            'priority': question_data.get('priority', 'normal'),
-                            'question': question_data.get('question', '')
-                        }
+            abnormal_findings = extract_abnormal_findings(generated_questions_str)
             
-            # Convert unique findings to list
-            abnormal_findings = list(unique_findings.values())
-            
-            print(f"✅ Extracted {len(abnormal_findings)} unique abnormal findings from step4 (filtered from {len(generated_questions)} questions)")
+            logger.debug("Extracted %s unique abnormal findings from step4", len(abnormal_findings))
         except Exception as e:
-            print(f"⚠️ Error parsing step4 generated_questions: {e}")
+            logger.warning("Error parsing step4 generated_questions: %s", e)
             abnormal_findings = []
     
     return render_template('step5.html', 
-                         patient_name=patient_name,
-                         patient_age=patient_age,
-                         patient_gender=patient_gender,
+                         patient_name=patient_context['name'],
+                         patient_age=patient_context['age'],
+                         patient_gender=patient_context['gender'],
                          step5_data=step5_data,
                          abnormal_findings=abnormal_findings,
                          has_medical_reports=has_medical_reports)
@@ -3203,69 +3715,53 @@ def step5():
 def analyze_symptoms_quick():
     """Quick insights on symptoms - extract medical labels"""
     try:
-        print("🔍 Starting quick symptom analysis...")
+        logger.debug("Starting quick symptom analysis...")
         
         if not validate_session_step(4):
             return jsonify({'success': False, 'error': 'Please complete step 4 first'})
         
         # Get symptom text from request
-        complaint_text = request.json.get('symptoms', '').strip()
+        complaint_text = request.get_json(cache=False).get('symptoms', '').strip()
         if not complaint_text:
             return jsonify({'success': False, 'error': 'Please enter symptom description first'})
         
-        print(f"📝 Analyzing complaint: {complaint_text[:100]}...")
+        logger.debug("Analyzing complaint: %s...", complaint_text[:100])
         
         # Get patient context for better analysis
-        all_data = get_all_patient_data()
-        patient_context = {
-            'age': 'Unknown',
-            'gender': 'Unknown',
-            'vitals': {}
-        }
+        patient_context = get_patient_context()
         
-        # Extract context from previous steps
-        if 'steps' in all_data:
-            if 'step2' in all_data['steps']:
-                step2_data = all_data['steps']['step2'].get('form_data', {})
-                patient_context['age'] = step2_data.get('calculated_age', 'Unknown')
-                patient_context['gender'] = step2_data.get('gender', 'Unknown')
-            
-            if 'step3' in all_data['steps']:
-                step3_data = all_data['steps']['step3'].get('form_data', {})
-                patient_context['vitals'] = step3_data
+        # Vitals from step3 (if recorded)
+        vitals = get_step_data(3).get('form_data', {})
         
         # Create AI prompt for medical label extraction
-        prompt_template = load_prompt("symptom_analysis")
+        prompt_template = load_prompt_cached("symptom_analysis")
         prompt = prompt_template.format(
             complaint_text=complaint_text,
             age=patient_context['age'],
             gender=patient_context['gender'],
-            vitals=patient_context['vitals']
+            vitals=vitals
         )
         
-        # Call OpenAI API
-        response = call_gpt4(prompt, {})
-        print(f"🤖 GPT-4 response received: {len(response) if response else 0} characters")
+        # Call OpenAI API on the LLM pool so a slow completion can't hold this request indefinitely.
+        # cancel() can't stop a call that has already started, so the call carries the same
+        # timeout and frees its pool worker instead of running on to the client default.
+        gpt_future = llm_call_pool.submit(call_gpt4, prompt, {}, timeout=SYMPTOM_ANALYSIS_TIMEOUT)
+        try:
+            response = gpt_future.result(timeout=SYMPTOM_ANALYSIS_TIMEOUT)
+        except FutureTimeoutError:
+            gpt_future.cancel()
+            logger.warning("Quick symptom analysis timed out after %ss", SYMPTOM_ANALYSIS_TIMEOUT)
+            return jsonify({
+                'success': False,
+                'error': 'Analysis is taking longer than expected. Please try again.'
+            })
+        logger.debug("GPT-4 response received: %s characters", len(response) if response else 0)
         
         if not response or response.strip() == "":
             raise Exception("Empty response from AI")
         
         # Clean and parse response
-        response = response.strip()
-        if response.startswith('```json'):
-            response = response[7:]
-        if response.endswith('```'):
-            response = response[:-3]
-        
-        # Find JSON boundaries
-        start_idx = response.find('{')
-        end_idx = response.rfind('}') + 1
-        
-        if start_idx != -1 and end_idx > start_idx:
-            json_str = response[start_idx:end_idx]
-            insights_data = json.loads(json_str)
-        else:
-            raise ValueError("No valid JSON found in response")
+        insights_data = parse_llm_json(response)
         
         # Validate and ensure required fields
         if not isinstance(insights_data, dict):
@@ -3276,7 +3772,7 @@ def analyze_symptoms_quick():
         insights_data.setdefault('key_insights', [])
         insights_data.setdefault('symptom_summary', {'primary_concern': 'Symptom analysis'})
         
-        print(f"✅ Analysis complete: {len(insights_data.get('medical_labels', []))} labels extracted")
+        logger.debug("Analysis complete: %s labels extracted", len(insights_data.get('medical_labels', [])))
         
         return jsonify({
             'success': True,
@@ -3285,7 +3781,7 @@ def analyze_symptoms_quick():
         })
         
     except json.JSONDecodeError as e:
-        print(f"❌ JSON parsing error: {str(e)}")
+        logger.error("JSON parsing error: %s", e)
         # Return fallback insights
         fallback_insights = {
             'medical_labels': [
@@ -3321,35 +3817,36 @@ def analyze_symptoms_quick():
         })
         
     except Exception as e:
-        print(f"❌ Error in quick symptom analysis: {str(e)}")
+        logger.error("Error in quick symptom analysis: %s", e)
         return jsonify({
             'success': False,
             'error': f'Analysis failed: {str(e)}'
         })
 
+# Terms that flag a medical document concern as a critical finding
+CRITICAL_TERMS_PATTERN = re.compile(r'critical|severe|abnormal|urgent', re.IGNORECASE)
+
 @app.route('/save_step5', methods=['POST'])
 def save_step5():
     try:
-        print("✅ Starting save_step5")
+        logger.debug("Starting save_step5")
         
         if not validate_session_step(4):
             return jsonify({'success': False, 'error': 'Please complete step 4 first'})
         
+        # One timestamp for everything this request records
+        now_iso = datetime.now().isoformat()
+        
         # Check if this is a modification
         existing_step5 = get_step_data(5)
         is_modification = bool(existing_step5)
         
         # Collect form data
-        form_data = {}
         complaint_fields = [
             'primary_complaint', 'complaint_description', 'symptom_duration',
             'pain_level', 'additional_symptoms', 'complaint_text'
         ]
-        
-        for field in complaint_fields:
-            value = request.form.get(field, '')
-            if value and value.strip():
-                form_data[field] = value.strip()
+        form_data = collect_form_data(complaint_fields)
         
         # Collect AI-generated insights if available
         ai_data = {}
@@ -3362,64 +3859,37 @@ def save_step5():
             generated_questions_str = step4_ai_data.get('generated_questions', '[]')
             
             try:
-                if isinstance(generated_questions_str, str):
-                    generated_questions = json.loads(generated_questions_str)
-                else:
-                    generated_questions = generated_questions_str
-                
-                # Use a set to track unique findings and avoid duplicates
-                unique_findings = {}
-                
-                # Extract unique abnormal findings
-                for question_data in generated_questions:
-                    if isinstance(question_data, dict) and 'abnormal_finding' in question_data:
-                        finding_key = question_data.get('abnormal_finding', '').lower().strip()
-                        if finding_key and finding_key not in unique_findings:
-                            unique_findings[finding_key] = {
-                                'finding': question_data.get('abnormal_finding', ''),
-                                'concern': question_data.get('medical_concern', ''),
-                                'priority': question_data.get('priority', 'normal')
-                            }
-                
-                # Convert to list
-                abnormal_findings = list(unique_findings.values())
-                
-                print(f"✅ Including {len(abnormal_findings)} unique abnormal findings from step4 in step5 data")
-                
-            except Exception as e:
-                print(f"⚠️ Error parsing step4 findings: {e}")
-                abnormal_findings = []
-                
+                abnormal_findings = extract_abnormal_findings(generated_questions_str)
                 ai_data['abnormal_findings'] = abnormal_findings
-                print(f"📊 Included {len(abnormal_findings)} abnormal findings from step4")
+                logger.debug("Included %s abnormal findings from step4", len(abnormal_findings))
             except Exception as e:
-                print(f"⚠️ Error parsing step4 abnormal findings: {e}")
+                logger.warning("Error parsing step4 abnormal findings: %s", e)
         
         # Check if insights were generated and include them
         insights_json = request.form.get('symptom_insights', '')
         if insights_json:
             try:
-                insights_data = json.loads(insights_json)
+                insights_data = json_loads(insights_json)
                 ai_data['symptom_insights'] = insights_data
-                ai_data['insights_generated_at'] = datetime.now().isoformat()
-                print(f"🤖 AI insights included: {len(insights_data.get('medical_labels', []))} labels")
+                ai_data['insights_generated_at'] = now_iso
+                logger.debug("AI insights included: %s labels", len(insights_data.get('medical_labels', [])))
             except json.JSONDecodeError:
-                print("⚠️ Could not parse symptom insights JSON")
+                logger.warning("Could not parse symptom insights JSON")
         
         # Handle medical documentation data from step5 section 2
         medical_docs_json = request.form.get('medical_documents', '')
         if medical_docs_json:
             try:
-                medical_docs = json.loads(medical_docs_json)
+                medical_docs = json_loads(medical_docs_json)
                 ai_data['medical_documents'] = medical_docs
-                ai_data['medical_docs_uploaded_at'] = datetime.now().isoformat()
+                ai_data['medical_docs_uploaded_at'] = now_iso
                 
                 # Extract critical findings from medical documentation
                 critical_findings = []
                 for doc in medical_docs:
                     if doc.get('insights', {}).get('concerns'):
                         for concern in doc['insights']['concerns']:
-                            if any(critical_term in concern.lower() for critical_term in ['critical', 'severe', 'abnormal', 'urgent']):
+                            if CRITICAL_TERMS_PATTERN.search(concern):
                                 critical_findings.append({
                                     'source_document': doc.get('filename', 'Unknown'),
                                     'category': doc.get('category', 'Unknown'),
@@ -3429,32 +3899,29 @@ def save_step5():
                 
                 if critical_findings:
                     ai_data['critical_medical_findings'] = critical_findings
-                    print(f"⚠️ {len(critical_findings)} critical findings identified from medical documents")
+                    logger.warning("%s critical findings identified from medical documents", len(critical_findings))
                 
-                print(f"📄 Medical documentation included: {len(medical_docs)} documents")
+                logger.debug("Medical documentation included: %s documents", len(medical_docs))
             except json.JSONDecodeError:
-                print("⚠️ Could not parse medical documents JSON")
+                logger.warning("Could not parse medical documents JSON")
         
         # Collect follow-up question answers from step 4
-        followup_answers = {}
-        
-        for key in request.form.keys():
-            if key.startswith('followup_answer_'):
-                question_id = key.replace('followup_answer_', '')
-                answer = request.form.get(key, '').strip()
-                if answer:
-                    followup_answers[question_id] = {
-                        'answer': answer,
-                        'answered_at': datetime.now().isoformat(),
-                        'step': 5
-                    }
+        followup_answers = {
+            key[FOLLOWUP_ANSWER_PREFIX_LEN:]: {
+                'answer': answer,
+                'answered_at': now_iso,
+                'step': 5
+            }
+            for key, value in request.form.items()
+            if key.startswith(FOLLOWUP_ANSWER_PREFIX) and (answer := value.strip())
+        }
         
         if followup_answers:
             ai_data['followup_answers'] = followup_answers
-            print(f"📝 Follow-up answers collected: {len(followup_answers)}")
+            logger.debug("Follow-up answers collected: %s", len(followup_answers))
         
-        print(f"📋 Complaints data collected: {len(form_data)} fields")
-        print(f"🤖 AI data collected: {len(ai_data)} sections")
+        logger.debug("Complaints data collected: %s fields", len(form_data))
+        logger.debug("AI data collected: %s sections", len(ai_data))
         
         # Use step-based save function
         success = save_step_based_patient_data(
@@ -3477,7 +3944,7 @@ def save_step5():
         session['patient_data']['step_completed'] = 5
         session.modified = True
         
-        print("✅ Step 5 saved successfully with AI data")
+        logger.debug("Step 5 saved successfully with AI data")
         
         return jsonify({
             'success': True,
@@ -3489,16 +3956,213 @@ def save_step5():
         })
         
     except Exception as e:
-        print(f"❌ Error in save_step5: {str(e)}")
+        logger.error("Error in save_step5: %s", e)
         return jsonify({'success': False, 'error': f'Failed to save step 5: {str(e)}'})
 
 # New endpoints for enhanced Step 5 functionality
 
+# Document analyses run on llm_call_pool; uploads wait this long for the result before returning a job id
+DOCUMENT_ANALYSIS_WAIT = float(os.getenv('DOCUMENT_ANALYSIS_WAIT', '20'))  # seconds
+
+# Most documents accepted by one batch upload, so a single request can't flood llm_call_pool
+MAX_DOCUMENTS_PER_BATCH = int(os.getenv('MAX_DOCUMENTS_PER_BATCH', '5'))
+
+# Document analyses that outlived their upload request, as (future, category) keyed by job id
+document_analysis_jobs = TTLCache(maxsize=256, ttl=15 * 60)
+
+def analyze_medical_document_content(request_analysis, category):
+    """Run a document's LLM analysis and parse it into insights (runs on llm_call_pool)"""
+    try:
+        analysis_text = request_analysis()
+        
+        # Parse the analysis response
+        insights = parse_medical_analysis(analysis_text, category)
+        logger.debug("Parsed insights: %s", insights)
+        
+    except Exception as e:
+        logger.error("Error analyzing document: %r", e)
+        insights = {
+            'general_findings': f'Analysis failed: {str(e)}',
+            'specific_observations': [],
+            'recommendations': 'Please consult with a healthcare provider.',
+            'concerns': ['Unable to complete automated analysis'],
+            'confidence_level': 'Low'
+        }
+    
+    logger.debug("Medical document analyzed (confidence %s)", insights.get('confidence_level'))
+    return insights
+
+def medical_document_analysis_response(insights, category):
+    """JSON response for a completed document analysis"""
+    return jsonify({
+        'success': True,
+        'status': 'complete',
+        'insights': insights,
+        'message': f'{category.title()} document analyzed successfully'
+    })
+
+# File types accepted by the medical document upload endpoints, and the subset sent as images
+MEDICAL_DOCUMENT_IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png'})
+MEDICAL_DOCUMENT_EXTENSIONS = MEDICAL_DOCUMENT_IMAGE_EXTENSIONS | {'.pdf', '.doc', '.docx'}
+
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+# Largest uncompressed word/document.xml accepted; the upload cap only bounds the compressed archive
+MAX_DOCX_XML_SIZE = 4 * MAX_UPLOAD_SIZE
+
+def extract_document_text(stream, file_ext):
+    """
+    Return the text of an uploaded document stream.
+    .docx files are read from word/document.xml (one line per paragraph); anything
+    else is decoded as UTF-8, dropping a BOM and replacing undecodable bytes.
+    Raises ValueError for a .docx whose document.xml exceeds MAX_DOCX_XML_SIZE, and
+    KeyError / zipfile.BadZipFile for a file that is not a valid .docx.
+    """
+    if file_ext == '.docx':
+        with zipfile.ZipFile(stream) as archive:
+            if archive.getinfo('word/document.xml').file_size > MAX_DOCX_XML_SIZE:
+                raise ValueError('The .docx document is too large to process')
+            root = ElementTree.fromstring(archive.read('word/document.xml'))
+        return '\n'.join(
+            ''.join(node.text or '' for node in paragraph.iter(f'{WORD_NAMESPACE}t'))
+            for paragraph in root.iter(f'{WORD_NAMESPACE}p')
+        )
+    return stream.read().decode('utf-8-sig', errors='replace')
+
+# Raw LLM replies for uploaded medical documents, keyed on a hash of the prompt and file content plus model
+medical_document_analysis_cache = TTLCache(maxsize=512, ttl=60 * 60)
+
+def create_document_completion(content_hash, model, messages, max_tokens):
+    """Return the model's reply for a document analysis, reusing a cached reply for the same content and model"""
+    cache_key = (content_hash, model)
+    analysis_text = medical_document_analysis_cache.get(cache_key)
+    if analysis_text is None:
+        response = openai_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens
+        )
+        analysis_text = response.choices[0].message.content
+        if analysis_text:
+            medical_document_analysis_cache.set(cache_key, analysis_text)
+    else:
+        logger.debug("Document analysis served from cache")
+    return analysis_text
+
+def prepare_medical_document_analysis(file, category, model):
+    """
+    Read an uploaded medical document and return (request_analysis, error).
+    request_analysis is a no-argument callable that makes the LLM call and returns
+    the analysis text; it only uses data read here, so it can run after the request
+    ends. On a validation failure it is None and error holds the message.
+    """
+    # Validate file type
+    file_ext = os.path.splitext(file.filename)[1].lower()
+    if file_ext not in MEDICAL_DOCUMENT_EXTENSIONS:
+        return None, 'File type not supported'
+    
+    # Get the appropriate analysis prompt based on category
+    if category == 'laboratory':
+        prompt_name = 'educational_lab_analysis'
+    elif category == 'imaging':
+        prompt_name = 'educational_medical_image_analysis'
+    elif category == 'signaling':
+        prompt_name = 'educational_signal_analysis'
+    elif category == 'multimedia':
+        prompt_name = 'educational_pathology_analysis'
+    else:
+        prompt_name = 'educational_lab_analysis'  # Default
+    
+    # Load the appropriate prompt
+    prompt_content = load_prompt_cached(prompt_name)
+    if not prompt_content:
+        return None, 'Analysis prompt not found'
+    
+    # Read what the analysis needs from the upload here: the request's file stream
+    # is closed once the request ends, but the LLM call may outlive it
+    logger.debug("Starting AI analysis for %s document with model %s", category, model)
+    
+    if file_ext in MEDICAL_DOCUMENT_IMAGE_EXTENSIONS:
+        # Image analysis
+        logger.debug("Processing image file: %s", file.filename)
+        # Encode straight from the upload stream into the data URL, hashing the
+        # prompt and image bytes so a resubmitted upload reuses the earlier reply
+        content_hasher = hashlib.blake2b(prompt_content.encode('utf-8'), digest_size=16)
+        image_data_uri, _ = stream_b64_data_uri(file.stream, f"image/{file_ext[1:]}", hasher=content_hasher)
+        content_hash = content_hasher.hexdigest()
+        
+        def request_analysis():
+            analysis_text = create_document_completion(
+                content_hash,
+                model=model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": prompt_content},
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": image_data_uri
+                                }
+                            }
+                        ]
+                    }
+                ],
+                max_tokens=1000
+            )
+            
+            logger.debug("AI response received: %s characters", len(analysis_text))
+            return analysis_text
+        
+    elif file_ext == '.pdf':
+        # PDF analysis (no PDF text is extracted yet, so the upload itself is not passed on)
+        def request_analysis():
+            return analyze_pdf_with_llm(prompt_content, model)
+        
+    else:
+        # Text document analysis
+        if file_ext == '.doc':
+            # Legacy binary Word files can't be decoded here; fail before spending an LLM call
+            return None, 'Legacy .doc files are not supported. Please upload a .docx or PDF.'
+        try:
+            text_content = extract_document_text(file.stream, file_ext)
+            if not text_content.strip():
+                return None, 'The uploaded document is empty'
+            full_prompt = f"{prompt_content}\n\nDocument content:\n{text_content}"
+            content_hash = hashlib.blake2b(full_prompt.encode('utf-8'), digest_size=16).hexdigest()
+        except (KeyError, zipfile.BadZipFile):
+            return None, 'The uploaded file is not a valid .docx document'
+        except ValueError as e:
+            return None, str(e)
+        except Exception as e:
+            logger.error("Error processing text document: %s", e)
+            full_prompt = None
+        
+        def request_analysis():
+            if full_prompt is None:
+                return "Unable to process document content."
+            try:
+                return create_document_completion(
+                    content_hash,
+                    model=model,
+                    messages=[{"role": "user", "content": full_prompt}],
+                    max_tokens=1000
+                )
+            except Exception as e:
+                logger.error("Error processing text document: %s", e)
+                return "Unable to process document content."
+    
+    return request_analysis, None
+
 @app.route('/upload_medical_document', methods=['POST'])
 def upload_medical_document():
     """Handle medical document upload and AI analysis"""
     try:
-        print("📎 Processing medical document upload...")
+        logger.debug("Processing medical document upload...")
+        
+        # Reject oversized uploads before the multipart body is parsed
+        if request.content_length and request.content_length > MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD_ALLOWANCE:
+            return jsonify({'success': False, 'error': 'File size must be less than 10MB'}), 413
         
         # Get file and form data
         if 'file' not in request.files:
@@ -3507,137 +4171,140 @@ def upload_medical_document():
         file = request.files['file']
         if file.filename == '':
             return jsonify({'success': False, 'error': 'No file selected'})
+        if get_upload_size(file) > MAX_UPLOAD_SIZE:
+            return jsonify({'success': False, 'error': 'File size must be less than 10MB'}), 413
         
         category = request.form.get('category', '')
         caption = request.form.get('caption', '')
         model = request.form.get('model', 'gpt-4o-mini')
         
-        print(f"📋 Upload details - Category: {category}, Model: {model}, File: {file.filename}")
+        logger.debug("Upload details - Category: %s, Model: %s, File: %s", category, model, file.filename)
         
         if not category:
             return jsonify({'success': False, 'error': 'Document category is required'})
         
-        # Validate file type
-        allowed_extensions = {'.pdf', '.jpg', '.jpeg', '.png', '.doc', '.docx'}
-        file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext not in allowed_extensions:
-            return jsonify({'success': False, 'error': 'File type not supported'})
+        request_analysis, error = prepare_medical_document_analysis(file, category, model)
+        if error:
+            return jsonify({'success': False, 'error': error})
         
-        # Process the file based on category
-        insights = {}
+        # Run the LLM call on the shared pool; if it finishes within the wait window the
+        # insights are returned inline, otherwise the client polls with the job id
+        analysis_future = llm_call_pool.submit(analyze_medical_document_content, request_analysis, category)
         try:
-            # Read file content
-            file_content = file.read()
-            
-            # Get the appropriate analysis prompt based on category
-            if category == 'laboratory':
-                prompt_name = 'educational_lab_analysis'
-            elif category == 'imaging':
-                prompt_name = 'educational_medical_image_analysis'
-            elif category == 'signaling':
-                prompt_name = 'educational_signal_analysis'
-            elif category == 'multimedia':
-                prompt_name = 'educational_pathology_analysis'
-            else:
-                prompt_name = 'educational_lab_analysis'  # Default
-            
-            # Load the appropriate prompt
-            prompt_content = load_prompt(prompt_name)
-            if not prompt_content:
-                return jsonify({'success': False, 'error': 'Analysis prompt not found'})
-            
-            # Create analysis request
-            print(f"📋 Starting AI analysis for {category} document with model {model}")
-            
-            if file_ext in ['.jpg', '.jpeg', '.png']:
-                # Image analysis
-                print(f"🖼️ Processing image file: {file.filename}")
-                base64_image = base64.b64encode(file_content).decode('utf-8')
-                
-                response = openai_client.chat.completions.create(
-                    model=model,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": prompt_content},
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/{file_ext[1:]};base64,{base64_image}"
-                                    }
-                                }
-                            ]
-                        }
-                    ],
-                    max_tokens=1000
-                )
-                
-                analysis_text = response.choices[0].message.content
-                print(f"🤖 AI response received: {len(analysis_text)} characters")
-                
-            elif file_ext == '.pdf':
-                # PDF analysis using OCR
-                analysis_text = analyze_pdf_with_llm(file_content, prompt_content, model)
-                
-            else:
-                # Text document analysis
-                try:
-                    if file_ext in ['.doc', '.docx']:
-                        # Handle Word documents (you might need python-docx)
-                        text_content = str(file_content, 'utf-8', errors='ignore')
-                    else:
-                        text_content = str(file_content, 'utf-8')
-                    
-                    full_prompt = f"{prompt_content}\n\nDocument content:\n{text_content}"
-                    
-                    response = openai_client.chat.completions.create(
-                        model=model,
-                        messages=[{"role": "user", "content": full_prompt}],
-                        max_tokens=1000
-                    )
-                    
-                    analysis_text = response.choices[0].message.content
-                    
-                except Exception as e:
-                    print(f"Error processing text document: {e}")
-                    analysis_text = "Unable to process document content."
-            
-            # Parse the analysis response
-            insights = parse_medical_analysis(analysis_text, category)
-            print(f"🔍 Parsed insights: {insights}")
-            
-        except Exception as e:
-            print(f"❌ Error analyzing document: {str(e)}")
-            print(f"❌ Error details: {repr(e)}")
-            insights = {
-                'general_findings': f'Analysis failed: {str(e)}',
-                'specific_observations': [],
-                'recommendations': 'Please consult with a healthcare provider.',
-                'concerns': ['Unable to complete automated analysis'],
-                'confidence_level': 'Low'
-            }
+            insights = analysis_future.result(timeout=DOCUMENT_ANALYSIS_WAIT)
+        except FutureTimeoutError:
+            job_id = str(uuid.uuid4())
+            document_analysis_jobs.set(job_id, (analysis_future, category))
+            logger.info("Document analysis still running after %ss, job %s", DOCUMENT_ANALYSIS_WAIT, job_id)
+            return jsonify({
+                'success': True,
+                'status': 'pending',
+                'job_id': job_id,
+                'poll_url': f'/medical_document_analysis/{job_id}',
+                'message': f'{category.title()} document analysis in progress'
+            }), 202
+        
+        return medical_document_analysis_response(insights, category)
+        
+    except Exception as e:
+        logger.error("Error in upload_medical_document: %s", e)
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/upload_medical_documents', methods=['POST'])
+def upload_medical_documents():
+    """Analyze several medical documents in one request, running their LLM calls concurrently"""
+    try:
+        # Reject oversized batches before the multipart body is parsed
+        max_batch_size = MAX_DOCUMENTS_PER_BATCH * MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD_ALLOWANCE
+        if request.content_length and request.content_length > max_batch_size:
+            return jsonify({
+                'success': False,
+                'error': f'Upload at most {MAX_DOCUMENTS_PER_BATCH} files of less than 10MB each'
+            }), 413
+        
+        files = request.files.getlist('files[]')
+        categories = request.form.getlist('categories[]')
+        model = request.form.get('model', 'gpt-4o-mini')
         
-        print(f"✅ Medical document analyzed successfully")
-        print(f"✅ Insights generated: {insights}")
+        if not files:
+            return jsonify({'success': False, 'error': 'No files uploaded'})
+        if len(files) > MAX_DOCUMENTS_PER_BATCH:
+            return jsonify({
+                'success': False,
+                'error': f'Upload at most {MAX_DOCUMENTS_PER_BATCH} files at a time'
+            }), 413
+        if len(categories) != len(files):
+            return jsonify({'success': False, 'error': 'A document category is required for each file'})
+        
+        logger.debug("Processing %s medical document uploads with model %s", len(files), model)
+        
+        # Read every upload and start its LLM call before waiting on any of them
+        documents = []
+        for file, category in zip(files, categories):
+            future = None
+            if file.filename == '':
+                error = 'No file selected'
+            elif not category:
+                error = 'Document category is required'
+            elif get_upload_size(file) > MAX_UPLOAD_SIZE:
+                error = 'File size must be less than 10MB'
+            else:
+                request_analysis, error = prepare_medical_document_analysis(file, category, model)
+                if error is None:
+                    future = llm_call_pool.submit(analyze_medical_document_content, request_analysis, category)
+            documents.append((file.filename, category, future, error))
+        
+        # All analyses share one wait window; any still running are handed back as job ids
+        deadline = time.monotonic() + DOCUMENT_ANALYSIS_WAIT
+        results = []
+        for filename, category, future, error in documents:
+            result = {'filename': filename, 'category': category}
+            if future is None:
+                result.update(success=False, error=error)
+            else:
+                try:
+                    insights = future.result(timeout=max(0, deadline - time.monotonic()))
+                    result.update(success=True, status='complete', insights=insights)
+                except FutureTimeoutError:
+                    job_id = str(uuid.uuid4())
+                    document_analysis_jobs.set(job_id, (future, category))
+                    result.update(success=True, status='pending', job_id=job_id,
+                                  poll_url=f'/medical_document_analysis/{job_id}')
+            results.append(result)
         
         return jsonify({
             'success': True,
-            'insights': insights,
-            'message': f'{category.title()} document analyzed successfully'
+            'documents': results,
+            'message': f'{len(results)} documents processed'
         })
         
     except Exception as e:
-        print(f"❌ Error in upload_medical_document: {str(e)}")
+        logger.error("Error in upload_medical_documents: %s", e)
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/medical_document_analysis/<job_id>', methods=['GET'])
+def get_medical_document_analysis(job_id):
+    """Poll a document analysis that was still running when its upload request returned"""
+    job = document_analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Analysis job not found or expired'}), 404
+    
+    analysis_future, category = job
+    if not analysis_future.done():
+        return jsonify({'success': True, 'status': 'pending', 'job_id': job_id}), 202
+    
+    return medical_document_analysis_response(analysis_future.result(), category)
+
+# Raw LLM responses for symptom + medical document analyses, keyed on a hash of the full prompt plus model
+symptom_docs_analysis_cache = TTLCache(maxsize=2048, ttl=60 * 60)
+
 @app.route('/analyze_symptoms_with_medical_docs', methods=['POST'])
 def analyze_symptoms_with_medical_docs():
     """Enhanced symptom analysis that includes medical documentation context"""
     try:
-        print("🧠 Starting enhanced symptom analysis with medical documentation...")
+        logger.debug("Starting enhanced symptom analysis with medical documentation...")
         
-        data = request.get_json()
+        data = request.get_json(cache=False)
         symptoms = data.get('symptoms', '').strip()
         medical_documents = data.get('medical_documents', [])
         
@@ -3663,7 +4330,7 @@ def analyze_symptoms_with_medical_docs():
         all_patient_data = get_all_patient_data()
         
         # Load the symptom analysis prompt
-        prompt_content = load_prompt('symptom_analysis')
+        prompt_content = load_prompt_cached('symptom_analysis')
         if not prompt_content:
             return jsonify({'success': False, 'error': 'Analysis prompt not found'})
         
@@ -3680,14 +4347,23 @@ def analyze_symptoms_with_medical_docs():
         Please provide a comprehensive analysis considering both the symptoms and any relevant findings from the uploaded medical documentation. Pay special attention to any critical findings from medical reports that might relate to the current symptoms.
         """
         
-        # Generate AI analysis
-        response = client.chat.completions.create(
-            model="gpt-4.1-nano",
-            messages=[{"role": "user", "content": enhanced_prompt}],
-            max_tokens=1500
-        )
-        
-        analysis_text = response.choices[0].message.content
+        # Generate AI analysis, reusing the response for an identical prompt (same symptoms,
+        # document insights and prompt file) instead of calling the model again
+        model = "gpt-4.1-nano"
+        cache_key = (hashlib.blake2b(enhanced_prompt.encode('utf-8'), digest_size=16).hexdigest(), model)
+        analysis_text = symptom_docs_analysis_cache.get(cache_key)
+        if analysis_text is None:
+            response = openai_client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": enhanced_prompt}],
+                max_tokens=1500
+            )
+            
+            analysis_text = response.choices[0].message.content
+            if analysis_text:
+                symptom_docs_analysis_cache.set(cache_key, analysis_text)
+        else:
+            logger.debug("Symptom analysis with medical docs served from cache")
         
         # Parse analysis into structured format
         insights = parse_symptom_analysis(analysis_text)
@@ -3697,7 +4373,7 @@ def analyze_symptoms_with_medical_docs():
             insights['medical_docs_considered'] = True
             insights['docs_count'] = len(medical_documents)
         
-        print(f"✅ Enhanced symptom analysis completed with {len(medical_documents)} medical documents")
+        logger.debug("Enhanced symptom analysis completed with %s medical documents", len(medical_documents))
         
         return jsonify({
             'success': True,
@@ -3706,9 +4382,24 @@ def analyze_symptoms_with_medical_docs():
         })
         
     except Exception as e:
-        print(f"❌ Error in analyze_symptoms_with_medical_docs: {str(e)}")
+        logger.error("Error in analyze_symptoms_with_medical_docs: %s", e)
         return jsonify({'success': False, 'error': str(e)})
 
+# Section keywords for parse_medical_analysis, checked in order (first matching section wins)
+MEDICAL_ANALYSIS_SECTION_PATTERNS = (
+    ('findings', re.compile(r'finding|result', re.IGNORECASE)),
+    ('observations', re.compile(r'observation|note', re.IGNORECASE)),
+    ('recommendations', re.compile(r'recommend|suggest', re.IGNORECASE)),
+    ('concerns', re.compile(r'concern|abnormal|critical', re.IGNORECASE)),
+)
+
+def match_medical_analysis_section(line):
+    """Return the section an analysis line introduces, or None"""
+    for section, pattern in MEDICAL_ANALYSIS_SECTION_PATTERNS:
+        if pattern.search(line):
+            return section
+    return None
+
 def parse_medical_analysis(analysis_text, category):
     """Parse medical document analysis into structured format"""
     try:
@@ -3722,6 +4413,10 @@ def parse_medical_analysis(analysis_text, category):
         
         lines = analysis_text.split('\n')
         current_section = None
+        findings_parts = []
+        recommendation_parts = []
+        seen_observations = set()
+        seen_concerns = set()
         
         for line in lines:
             line = line.strip()
@@ -3729,30 +4424,33 @@ def parse_medical_analysis(analysis_text, category):
                 continue
                 
             # Detect sections
-            if 'finding' in line.lower() or 'result' in line.lower():
-                current_section = 'findings'
-                insights['general_findings'] += line + ' '
-            elif 'observation' in line.lower() or 'note' in line.lower():
-                current_section = 'observations'
-                if line not in insights['specific_observations']:
+            section = match_medical_analysis_section(line)
+            if section == 'findings':
+                current_section = section
+                findings_parts.append(line)
+            elif section == 'observations':
+                current_section = section
+                if line not in seen_observations:
+                    seen_observations.add(line)
                     insights['specific_observations'].append(line)
-            elif 'recommend' in line.lower() or 'suggest' in line.lower():
-                current_section = 'recommendations'
-                insights['recommendations'] += line + ' '
-            elif 'concern' in line.lower() or 'abnormal' in line.lower() or 'critical' in line.lower():
-                current_section = 'concerns'
-                if line not in insights['concerns']:
+            elif section == 'recommendations':
+                current_section = section
+                recommendation_parts.append(line)
+            elif section == 'concerns':
+                current_section = section
+                if line not in seen_concerns:
+                    seen_concerns.add(line)
                     insights['concerns'].append(line)
             elif current_section:
                 # Continue previous section
                 if current_section == 'findings':
-                    insights['general_findings'] += line + ' '
+                    findings_parts.append(line)
                 elif current_section == 'recommendations':
-                    insights['recommendations'] += line + ' '
+                    recommendation_parts.append(line)
         
-        # Clean up text
-        insights['general_findings'] = insights['general_findings'].strip()
-        insights['recommendations'] = insights['recommendations'].strip()
+        # Join the collected section text
+        insights['general_findings'] = ' '.join(findings_parts)
+        insights['recommendations'] = ' '.join(recommendation_parts)
         
         # Set confidence based on content quality
         if len(insights['general_findings']) > 100:
@@ -3765,7 +4463,7 @@ def parse_medical_analysis(analysis_text, category):
         return insights
         
     except Exception as e:
-        print(f"Error parsing medical analysis: {e}")
+        logger.error("Error parsing medical analysis: %s", e)
         return {
             'general_findings': analysis_text[:200] + '...' if len(analysis_text) > 200 else analysis_text,
             'specific_observations': [],
@@ -3774,6 +4472,9 @@ def parse_medical_analysis(analysis_text, category):
             'confidence_level': 'Low'
         }
 
+# Medical terms that turn a symptom analysis line into a label
+SYMPTOM_ANALYSIS_TERMS_PATTERN = re.compile(r'symptom|condition|syndrome|disease', re.IGNORECASE)
+
 def parse_symptom_analysis(analysis_text):
     """Parse symptom analysis text into structured format"""
     try:
@@ -3787,7 +4488,7 @@ def parse_symptom_analysis(analysis_text):
                 continue
                 
             # Look for medical terminology and create labels
-            if any(term in line.lower() for term in ['symptom', 'condition', 'syndrome', 'disease']):
+            if SYMPTOM_ANALYSIS_TERMS_PATTERN.search(line):
                 label = {
                     'label': line[:50],  # First 50 chars as label
                     'category': 'Symptom Analysis',
@@ -3804,21 +4505,21 @@ def parse_symptom_analysis(analysis_text):
         }
         
     except Exception as e:
-        print(f"Error parsing symptom analysis: {e}")
+        logger.error("Error parsing symptom analysis: %s", e)
         return {
             'medical_labels': [],
             'analysis_text': analysis_text,
             'generated_at': datetime.now().isoformat()
         }
 
-def analyze_pdf_with_llm(pdf_content, prompt, model="gpt-4.1-nano"):
-    """Analyze PDF content using OCR and LLM"""
+def analyze_pdf_with_llm(prompt, model="gpt-4.1-nano"):
+    """Return general LLM guidance for an uploaded PDF; no PDF text is extracted yet"""
     try:
         # This is a simplified implementation
         # In a full implementation, you'd use OCR to extract text from PDF
         
         # For now, return a generic analysis
-        response = client.chat.completions.create(
+        response = openai_client.chat.completions.create(
             model=model,
             messages=[{"role": "user", "content": f"{prompt}\n\nNote: PDF content analysis - please provide general medical document analysis guidance."}],
             max_tokens=800
@@ -3827,7 +4528,7 @@ def analyze_pdf_with_llm(pdf_content, prompt, model="gpt-4.1-nano"):
         return response.choices[0].message.content
         
     except Exception as e:
-        print(f"Error analyzing PDF: {e}")
+        logger.error("Error analyzing PDF: %s", e)
         return "Unable to analyze PDF document. Please consult with a healthcare provider."
 
 # Step 6: Complaint Analysis
@@ -3898,6 +4599,55 @@ def save_step6():
         print(f"❌ Error in save_step6: {str(e)}")
         return jsonify({'success': False, 'error': f'Failed to save step 6: {str(e)}'})
 
+def submit_step7_case(step7_data, session_id, patient_email):
+    """
+    Insert a step 7 case unless this session already has one, in a single SQLite transaction.
+    Returns (case_number, already_submitted), or (None, False) if the database is unavailable.
+    The connection is released before returning.
+    """
+    # Serialize before taking the write lock
+    step7_json_data = json_dumps_compact(step7_data)
+    
+    connection = get_sqlite_connection()
+    if not connection:
+        return None, False
+    try:
+        cursor = connection.cursor()
+        
+        # Take the write lock up front so a concurrent submission for the
+        # same session can't pass the duplicate check before this insert
+        cursor.execute("BEGIN IMMEDIATE")
+        
+        # Search for existing case with same patient email and session (idx_cases_email_session)
+        cursor.execute("""
+            SELECT case_number FROM cases 
+            WHERE json_extract(details, '$.patient_email') = ? 
+            AND json_extract(details, '$.session_id') = ?
+            ORDER BY case_number DESC 
+            LIMIT 1
+        """, (patient_email, session_id))
+        
+        existing_case = cursor.fetchone()
+        if existing_case:
+            connection.rollback()
+            return existing_case[0], True
+        
+        # Generate unique case number
+        case_number = generate_case_number(connection)
+        print(f"📋 Generated case number: {case_number}")
+        
+        cursor.execute("""
+            INSERT INTO cases (case_number, details, status) 
+            VALUES (?, ?, ?)
+        """, (case_number, step7_json_data, 'pending_review'))
+        
+        connection.commit()
+        cursor.close()
+        return case_number, False
+    finally:
+        # Closing without a commit rolls back anything left open
+        connection.close()
+
 @app.route('/save_step7_complete', methods=['POST'])
 def save_step7_complete():
     """Save complete step7 data including clinical summary, ICD codes, and user feedback"""
@@ -3908,10 +4658,13 @@ def save_step7_complete():
             return jsonify({'success': False, 'error': 'Please complete step 6 first'})
         
         # Get JSON data from request
-        data = request.get_json()
+        data = request.get_json(cache=False)
         if not data:
             return jsonify({'success': False, 'error': 'No data provided'})
         
+        # One timestamp for everything this request records
+        now_iso = datetime.now().isoformat()
+        
         # Extract all components
         clinical_summary = data.get('clinical_summary', '')
         original_clinical_summary = data.get('original_clinical_summary', '')
@@ -3922,7 +4675,7 @@ def save_step7_complete():
         analysis_notes = data.get('analysis_notes', '')
         recommendations = data.get('recommendations', [])
         system_analysis = data.get('system_analysis', {})
-        completion_timestamp = data.get('completion_timestamp', datetime.now().isoformat())
+        completion_timestamp = data.get('completion_timestamp', now_iso)
         session_duration = data.get('session_duration', 0)
         final_codes_count = data.get('final_codes_count', 0)
         total_eliminations = data.get('total_eliminations', 0)
@@ -3950,7 +4703,7 @@ def save_step7_complete():
             'analysis_notes': analysis_notes,
             'clinical_recommendations': recommendations,
             'system_analysis': system_analysis,
-            'generation_timestamp': datetime.now().isoformat()
+            'generation_timestamp': now_iso
         }
         
         # Prepare files data (if any documents were uploaded or generated)
@@ -4006,75 +4759,39 @@ def save_step7_complete():
                 patient_email = step7_data.get('patient_email', '')
                 
                 try:
-                    # Check if case already exists for this session/patient
-                    connection = get_sqlite_connection()
-                    if connection:
-                        cursor = connection.cursor()
-                        
-                        # Search for existing case with same patient email and recent timestamp
-                        cursor.execute("""
-                            SELECT case_number FROM cases 
-                            WHERE details LIKE ? 
-                            AND details LIKE ?
-                            ORDER BY case_number DESC 
-                            LIMIT 1
-                        """, (f'%"patient_email": "{patient_email}"%', f'%"session_id": "{session_id}"%'))
-                        
-                        existing_case = cursor.fetchone()
-                        cursor.close()
-                        connection.close()
-                        
-                        if existing_case:
-                            print(f"⚠️ Case already exists for this session: {existing_case[0]}")
-                            print("🔄 Skipping duplicate case submission")
-                            
-                            # Return success with existing case info
-                            return jsonify({
-                                'success': True,
-                                'message': 'Step 7 completed successfully',
-                                'case_submitted': True,
-                                'case_number': existing_case[0],
-                                'case_status': 'already_submitted',
-                                'submission_message': f'Assessment completed! Your case {existing_case[0]} has already been submitted for expert review.',
-                                'data': {
-                                    'step_completed': 7,
-                                    'total_icd_codes': total_icd_codes,
-                                    'total_diagnostic_tests': total_tests,
-                                    'total_eliminations': total_eliminations_count,
-                                    'step_status': step_status,
-                                    'session_duration_minutes': round(session_duration / 60000, 2) if session_duration > 0 else 0,
-                                    'saved_timestamp': datetime.now().isoformat(),
-                                    'case_number': existing_case[0]
-                                }
-                            })
-                    
-                    # Generate unique case number
-                    case_number = generate_case_number()
-                    print(f"📋 Generated case number: {case_number}")
+                    # The helper releases its connection before returning, so the response
+                    # below is built without holding the database
+                    case_number, already_submitted = submit_step7_case(step7_data, session_id, patient_email)
                     
-                    # Prepare step7 data as JSON string for database
-                    step7_json_data = json.dumps(step7_data, indent=2, default=str)
-                    
-                    # Insert into SQLite database
-                    connection = get_sqlite_connection()
-                    if connection:
-                        cursor = connection.cursor()
-                        
-                        insert_query = """
-                            INSERT INTO cases (case_number, details, status) 
-                            VALUES (?, ?, ?)
-                        """
+                    if case_number is None:
+                        print("❌ Could not connect to database for case submission")
                         
-                        cursor.execute(insert_query, (
-                            case_number,
-                            step7_json_data,
-                            'pending_review'
-                        ))
+                    elif already_submitted:
+                        print(f"⚠️ Case already exists for this session: {case_number}")
+                        print("🔄 Skipping duplicate case submission")
                         
-                        connection.commit()
-                        cursor.close()
-                        connection.close()
+                        # Return success with existing case info
+                        return jsonify({
+                            'success': True,
+                            'message': 'Step 7 completed successfully',
+                            'case_submitted': True,
+                            'case_number': case_number,
+                            'case_status': 'already_submitted',
+                            'submission_message': f'Assessment completed! Your case {case_number} has already been submitted for expert review.',
+                            'data': {
+                                'step_completed': 7,
+                                'total_icd_codes': total_icd_codes,
+                                'total_diagnostic_tests': total_tests,
+                                'total_eliminations': total_eliminations_count,
+                                'step_status': step_status,
+                                'session_duration_minutes': round(session_duration / 60000, 2) if session_duration > 0 else 0,
+                                'saved_timestamp': now_iso,
+                                'case_number': case_number
+                            }
+                        })
                         
+                    else:
+                        case_details_cache.pop(case_number)
                         print(f"✅ Case {case_number} submitted successfully to database!")
                         
                         # Return success with case submission details
@@ -4092,14 +4809,11 @@ def save_step7_complete():
                                 'total_eliminations': total_eliminations_count,
                                 'step_status': step_status,
                                 'session_duration_minutes': round(session_duration / 60000, 2) if session_duration > 0 else 0,
-                                'saved_timestamp': datetime.now().isoformat(),
+                                'saved_timestamp': now_iso,
                                 'case_number': case_number
                             }
                         })
                         
-                    else:
-                        print("❌ Could not connect to database for case submission")
-                        
                 except Exception as case_error:
                     print(f"❌ Error in case submission: {case_error}")
                     
@@ -4121,7 +4835,7 @@ def save_step7_complete():
                 'total_eliminations': total_eliminations_count,
                 'step_status': step_status,
                 'session_duration_minutes': round(session_duration / 60000, 2) if session_duration > 0 else 0,
-                'saved_timestamp': datetime.now().isoformat()
+                'saved_timestamp': now_iso
             }
         })
         
@@ -4135,19 +4849,20 @@ def save_step7_complete():
 def save_expert_review_data():
     """Save comprehensive step7 data for expert review submission"""
     try:
-        print("✅ Starting save_expert_review_data for expert review submission")
+        logger.debug("Starting save_expert_review_data for expert review submission")
         
         if not validate_session_step(6):
             return jsonify({'success': False, 'error': 'Please complete step 6 first'})
         
         # Get JSON data from request
-        data = request.get_json()
+        data = request.get_json(cache=False)
         if not data:
             return jsonify({'success': False, 'error': 'No data provided'})
         
         # Extract step7 data package
         step7_data = data.get('step7_data', {})
-        timestamp = data.get('timestamp', datetime.now().isoformat())
+        now_iso = datetime.now().isoformat()
+        timestamp = data.get('timestamp', now_iso)
         
         # Extract comprehensive data components
         clinical_summary = step7_data.get('clinical_summary', '')
@@ -4159,14 +4874,19 @@ def save_expert_review_data():
         analysis_notes = step7_data.get('analysis_notes', '')
         completion_status = step7_data.get('completion_status', 'submitted_for_expert_review')
         
+        # Summary statistics, reused by the stored form data, the log and the response
+        total_icd_codes = len(icd_codes)
+        total_tests = len(recommended_lab_tests)
+        total_questions = len(elimination_history)
+        
         # Prepare comprehensive form data for expert review
         form_data = {
             'expert_review_submitted': True,
             'submission_timestamp': timestamp,
             'completion_status': completion_status,
-            'total_icd_codes': len(icd_codes),
-            'total_lab_tests': len(recommended_lab_tests),
-            'differential_questions_answered': len(elimination_history)
+            'total_icd_codes': total_icd_codes,
+            'total_lab_tests': total_tests,
+            'differential_questions_answered': total_questions
         }
         
         # Prepare comprehensive AI-generated data for expert review
@@ -4179,7 +4899,7 @@ def save_expert_review_data():
             'recommended_lab_tests': recommended_lab_tests,
             'analysis_notes': analysis_notes,
             'expert_review_package_created': True,
-            'generation_timestamp': datetime.now().isoformat(),
+            'generation_timestamp': now_iso,
             'submission_for_review_timestamp': timestamp
         }
         
@@ -4208,18 +4928,9 @@ def save_expert_review_data():
         session['patient_data']['expert_review_timestamp'] = timestamp
         session.modified = True
         
-        # Calculate comprehensive summary statistics
-        total_icd_codes = len(icd_codes)
-        total_tests = len(recommended_lab_tests)
-        total_questions = len(elimination_history)
-        
-        print(f"✅ Expert review data saved successfully:")
-        print(f"   📋 Clinical summary: {len(clinical_summary)} characters")
-        print(f"   👤 Patient data: {len(patient_data_summary)} characters")
-        print(f"   🏥 ICD codes: {total_icd_codes}")
-        print(f"   ❓ Differential questions: {total_questions}")
-        print(f"   🔬 Lab tests: {total_tests}")
-        print(f"   📝 Analysis notes: {len(analysis_notes)} characters")
+        logger.info("Expert review data saved: ICD codes %s, differential questions %s, lab tests %s", total_icd_codes, total_questions, total_tests)
+        logger.debug("Expert review sizes: clinical summary %s chars, patient data %s chars, analysis notes %s chars",
+                     len(clinical_summary), len(patient_data_summary), len(analysis_notes))
         
         return jsonify({
             'success': True,
@@ -4235,19 +4946,49 @@ def save_expert_review_data():
         })
         
     except Exception as e:
-        print(f"❌ Error in save_expert_review_data: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in save_expert_review_data: %s", e)
         return jsonify({'success': False, 'error': f'Failed to save expert review data: {str(e)}'})
 
+# Single background writer for feedback files, so submissions don't wait on disk I/O
+feedback_write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='feedback-write')
+
+# Feedback entries are appended as one JSON line each to FEEDBACK_LOG_PATH. Feedback images
+# are sharded into subdirectories by the first two hex characters of the feedback id
+# (256 shards), so no single directory grows without bound
+FEEDBACK_DIR = os.path.join(APP_DATA_DIR, 'feedback')
+FEEDBACK_LOG_PATH = os.path.join(FEEDBACK_DIR, 'entries.jsonl')
+os.makedirs(FEEDBACK_DIR, exist_ok=True)
+created_feedback_dirs = set()
+
+def get_feedback_dir(feedback_id):
+    """Return the shard directory for a feedback id, creating it on first use"""
+    feedback_dir = os.path.join(FEEDBACK_DIR, feedback_id[:2])
+    if feedback_dir not in created_feedback_dirs:
+        os.makedirs(feedback_dir, exist_ok=True)
+        created_feedback_dirs.add(feedback_dir)
+    return feedback_dir
+
+def append_feedback_entry(entry):
+    """Append a feedback entry as one JSON line to the feedback log (runs on feedback_write_pool)"""
+    try:
+        line = json_dumps_compact(entry).encode('utf-8') + b'\n'
+        with open(FEEDBACK_LOG_PATH, 'ab') as f:
+            # The single writer thread orders appends within a process; the lock covers
+            # other worker processes sharing the log
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(line)
+    except (OSError, TypeError, ValueError) as e:
+        logger.error("Failed to append feedback %s: %s", entry.get('feedback_id'), e)
+
 @app.route('/save_feedback', methods=['POST'])
 def save_feedback():
     """Save user feedback about the AI assessment system"""
     try:
-        print("✅ Starting save_feedback")
+        logger.debug("Starting save_feedback")
         
         # Get JSON data from request
-        data = request.get_json()
+        data = request.get_json(cache=False)
         if not data:
             return jsonify({'success': False, 'error': 'No feedback data provided'})
         
@@ -4255,30 +4996,24 @@ def save_feedback():
         if not feedback_text:
             return jsonify({'success': False, 'error': 'Feedback text is empty'})
         
+        now_iso = datetime.now().isoformat()
+        
         # Create feedback entry
         feedback_entry = {
             'feedback': feedback_text,
-            'timestamp': data.get('timestamp', datetime.now().isoformat()),
+            'timestamp': data.get('timestamp', now_iso),
             'session_id': data.get('session_id', session.get('patient_id', 'unknown')),
             'username': session.get('username', 'anonymous'),
-            'submitted_at': datetime.now().isoformat()
+            'submitted_at': now_iso,
+            'feedback_id': str(uuid.uuid4())[:8]
         }
+        feedback_id = feedback_entry['feedback_id']
         
-        # Save feedback to a separate file
-        feedback_dir = os.path.join(APP_DATA_DIR, 'feedback')
-        os.makedirs(feedback_dir, exist_ok=True)
-        
-        # Generate unique feedback filename
-        feedback_id = str(uuid.uuid4())[:8]
-        feedback_filename = f'feedback_{datetime.now().strftime("%Y%m%d")}_{feedback_id}.json'
-        feedback_path = os.path.join(feedback_dir, feedback_filename)
-        
-        # Save feedback
-        with open(feedback_path, 'w') as f:
-            json.dump(feedback_entry, f, indent=2)
+        # Append feedback to the feedback log on the background writer
+        feedback_write_pool.submit(append_feedback_entry, feedback_entry)
         
-        print(f"✅ Feedback saved successfully to {feedback_path}")
-        print(f"Feedback preview: {feedback_text[:100]}...")
+        logger.info("Feedback %s queued for saving", feedback_id)
+        logger.debug("Feedback preview: %s...", feedback_text[:100])
         
         return jsonify({
             'success': True,
@@ -4290,9 +5025,7 @@ def save_feedback():
         })
         
     except Exception as e:
-        print(f"❌ Error in save_feedback: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in save_feedback: %s", e)
         return jsonify({'success': False, 'error': f'Failed to save feedback: {str(e)}'})
 
 
@@ -4300,7 +5033,7 @@ def save_feedback():
 def save_feedback_with_images():
     """Save user feedback with optional multiple image attachments"""
     try:
-        print("✅ Starting save_feedback_with_images")
+        logger.debug("Starting save_feedback_with_images")
         
         # Get form data
         feedback_text = request.form.get('feedback', '').strip()
@@ -4310,28 +5043,31 @@ def save_feedback_with_images():
         session_id = request.form.get('session_id', session.get('patient_id', 'unknown'))
         image_count = int(request.form.get('image_count', 0))
         
+        now = datetime.now()
+        now_iso = now.isoformat()
+        
         # Generate consistent naming convention
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp_str = now.strftime("%Y%m%d_%H%M%S")
         feedback_id = str(uuid.uuid4())[:8]
         base_name = f"feedback_{timestamp_str}_{feedback_id}"
         
         # Create feedback entry
         feedback_entry = {
             'feedback': feedback_text,
-            'timestamp': request.form.get('timestamp', datetime.now().isoformat()),
+            'timestamp': request.form.get('timestamp', now_iso),
             'session_id': session_id,
             'username': session.get('username', 'anonymous'),
-            'submitted_at': datetime.now().isoformat(),
+            'submitted_at': now_iso,
             'feedback_id': feedback_id,
             'images': [],
             'image_count': image_count
         }
         
-        # Create feedback directory
-        feedback_dir = os.path.join(APP_DATA_DIR, 'feedback')
-        os.makedirs(feedback_dir, exist_ok=True)
+        # Create feedback shard directory
+        feedback_dir = get_feedback_dir(feedback_id)
         
-        # Save uploaded images with consistent naming
+        # Stream uploaded images to disk with consistent naming (the request's file streams
+        # close when it ends); the feedback JSON goes to the background writer afterwards
         saved_images = []
         for i in range(image_count):
             image_key = f'image_{i}'
@@ -4348,79 +5084,74 @@ def save_feedback_with_images():
                     image_path = os.path.join(feedback_dir, image_filename)
                     
                     # Save image
-                    image_file.save(image_path)
+                    image_size = save_upload_stream(image_file.stream, image_path)
                     
                     # Add to feedback entry
                     image_info = {
                         'filename': image_filename,
                         'original_name': image_file.filename,
                         'path': image_path,
-                        'size': os.path.getsize(image_path),
-                        'uploaded_at': datetime.now().isoformat()
+                        'size': image_size,
+                        'uploaded_at': now_iso
                     }
                     saved_images.append(image_info)
                     feedback_entry['images'].append(image_info)
                     
-                    print(f"✅ Image saved: {image_filename}")
+                    logger.debug("Image saved: %s", image_filename)
         
         # Update image count with actually saved images
         feedback_entry['image_count'] = len(saved_images)
         
-        # Save feedback JSON with consistent naming
-        feedback_filename = f'{base_name}.json'
-        feedback_path = os.path.join(feedback_dir, feedback_filename)
+        # Append feedback to the feedback log on the background writer
+        feedback_write_pool.submit(append_feedback_entry, feedback_entry)
         
-        with open(feedback_path, 'w') as f:
-            json.dump(feedback_entry, f, indent=2)
-        
-        print(f"✅ Feedback with {len(saved_images)} images saved successfully")
-        print(f"Feedback file: {feedback_filename}")
-        print(f"Feedback preview: {feedback_text[:100]}...")
+        logger.info("Feedback %s with %s images queued for saving", feedback_id, len(saved_images))
+        logger.debug("Feedback preview: %s...", feedback_text[:100])
         
         return jsonify({
             'success': True,
             'message': f'Feedback and {len(saved_images)} images saved successfully',
             'data': {
                 'feedback_id': feedback_id,
-                'feedback_filename': feedback_filename,
                 'images_saved': len(saved_images),
                 'saved_timestamp': feedback_entry['submitted_at']
             }
         })
         
     except Exception as e:
-        print(f"❌ Error in save_feedback_with_images: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in save_feedback_with_images: %s", e)
         return jsonify({'success': False, 'error': f'Failed to save feedback with images: {str(e)}'})
 
 @app.route('/save_question_responses', methods=['POST'])
 def save_question_responses():
     """Save responses to follow-up questions from step 6 with complete question data"""
     try:
-        print("✅ Starting save_question_responses")
+        logger.debug("Starting save_question_responses")
         
         if not validate_session_step(5):
             return jsonify({'success': False, 'error': 'Please complete step 5 first'})
         
-        data = request.get_json()
+        data = request.get_json(cache=False)
         responses = data.get('responses', {})
         original_questions = data.get('original_questions', [])
         analysis_data = data.get('analysis_data', {})
+        responses_count = len(responses)
+        original_questions_count = len(original_questions)
+        completion_rate = responses_count / original_questions_count if original_questions_count else 0
+        now_iso = datetime.now().isoformat()
         
-        print(f"📝 Received {len(responses)} question responses")
-        print(f"📋 Received {len(original_questions)} original questions")
-        print(f"🔍 DEBUG: analysis_data received: {analysis_data}")
+        logger.debug("Received %s question responses for %s original questions", responses_count, original_questions_count)
+        logger.debug("analysis_data received: %s", analysis_data)
         
         # Prepare comprehensive responses data for storage
         responses_data = {
             'question_responses': responses,
             'original_questions': original_questions,
             'analysis_metadata': analysis_data,
-            'total_questions_generated': len(original_questions),
-            'total_questions_answered': len(responses),
-            'completion_rate': len(responses) / len(original_questions) if original_questions else 0,
-            'completed_at': datetime.now().isoformat(),
+            'total_questions_generated': original_questions_count,
+            'total_questions_answered': responses_count,
+            'completion_rate': completion_rate,
+            'completed_at': now_iso,
             'session_data': {
                 'questions_generated_from': {
                     'step3_vitals': True,
@@ -4434,116 +5165,81 @@ def save_question_responses():
             }
         }
         
-        # Also prepare organized Q&A pairs for easy access
-        qa_pairs = []
-        for response_index, response_data in responses.items():
-            qa_pair = {
-                'question_index': int(response_index),
+        # Also prepare organized Q&A pairs for easy access (response keys are question indexes)
+        responses_data['organized_qa_pairs'] = [
+            {
+                'question_index': question_index,
                 'question_text': response_data.get('question', ''),
                 'question_category': response_data.get('category', ''),
                 'answer': response_data.get('answer_value', ''),
                 'answered_at': response_data.get('timestamp', ''),
-                'original_question_data': original_questions[int(response_index)] if int(response_index) < len(original_questions) else {}
+                'original_question_data': original_questions[question_index] if question_index < original_questions_count else {}
             }
-            qa_pairs.append(qa_pair)
-        
-        responses_data['organized_qa_pairs'] = qa_pairs
-        
-        # Update step 6 data with comprehensive responses
-        success = save_step_based_patient_data(
-            step_number=6,
-            form_data={
-                'question_responses_completed': True,
-                'questions_answered': len(responses),
-                'questions_generated': len(original_questions)
-            },
-            ai_data=responses_data,
-            files_data={}
-        )
-        
-        if not success:
-            return jsonify({'success': False, 'error': 'Failed to save question responses'})
+            for question_index, response_data in ((int(key), value) for key, value in responses.items())
+        ]
         
-        # Update session to mark step 6 as completed
-        if 'patient_data' not in session:
-            session['patient_data'] = {}
-        session['patient_data']['step_completed'] = 6
-        session.modified = True
+        # Check if questions were skipped to hide summary from user
+        questions_skipped = analysis_data.get('questions_skipped', False)
+        questions_answered = responses_count
         
-        print("✅ Question responses and questions saved successfully")
-        print(f"   📊 Questions generated: {len(original_questions)}")
-        print(f"   📝 Questions answered: {len(responses)}")
-        print(f"   📈 Completion rate: {len(responses)/len(original_questions)*100:.1f}%")
+        logger.debug("Questions skipped: %s, questions answered: %s", questions_skipped, questions_answered)
         
-        # Generate clinical summary for popup
-        print("🏥 Generating clinical summary...")
-        summary_result = generate_clinical_summary()
+        # Generate clinical summary for popup. Step 6 is written once, after the summary, so
+        # the new Q&A pairs are passed in rather than read back from the patient data file.
+        logger.debug("Generating clinical summary...")
+        summary_result = generate_clinical_summary(load_patient_data_readonly(), responses_data['organized_qa_pairs'])
         clinical_summary = ""
         summary_success = False
         
         if summary_result and summary_result.get("success"):
             clinical_summary = summary_result.get("clinical_summary", "")
             summary_success = True
-            print(f"✅ Clinical summary generated successfully: {len(clinical_summary)} characters")
+            logger.debug("Clinical summary generated: %s characters", len(clinical_summary))
         else:
-            print(f"❌ Clinical summary generation failed: {summary_result}")
+            logger.error("Clinical summary generation failed: %s", summary_result)
             clinical_summary = "Clinical summary could not be generated at this time."
         
-        # Check if questions were skipped to hide summary from user
-        analysis_data = data.get('analysis_data', {})
-        questions_skipped = analysis_data.get('questions_skipped', False)
-        questions_answered = len(responses)
-        
-        print(f"🔍 Questions skipped: {questions_skipped}, Questions answered: {questions_answered}")
-        
-        # IMPORTANT: Save clinical summary to file storage BEFORE returning response
-        print("💾 Saving clinical summary to file storage...")
-        
-        # Get existing step6 AI data 
-        existing_patient_data = load_patient_data()
-        existing_step6 = existing_patient_data.get('step6', {}) if existing_patient_data else {}
-        existing_ai_data = existing_step6.get('ai_generated_data', {})
-        
-        # Prepare clinical summary data for storage
-        clinical_summary_data = {
-            'clinical_summary': clinical_summary,
-            'summary_generated_at': datetime.now().isoformat(),
-            'assessment_completed': True,
-            'final_review_status': 'completed',
-            'questions_skipped': questions_skipped,
-            'questions_answered': questions_answered
-        }
-        
-        # Preserve existing AI data and add clinical summary data
-        if existing_ai_data:
-            clinical_summary_data.update(existing_ai_data)
-            clinical_summary_data.update({
-                'clinical_summary': clinical_summary,
-                'summary_generated_at': datetime.now().isoformat(),
-                'assessment_completed': True,
-                'final_review_status': 'completed',
-                'questions_skipped': questions_skipped,
-                'questions_answered': questions_answered
-            })
-        
-        # Save clinical summary to step 6 data
+        # IMPORTANT: Save responses and clinical summary to file storage BEFORE returning response,
+        # in a single step 6 write
+        logger.debug("Saving question responses and clinical summary to file storage...")
+        summary_generated_at = datetime.now().isoformat()
         save_success = save_step_based_patient_data(
             step_number=6,
             form_data={
+                'question_responses_completed': True,
+                'questions_answered': questions_answered,
+                'questions_generated': original_questions_count,
                 'assessment_completed': True,
                 'clinical_summary_saved': True,
-                'final_completion_timestamp': datetime.now().isoformat()
+                'final_completion_timestamp': summary_generated_at
+            },
+            ai_data=responses_data | {
+                'clinical_summary': clinical_summary,
+                'summary_generated_at': summary_generated_at,
+                'assessment_completed': True,
+                'final_review_status': 'completed',
+                'questions_skipped': questions_skipped,
+                'questions_answered': questions_answered,
+                # Resolved once here so check_questions_skipped_status is a single lookup
+                'step6_skip_status': {
+                    'skipped': bool(questions_skipped) and responses_count == 0,
+                    'answered_count': questions_answered
+                }
             },
-            ai_data=clinical_summary_data,
             files_data={}
         )
         
-        if save_success:
-            print("✅ Clinical summary saved successfully to step6 data")
-            print(f"   📝 Summary length: {len(clinical_summary)} characters")
-            print(f"   ⏰ Saved at: {datetime.now().isoformat()}")
-        else:
-            print("❌ Failed to save clinical summary to file storage")
+        if not save_success:
+            return jsonify({'success': False, 'error': 'Failed to save question responses'})
+        
+        # Update session to mark step 6 as completed
+        if 'patient_data' not in session:
+            session['patient_data'] = {}
+        session['patient_data']['step_completed'] = 6
+        session.modified = True
+        
+        logger.info("Question responses and clinical summary saved: %s/%s answered (%.1f%%), summary %s characters",
+                    responses_count, original_questions_count, completion_rate * 100, len(clinical_summary))
         
         # Prepare response - hide clinical summary from user but still save it in background
         response_data = {
@@ -4554,38 +5250,40 @@ def save_question_responses():
             'summary_generated': summary_success,
             'summary_saved': save_success,
             'data': {
-                'responses_count': len(responses),
-                'questions_count': len(original_questions),
-                'completion_rate': len(responses) / len(original_questions) if original_questions else 0,
+                'responses_count': responses_count,
+                'questions_count': original_questions_count,
+                'completion_rate': completion_rate,
                 'redirect_url': '/step7'
             }
         }
         
         # Clinical summary is saved in file storage and not sent to frontend
-        print(f"📋 Clinical summary processing complete - Generated: {summary_success}, Saved: {save_success}")
+        logger.debug("Clinical summary processing complete - generated: %s, saved: %s", summary_success, save_success)
         
         return jsonify(response_data)
         
     except Exception as e:
-        print(f"❌ Error in save_question_responses: {str(e)}")
+        logger.exception("Error in save_question_responses: %s", e)
         return jsonify({'success': False, 'error': f'Failed to save responses: {str(e)}'})
 
 @app.route('/save_clinical_summary', methods=['POST'])
 def save_clinical_summary():
     """Save the clinical summary when user clicks Complete Assessment in the popup"""
     try:
-        print("✅ Starting save_clinical_summary")
+        logger.debug("Starting save_clinical_summary")
         
         if not validate_session_step(5):
             return jsonify({'success': False, 'error': 'Please complete step 5 first'})
         
-        data = request.get_json()
+        data = request.get_json(cache=False)
         clinical_summary = data.get('clinical_summary', '')
         
         if not clinical_summary:
             return jsonify({'success': False, 'error': 'No clinical summary provided'})
         
-        print(f"📝 Received clinical summary: {len(clinical_summary)} characters")
+        summary_length = len(clinical_summary)
+        now_iso = datetime.now().isoformat()
+        logger.debug("Received clinical summary: %s characters", summary_length)
         
         # Load existing patient data to preserve skip information
         existing_patient_data = load_patient_data()
@@ -4595,29 +5293,20 @@ def save_clinical_summary():
         # Preserve existing analysis_metadata (contains questions_skipped flag)
         existing_analysis_metadata = existing_ai_data.get('analysis_metadata', {})
         
-        print(f"🔍 DEBUG: Preserving existing analysis_metadata: {existing_analysis_metadata}")
+        logger.debug("Preserving existing analysis_metadata: %s", existing_analysis_metadata)
         
-        # Prepare clinical summary data for storage
+        # Prepare clinical summary data for storage, preserving existing AI data
+        # (the clinical summary fields take precedence)
         clinical_summary_data = {
             'clinical_summary': clinical_summary,
-            'summary_accepted_at': datetime.now().isoformat(),
+            'summary_accepted_at': now_iso,
             'assessment_completed': True,
             'final_review_status': 'completed',
             'user_action': 'clicked_complete_assessment'
         }
-        
-        # Preserve existing AI data and add clinical summary data
         if existing_ai_data:
-            # Merge existing data with new clinical summary data
-            clinical_summary_data.update(existing_ai_data)
-            clinical_summary_data.update({
-                'clinical_summary': clinical_summary,
-                'summary_accepted_at': datetime.now().isoformat(),
-                'assessment_completed': True,
-                'final_review_status': 'completed',
-                'user_action': 'clicked_complete_assessment'
-            })
-            print(f"🔍 DEBUG: Merged ai_data keys: {list(clinical_summary_data.keys())}")
+            clinical_summary_data = existing_ai_data | clinical_summary_data
+            logger.debug("Merged ai_data keys: %s", list(clinical_summary_data))
         
         # Update step 6 data with clinical summary
         success = save_step_based_patient_data(
@@ -4625,7 +5314,7 @@ def save_clinical_summary():
             form_data={
                 'assessment_completed': True,
                 'clinical_summary_saved': True,
-                'final_completion_timestamp': datetime.now().isoformat()
+                'final_completion_timestamp': now_iso
             },
             ai_data=clinical_summary_data,
             files_data={}
@@ -4641,22 +5330,20 @@ def save_clinical_summary():
         session['patient_data']['clinical_summary_saved'] = True
         session.modified = True
         
-        print("✅ Clinical summary saved successfully to step6 data")
-        print(f"   📝 Summary length: {len(clinical_summary)} characters")
-        print(f"   ⏰ Saved at: {datetime.now().isoformat()}")
+        logger.info("Clinical summary saved to step6 data: %s characters at %s", summary_length, now_iso)
         
         return jsonify({
             'success': True,
             'message': 'Clinical summary saved successfully',
             'data': {
-                'summary_length': len(clinical_summary),
-                'saved_at': datetime.now().isoformat(),
+                'summary_length': summary_length,
+                'saved_at': now_iso,
                 'assessment_status': 'completed'
             }
         })
         
     except Exception as e:
-        print(f"❌ Error in save_clinical_summary: {str(e)}")
+        logger.exception("Error in save_clinical_summary: %s", e)
         return jsonify({'success': False, 'error': f'Failed to save clinical summary: {str(e)}'})
 
 @app.route('/step7')
@@ -4672,41 +5359,49 @@ def step7():
 def check_questions_skipped_status():
     """Check if follow-up questions were skipped in step 6"""
     try:
-        print("🔍 Checking if questions were skipped in step 6")
+        logger.debug("Checking if questions were skipped in step 6")
         
-        patient_data = load_patient_data()
+        patient_data = load_patient_data_readonly()
         if not patient_data:
-            print("❌ No patient data found")
+            logger.debug("No patient data found")
             return jsonify({'success': False, 'error': 'No patient data found'})
         
         # Check step6 data for skip information
         step6_data = patient_data.get('step6', {})
-        print(f"📋 Step6 data keys: {list(step6_data.keys())}")
+        ai_generated_data = step6_data.get('ai_generated_data', {})
+        
+        # Skip status resolved when the question responses were saved
+        skip_status = ai_generated_data.get('step6_skip_status')
+        if skip_status:
+            return jsonify({
+                'success': True,
+                'questions_skipped': skip_status['skipped'],
+                'questions_answered': skip_status['answered_count']
+            })
+        
+        # Older records: infer the skip status from the saved step 6 fields
+        logger.debug("Step6 data keys: %s", list(step6_data))
         
         # Check ai_generated_data (comprehensive response data - this is the correct field name!)
-        ai_generated_data = step6_data.get('ai_generated_data', {})
-        print(f"📋 ai_generated_data keys: {list(ai_generated_data.keys())}")
+        logger.debug("ai_generated_data keys: %s", list(ai_generated_data))
         total_questions_answered = ai_generated_data.get('total_questions_answered', -1)
         question_responses = ai_generated_data.get('question_responses', {})
         actual_responses_count = len(question_responses)
         
         # Check analysis_metadata (this contains the analysis_data from the request)
         analysis_metadata = ai_generated_data.get('analysis_metadata', {})
-        print(f"📋 analysis_metadata: {analysis_metadata}")
+        logger.debug("analysis_metadata: %s", analysis_metadata)
         questions_skipped_flag = analysis_metadata.get('questions_skipped', False)
         skip_flow_answered = analysis_metadata.get('questions_answered', -1)
         
         # Check form_data (from normal submit flow)
         form_data = step6_data.get('form_data', {})
-        print(f"📋 form_data keys: {list(form_data.keys())}")
+        logger.debug("form_data keys: %s", list(form_data))
         form_questions_answered = form_data.get('questions_answered', -1)
         
-        print(f"📊 Step 6 data analysis:")
-        print(f"   questions_skipped_flag: {questions_skipped_flag}")
-        print(f"   skip_flow_answered: {skip_flow_answered}")
-        print(f"   form_questions_answered: {form_questions_answered}")
-        print(f"   total_questions_answered: {total_questions_answered}")
-        print(f"   actual_responses_count: {actual_responses_count}")
+        logger.debug("Step 6 data analysis: questions_skipped_flag=%s, skip_flow_answered=%s, form_questions_answered=%s, "
+                     "total_questions_answered=%s, actual_responses_count=%s", questions_skipped_flag, skip_flow_answered,
+                     form_questions_answered, total_questions_answered, actual_responses_count)
         
         # Determine if questions were actually skipped
         # Questions are considered skipped ONLY if:
@@ -4715,14 +5410,14 @@ def check_questions_skipped_status():
         
         if questions_skipped_flag and actual_responses_count == 0:
             skipped = True
-            print("   ✅ Questions explicitly skipped with no responses")
+            logger.debug("Questions explicitly skipped with no responses")
         elif actual_responses_count > 0 or total_questions_answered > 0 or form_questions_answered > 0:
             skipped = False
-            print("   ✅ Questions were answered (not skipped)")
+            logger.debug("Questions were answered (not skipped)")
         else:
             # Default: if we can't determine clearly, assume not skipped
             skipped = False
-            print("   ⚠️ Unable to determine clearly, assuming not skipped")
+            logger.debug("Unable to determine clearly, assuming not skipped")
         
         # Determine the actual number of questions answered
         questions_answered_count = max(
@@ -4731,7 +5426,7 @@ def check_questions_skipped_status():
             form_questions_answered if form_questions_answered > 0 else 0
         )
         
-        print(f"   🎯 Final result: skipped={skipped}, answered={questions_answered_count}")
+        logger.debug("Final result: skipped=%s, answered=%s", skipped, questions_answered_count)
         
         return jsonify({
             'success': True,
@@ -4748,7 +5443,7 @@ def check_questions_skipped_status():
         })
         
     except Exception as e:
-        print(f"❌ Error checking questions skipped status: {str(e)}")
+        logger.error("Error checking questions skipped status: %s", e)
         return jsonify({
             'success': False, 
             'error': str(e),
@@ -4759,13 +5454,13 @@ def check_questions_skipped_status():
 def get_clinical_summary():
     """Retrieve the clinical summary from step6 data"""
     try:
-        print("✅ Getting clinical summary from step6 data")
+        logger.debug("Getting clinical summary from step6 data")
         
         if not validate_session_step(6):
             return jsonify({'success': False, 'error': 'Please complete step 6 first'})
         
         # Load patient data and get clinical summary from step6
-        patient_data = load_patient_data()
+        patient_data = load_patient_data_readonly()
         if not patient_data:
             return jsonify({'success': False, 'error': 'No patient data found'})
         
@@ -4778,7 +5473,7 @@ def get_clinical_summary():
         if not clinical_summary:
             return jsonify({'success': False, 'error': 'No clinical summary found in step6 data'})
         
-        print(f"✅ Clinical summary retrieved: {len(clinical_summary)} characters")
+        logger.debug("Clinical summary retrieved: %s characters", len(clinical_summary))
         
         return jsonify({
             'success': True,
@@ -4790,16 +5485,25 @@ def get_clinical_summary():
         })
         
     except Exception as e:
-        print(f"❌ Error in get_clinical_summary: {str(e)}")
+        logger.error("Error in get_clinical_summary: %s", e)
         return jsonify({'success': False, 'error': f'Failed to retrieve clinical summary: {str(e)}'})
 
+# LLM-formatted clinical summaries, keyed on a hash of the whitespace-normalized raw summary
+formatted_clinical_summary_cache = TTLCache(maxsize=512, ttl=60 * 60)
+
+# Clinical summary clean-up: whitespace runs, runs of dots, and line breaks together with the
+# whitespace (including blank lines) around them
+WHITESPACE_RUN_PATTERN = re.compile(r'\s+')
+DOT_RUN_PATTERN = re.compile(r'\.{2,}')
+LINE_BREAK_PATTERN = re.compile(r'\s*\n\s*')
+
 @app.route('/format_clinical_summary', methods=['POST'])
 def format_clinical_summary():
     """Format clinical summary text using LLM for professional medical formatting"""
     try:
         print("✅ Starting format_clinical_summary with LLM")
         
-        data = request.get_json()
+        data = request.get_json(cache=False)
         raw_summary = data.get('text', '').strip()
         
         if not raw_summary:
@@ -4810,6 +5514,10 @@ def format_clinical_summary():
         
         print(f"📝 Formatting clinical summary: {len(raw_summary)} characters")
         
+        # A summary already formatted (ignoring whitespace differences) reuses that result
+        cache_key = hashlib.blake2b(' '.join(raw_summary.split()).encode('utf-8'), digest_size=16).hexdigest()
+        formatted_summary = formatted_clinical_summary_cache.get(cache_key)
+        
         # Create formatting prompt for LLM
         formatting_prompt = f"""Please format the following clinical summary text into a professional, well-structured medical document using this EXACT format structure:
 
@@ -4876,16 +5584,22 @@ Please return ONLY the formatted clinical summary following this exact structure
 
         # Use the existing call_gpt4 function for formatting
         try:
-            formatted_summary = call_gpt4(formatting_prompt)
-            
-            # Clean up any potential formatting issues from LLM response
-            formatted_summary = formatted_summary.strip()
-            
-            # Remove any markdown formatting that might have been added
-            formatted_summary = formatted_summary.replace('```', '').replace('**', '').replace('##', '')
-            
-            # Ensure consistent line breaks
-            formatted_summary = '\n'.join(line.strip() for line in formatted_summary.split('\n') if line.strip())
+            if formatted_summary is None:
+                formatted_summary = call_gpt4(formatting_prompt)
+                
+                # Clean up any potential formatting issues from LLM response
+                formatted_summary = formatted_summary.strip()
+                
+                # Remove any markdown formatting that might have been added
+                formatted_summary = formatted_summary.replace('```', '').replace('**', '').replace('##', '')
+                
+                # Ensure consistent line breaks (strip each line and drop blank ones)
+                formatted_summary = LINE_BREAK_PATTERN.sub('\n', formatted_summary.strip())
+                
+                if formatted_summary:
+                    formatted_clinical_summary_cache.set(cache_key, formatted_summary)
+            else:
+                logger.debug("Formatted clinical summary served from cache")
             
             print(f"✅ Clinical summary formatted successfully: {len(formatted_summary)} characters")
             
@@ -4923,9 +5637,7 @@ def basic_clinical_formatting(text):
         return text
     
     # Remove excessive spaces and dots
-    formatted = text.strip()
-    formatted = ' '.join(formatted.split())  # Normalize whitespace
-    formatted = formatted.replace('....', '.').replace('...', '.').replace('..', '.')
+    formatted = DOT_RUN_PATTERN.sub('.', WHITESPACE_RUN_PATTERN.sub(' ', text.strip()))
     
     # Start with basic structure
     result = "Patient Clinical Summary\n\n"
@@ -4959,7 +5671,7 @@ def get_patient_data_summary():
         if not validate_session_step(6):
             return jsonify({'success': False, 'error': 'Please complete step 6 first'})
         
-        patient_data = load_patient_data()
+        patient_data = load_patient_data_readonly()
         if not patient_data:
             return jsonify({'success': False, 'error': 'No patient data found'})
         
@@ -4970,58 +5682,42 @@ def get_patient_data_summary():
         if step1_data:
             symptoms = step1_data.get('symptoms', {})
             if symptoms:
-                symptom_list = []
-                for symptom, details in symptoms.items():
-                    severity = details.get('severity', 'N/A')
-                    symptom_list.append(f'{symptom} (severity: {severity})')
-                summary_parts.append(f"Symptoms: {', '.join(symptom_list)}")
+                symptoms_text = ', '.join(
+                    f"{symptom} (severity: {details.get('severity', 'N/A')})" for symptom, details in symptoms.items()
+                )
+                summary_parts.append(f"Symptoms: {symptoms_text}")
         
         # Step 2: Vitals
         step2_data = patient_data.get('step2', {})
         if step2_data:
-            vitals_text = []
-            for key, value in step2_data.items():
-                if key != 'timestamp' and value:
-                    vitals_text.append(f"{key}: {value}")
+            vitals_text = ', '.join(f"{key}: {value}" for key, value in step2_data.items() if key != 'timestamp' and value)
             if vitals_text:
-                summary_parts.append(f"Vitals: {', '.join(vitals_text)}")
+                summary_parts.append(f"Vitals: {vitals_text}")
         
         # Step 3: Medical History
         step3_data = patient_data.get('step3', {})
         if step3_data:
-            history_text = []
-            for key, value in step3_data.items():
-                if key != 'timestamp' and value:
-                    if isinstance(value, list):
-                        history_text.append(f"{key}: {', '.join(value)}")
-                    else:
-                        history_text.append(f"{key}: {value}")
+            history_text = ', '.join(
+                f"{key}: {', '.join(value) if isinstance(value, list) else value}"
+                for key, value in step3_data.items() if key != 'timestamp' and value
+            )
             if history_text:
-                summary_parts.append(f"Medical History: {', '.join(history_text)}")
+                summary_parts.append(f"Medical History: {history_text}")
         
         # Step 4: Physical Examination  
         step4_data = patient_data.get('step4', {})
         if step4_data:
-            exam_text = []
-            for key, value in step4_data.items():
-                if key != 'timestamp' and value:
-                    exam_text.append(f"{key}: {value}")
+            exam_text = ', '.join(f"{key}: {value}" for key, value in step4_data.items() if key != 'timestamp' and value)
             if exam_text:
-                summary_parts.append(f"Physical Exam: {', '.join(exam_text)}")
+                summary_parts.append(f"Physical Exam: {exam_text}")
         
         # Step 5: Symptoms and Medical Documents
         step5_data = patient_data.get('step5', {})
         if step5_data:
-            lab_text = []
-            for key, value in step5_data.items():
-                if key not in ['timestamp', 'test_results'] and value:
-                    lab_text.append(f"{key}: {value}")
+            lab_text = [f"{key}: {value}" for key, value in step5_data.items() if key not in ('timestamp', 'test_results') and value]
             
             # Add specific test results
-            test_results = step5_data.get('test_results', {})
-            if test_results:
-                for test, result in test_results.items():
-                    lab_text.append(f"{test}: {result}")
+            lab_text.extend(f"{test}: {result}" for test, result in (step5_data.get('test_results') or {}).items())
             
             if lab_text:
                 summary_parts.append(f"Symptoms & Lab Results: {', '.join(lab_text)}")
@@ -5062,12 +5758,10 @@ def get_patient_data_summary():
             # Include critical medical findings
             critical_findings = step5_ai_data.get('critical_medical_findings', [])
             if critical_findings:
-                critical_summary = []
-                for finding in critical_findings:
-                    source = finding.get('source_document', 'Unknown')
-                    concern = finding.get('finding', '')
-                    critical_summary.append(f"{concern} (from {source})")
-                summary_parts.append(f"Critical Medical Findings: {'; '.join(critical_summary)}")
+                critical_summary = '; '.join(
+                    f"{finding.get('finding', '')} (from {finding.get('source_document', 'Unknown')})" for finding in critical_findings
+                )
+                summary_parts.append(f"Critical Medical Findings: {critical_summary}")
             
             # Include symptom insights if available
             symptom_insights = step5_ai_data.get('symptom_insights', {})
@@ -5101,7 +5795,7 @@ def generate_diagnostic_tests():
     try:
         print("🧪 Starting diagnostic tests generation")
         
-        data = request.get_json()
+        data = request.get_json(cache=False)
         narrowed_icd_codes = data.get('icd_codes', [])
         clinical_summary = data.get('clinical_summary', '')
         patient_data_summary = data.get('patient_data_summary', '')
@@ -5156,7 +5850,7 @@ def generate_diagnostic_tests_with_llm(icd_codes, clinical_summary, patient_data
                 for item in elimination_history
             ])
         
-        prompt_template = load_prompt("diagnostic_tests")
+        prompt_template = load_prompt_cached("diagnostic_tests")
         prompt = prompt_template.format(
             clinical_summary=clinical_summary,
             patient_data_summary=patient_data_summary,
@@ -5167,25 +5861,20 @@ def generate_diagnostic_tests_with_llm(icd_codes, clinical_summary, patient_data
         response = openai_client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": load_prompt("diagnostic_tests_system")},
+                {"role": "system", "content": load_prompt_cached("diagnostic_tests_system")},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=2000,
-            temperature=0.3
+            temperature=0.3,
+            response_format={"type": "json_object"}
         )
         
-        result_text = response.choices[0].message.content.strip()
+        result_text = response.choices[0].message.content
         print(f"🔍 Raw diagnostic tests response: {result_text[:200]}...")
         
-        # Clean the response to ensure it's valid JSON
-        if not result_text.startswith('{'):
-            start = result_text.find('{')
-            end = result_text.rfind('}') + 1
-            if start != -1 and end != -1:
-                result_text = result_text[start:end]
-        
         try:
-            result = json.loads(result_text)
+            # JSON mode guarantees a bare JSON object, so parse it directly
+            result = json_loads(result_text)
         except json.JSONDecodeError as e:
             print(f"❌ JSON decode error: {e}")
             print(f"📄 Full response text: {result_text}")
@@ -5220,7 +5909,7 @@ def generate_icd_codes():
         
         print("✅ Session validation passed")
         
-        data = request.get_json()
+        data = request.get_json(cache=False)
         print(f"🔍 Received data: {data}")
         
         if not data:
@@ -5239,9 +5928,10 @@ def generate_icd_codes():
         
         print(f"📝 Generating ICD codes for summary: {len(clinical_summary)} characters")
         
-        # Get all patient data for comprehensive analysis
+        # Get all patient data for comprehensive analysis (read-only; already loaded for this
+        # request by validate_session_step)
         print("📂 Loading patient data...")
-        patient_data = load_patient_data()
+        patient_data = load_patient_data_readonly()
         if not patient_data:
             print("❌ No patient data available")
             return jsonify({'success': False, 'error': 'No patient data available'})
@@ -5317,29 +6007,27 @@ def generate_icd_codes():
         traceback.print_exc()
         return jsonify({'success': False, 'error': f'Failed to generate ICD codes: {str(e)}'})
 
+# Referring doctors (static data based on the SQL table structure), indexed by id.
+# The dicts are shared between requests and must not be modified.
+REFERRING_DOCTORS = (
+    {'id': 1, 'first_name': 'Rajesh', 'last_name': 'Sharma', 'phone_number': '1111111111', 'email_address': 'rajesh.sharma@hospital.com', 'area_of_expertise': 'Cardiology'},
+    {'id': 2, 'first_name': 'Priya', 'last_name': 'Patel', 'phone_number': '2222222222', 'email_address': 'priya.patel@clinic.com', 'area_of_expertise': 'Pediatrics'},
+    {'id': 3, 'first_name': 'Amit', 'last_name': 'Kumar', 'phone_number': '3333333333', 'email_address': 'amit.kumar@medical.com', 'area_of_expertise': 'Orthopedics'},
+    {'id': 4, 'first_name': 'Sunita', 'last_name': 'Singh', 'phone_number': '4444444444', 'email_address': 'sunita.singh@healthcare.com', 'area_of_expertise': 'Dermatology'},
+    {'id': 5, 'first_name': 'Vikash', 'last_name': 'Gupta', 'phone_number': '5555555555', 'email_address': 'vikash.gupta@hospital.com', 'area_of_expertise': 'Neurology'},
+    {'id': 6, 'first_name': 'Meera', 'last_name': 'Jain', 'phone_number': '6666666666', 'email_address': 'meera.jain@clinic.com', 'area_of_expertise': 'Gynecology'},
+    {'id': 7, 'first_name': 'Rohit', 'last_name': 'Verma', 'phone_number': '7777777777', 'email_address': 'rohit.verma@medical.com', 'area_of_expertise': 'Gastroenterology'},
+    {'id': 8, 'first_name': 'Kavita', 'last_name': 'Agarwal', 'phone_number': '8888888888', 'email_address': 'kavita.agarwal@healthcare.com', 'area_of_expertise': 'Pulmonology'},
+    {'id': 9, 'first_name': 'Sanjay', 'last_name': 'Mishra', 'phone_number': '9999999999', 'email_address': 'sanjay.mishra@hospital.com', 'area_of_expertise': 'Oncology'}
+)
+REFERRING_DOCTORS_BY_ID = {doctor['id']: doctor for doctor in REFERRING_DOCTORS}
+
 def get_referring_doctor_by_id(doctor_id):
     """Get referring doctor details by ID"""
-    referring_doctors = [
-        {'id': 1, 'first_name': 'Rajesh', 'last_name': 'Sharma', 'phone_number': '1111111111', 'email_address': 'rajesh.sharma@hospital.com', 'area_of_expertise': 'Cardiology'},
-        {'id': 2, 'first_name': 'Priya', 'last_name': 'Patel', 'phone_number': '2222222222', 'email_address': 'priya.patel@clinic.com', 'area_of_expertise': 'Pediatrics'},
-        {'id': 3, 'first_name': 'Amit', 'last_name': 'Kumar', 'phone_number': '3333333333', 'email_address': 'amit.kumar@medical.com', 'area_of_expertise': 'Orthopedics'},
-        {'id': 4, 'first_name': 'Sunita', 'last_name': 'Singh', 'phone_number': '4444444444', 'email_address': 'sunita.singh@healthcare.com', 'area_of_expertise': 'Dermatology'},
-        {'id': 5, 'first_name': 'Vikash', 'last_name': 'Gupta', 'phone_number': '5555555555', 'email_address': 'vikash.gupta@hospital.com', 'area_of_expertise': 'Neurology'},
-        {'id': 6, 'first_name': 'Meera', 'last_name': 'Jain', 'phone_number': '6666666666', 'email_address': 'meera.jain@clinic.com', 'area_of_expertise': 'Gynecology'},
-        {'id': 7, 'first_name': 'Rohit', 'last_name': 'Verma', 'phone_number': '7777777777', 'email_address': 'rohit.verma@medical.com', 'area_of_expertise': 'Gastroenterology'},
-        {'id': 8, 'first_name': 'Kavita', 'last_name': 'Agarwal', 'phone_number': '8888888888', 'email_address': 'kavita.agarwal@healthcare.com', 'area_of_expertise': 'Pulmonology'},
-        {'id': 9, 'first_name': 'Sanjay', 'last_name': 'Mishra', 'phone_number': '9999999999', 'email_address': 'sanjay.mishra@hospital.com', 'area_of_expertise': 'Oncology'}
-    ]
-    
     try:
-        doctor_id = int(doctor_id)
-        for doctor in referring_doctors:
-            if doctor['id'] == doctor_id:
-                return doctor
+        return REFERRING_DOCTORS_BY_ID.get(int(doctor_id))
     except (ValueError, TypeError):
-        pass
-    
-    return None
+        return None
 
 @app.route('/submit_case', methods=['POST'])
 def submit_case():
@@ -5347,8 +6035,8 @@ def submit_case():
     try:
         print("✅ Starting case submission process")
         
-        # Get patient data from JSON file
-        patient_data = load_patient_data()
+        # Get patient data from JSON file (read-only; reused while the file is unchanged)
+        patient_data = load_patient_data_readonly()
         if not patient_data:
             return jsonify({'success': False, 'error': 'No patient data found'})
         
@@ -5361,8 +6049,8 @@ def submit_case():
         case_number = generate_case_number()
         print(f"📋 Generated case number: {case_number}")
         
-        # Prepare step7 data as JSON string for database
-        step7_json_data = json.dumps(step7_data, indent=2, default=str)
+        # Prepare step7 data as compact JSON string for database
+        step7_json_data = json_dumps_compact(step7_data)
         
         # Insert into database
         connection = get_sqlite_connection()
@@ -5385,6 +6073,7 @@ def submit_case():
             ))
             
             connection.commit()
+            case_details_cache.pop(case_number)
             print(f"✅ Case {case_number} inserted successfully")
             
             cursor.close()
@@ -5414,7 +6103,7 @@ def generate_differential_question():
     try:
         print("🔍 Starting differential question generation")
         
-        data = request.get_json()
+        data = request.get_json(cache=False)
         remaining_icd_codes = data.get('icd_codes', [])
         clinical_summary = data.get('clinical_summary', '')
         patient_data_summary = data.get('patient_data_summary', '')
@@ -5458,7 +6147,7 @@ def process_differential_answer():
     try:
         print("🔄 Processing differential answer")
         
-        data = request.get_json()
+        data = request.get_json(cache=False)
         answer = data.get('answer')
         remaining_icd_codes = data.get('icd_codes', [])
         target_code_to_eliminate = data.get('target_code_to_eliminate')
@@ -5595,7 +6284,7 @@ def generate_differential_question_with_llm(icd_codes, clinical_summary, patient
         print(f"🔍 Previously eliminated codes: {eliminated_codes}")
         print(f"🔍 Previous questions asked: {len(previous_questions)}")
         
-        prompt_template = load_prompt("differential_question")
+        prompt_template = load_prompt_cached("differential_question")
         prompt = prompt_template.format(
             clinical_summary=clinical_summary,
             patient_data_summary=patient_data_summary,
@@ -5608,7 +6297,7 @@ def generate_differential_question_with_llm(icd_codes, clinical_summary, patient
         response = openai_client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": load_prompt("differential_question_system")},
+                {"role": "system", "content": load_prompt_cached("differential_question_system")},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=1000,
@@ -5684,7 +6373,7 @@ def process_answer_with_llm(answer, question, icd_codes, target_code_to_eliminat
         print(f"🔍 Current codes available: {current_codes}")
         print(f"🎯 Target code to eliminate: {target_code_to_eliminate}")
         
-        prompt_template = load_prompt("answer_processing")
+        prompt_template = load_prompt_cached("answer_processing")
         prompt = prompt_template.format(
             clinical_summary=clinical_summary,
             codes_text=codes_text,
@@ -5697,7 +6386,7 @@ def process_answer_with_llm(answer, question, icd_codes, target_code_to_eliminat
         response = openai_client.chat.completions.create(
             model="gpt-4.1-nano",
             messages=[
-                {"role": "system", "content": load_prompt("answer_processing_system")},
+                {"role": "system", "content": load_prompt_cached("answer_processing_system")},
                 {"role": "user", "content": prompt}
             ],
             max_tokens=800,
@@ -5788,7 +6477,7 @@ Follow-up Questions Answered: {len(followup_data.get('organized_qa_pairs', []))}
 """
 
         # Create LLM prompt for ICD11 code generation
-        prompt_template = load_prompt("icd11_generation")
+        prompt_template = load_prompt_cached("icd11_generation")
         prompt = prompt_template.format(context=context)
 
         # Make API call to OpenAI
@@ -5798,7 +6487,7 @@ Follow-up Questions Answered: {len(followup_data.get('organized_qa_pairs', []))}
             response = openai_client.chat.completions.create(
                 model="gpt-4.1-nano",
                 messages=[
-                    {"role": "system", "content": load_prompt("icd11_generation_system")},
+                    {"role": "system", "content": load_prompt_cached("icd11_generation_system")},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=2000,
@@ -5918,7 +6607,7 @@ def complete_assessment():
     try:
         print("✅ Completing assessment")
         
-        data = request.get_json()
+        data = request.get_json(cache=False)
         step = data.get('step', 7)
         
         # Update final completion status
@@ -6110,11 +6799,11 @@ def build_clinical_context(step4_data, step5_data, step6_data, priorities):
             ai_data = step4_data.get('ai_data', {})
             
             # Extract follow-up question responses
-            followup_responses = {}
-            for key, value in form_data.items():
-                if key.startswith('followup_answer_'):
-                    question_id = key.replace('followup_answer_', '')
-                    followup_responses[question_id] = value
+            followup_responses = {
+                key[FOLLOWUP_ANSWER_PREFIX_LEN:]: value
+                for key, value in form_data.items()
+                if key.startswith(FOLLOWUP_ANSWER_PREFIX)
+            }
             
             if followup_responses:
                 context['follow_up_responses'] = followup_responses
@@ -6174,7 +6863,7 @@ def generate_ai_icd_diagnosis(clinical_context):
             messages=[
                 {
                     "role": "system",
-                    "content": load_prompt("icd10_diagnosis_system")
+                    "content": load_prompt_cached("icd10_diagnosis_system")
                 },
                 {
                     "role": "user", 
@@ -6312,7 +7001,7 @@ ABNORMAL FINDINGS IDENTIFIED:
         patient_demographics = clinical_context.get('patient_demographics', '')
         
         # Load and format the comprehensive diagnosis prompt
-        prompt_template = load_prompt("comprehensive_diagnosis")
+        prompt_template = load_prompt_cached("comprehensive_diagnosis")
         prompt = prompt_template.format(
             step5_priority=priorities['step5']*100,
             step6_priority=priorities['step6']*100,
@@ -6413,13 +7102,24 @@ def get_step6_qa_data():
 
 # Step 7 routes removed - now ending at step 6 with clinical summary
 
-def generate_clinical_summary():
-    """Generate a clinical summary using LLM based on steps 4, 5, and 6 data"""
+# Caps concurrent clinical summary LLM calls across request threads, so a burst of step 6
+# completions queues here instead of piling onto the provider's rate limit
+CLINICAL_SUMMARY_MAX_CONCURRENCY = int(os.getenv('CLINICAL_SUMMARY_MAX_CONCURRENCY', '8'))
+clinical_summary_slots = threading.BoundedSemaphore(CLINICAL_SUMMARY_MAX_CONCURRENCY)
+
+def generate_clinical_summary(patient_data=None, step6_qa_pairs=None):
+    """
+    Generate a clinical summary using LLM based on steps 4, 5, and 6 data.
+    patient_data defaults to the session's patient data file. step6_qa_pairs, if given, is used
+    instead of the stored step 6 Q&A pairs, so the summary can be generated while they are still
+    being saved. With patient_data passed in, this can run off the request thread.
+    """
     try:
         print("🏥 GENERATING CLINICAL SUMMARY...")
         
         # Get patient data from all steps
-        patient_data = load_patient_data()
+        if patient_data is None:
+            patient_data = load_patient_data()
         print(f"📊 Loaded patient data: {list(patient_data.keys()) if patient_data else 'None'}")
         
         if not patient_data:
@@ -6579,10 +7279,11 @@ def generate_clinical_summary():
         
         # Detailed Assessment (Step 6)
         step6_ai = step6_data.get('ai_generated_data', {})
-        if step6_ai and 'organized_qa_pairs' in step6_ai:
+        if step6_qa_pairs is None and step6_ai and 'organized_qa_pairs' in step6_ai:
+            step6_qa_pairs = step6_ai['organized_qa_pairs']
+        if step6_qa_pairs:
             responses = []
-            qa_pairs = step6_ai['organized_qa_pairs']
-            for qa_pair in qa_pairs:
+            for qa_pair in step6_qa_pairs:
                 if isinstance(qa_pair, dict):
                     question = qa_pair.get('question_text', '')
                     answer = qa_pair.get('answer', '')
@@ -6601,27 +7302,28 @@ def generate_clinical_summary():
         full_context = "\n\n".join(clinical_context)
         
         # Create prompt for LLM to generate clinical summary
-        prompt_template = load_prompt("clinical_summary")
+        prompt_template = load_prompt_cached("clinical_summary")
         prompt = prompt_template.format(full_context=full_context)
 
         print("🤖 Sending clinical summary request to GPT-4o...")
         
         # Use GPT-4o for generating clinical summary
-        response = openai_client.chat.completions.create(
-            model="gpt-4.1-nano",
-            messages=[
-                {
-                    "role": "system",
-                    "content": load_prompt("clinical_summary_system")
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
-            temperature=0.3,  # Lower temperature for more consistent medical documentation
-            max_tokens=2000
-        )
+        with clinical_summary_slots:
+            response = openai_client.chat.completions.create(
+                model="gpt-4.1-nano",
+                messages=[
+                    {
+                        "role": "system",
+                        "content": load_prompt_cached("clinical_summary_system")
+                    },
+                    {
+                        "role": "user", 
+                        "content": prompt
+                    }
+                ],
+                temperature=0.3,  # Lower temperature for more consistent medical documentation
+                max_tokens=2000
+            )
         
         clinical_summary = response.choices[0].message.content.strip()
         print(f"✅ Clinical summary generated: {len(clinical_summary)} characters")
@@ -6970,7 +7672,7 @@ def generate_targeted_step5_questions(step5_context):
         print(f"🎯 TARGET: {target_questions} questions for {num_medical_conditions} conditions + {num_document_conditions} documents ({total_medical_info} total)")
         
         # Create prompt for LLM - acting as medical expert who understands what patients actually experience
-        prompt_template = load_prompt("dynamic_questions")
+        prompt_template = load_prompt_cached("dynamic_questions")
         prompt = prompt_template.format(
             full_context=full_context,
             target_questions=target_questions,
@@ -6986,7 +7688,7 @@ def generate_targeted_step5_questions(step5_context):
             messages=[
                 {
                     "role": "system",
-                    "content": load_prompt("dynamic_questions_system")
+                    "content": load_prompt_cached("dynamic_questions_system")
                 },
                 {
                     "role": "user", 
@@ -7455,7 +8157,7 @@ def generate_followup_questions():
         print(f"📝 Findings for AI analysis:\n{findings_text}")
         
         # Create AI prompt
-        prompt_template = load_prompt("abnormal_vitals_followup")
+        prompt_template = load_prompt_cached("abnormal_vitals_followup")
         prompt = prompt_template.format(
             age=age,
             gender=gender,
@@ -7471,7 +8173,7 @@ def generate_followup_questions():
                 messages=[
                     {
                         "role": "system", 
-                        "content": load_prompt("followup_questions_system")
+                        "content": load_prompt_cached("followup_questions_system")
                     },
                     {"role": "user", "content": prompt}
                 ],
@@ -7759,7 +8461,7 @@ def analyze_medical_report():
         else:
             print("DEBUG: Processing JSON upload")
             # Handle JSON format (existing functionality)
-            data = request.get_json()
+            data = request.get_json(cache=False)
             file_data = data.get('file_data')
             file_name = data.get('file_name')
             file_type = data.get('file_type')
@@ -7771,16 +8473,16 @@ def analyze_medical_report():
         
         # Create specialized prompt based on category
         if category in ['laboratory', 'lab']:
-            prompt_template = load_prompt("educational_lab_analysis")
+            prompt_template = load_prompt_cached("educational_lab_analysis")
             prompt = prompt_template.format(file_name=file_name)
         elif category in ['medical_image', 'image']:
-            prompt_template = load_prompt("educational_medical_image_analysis")
+            prompt_template = load_prompt_cached("educational_medical_image_analysis")
             prompt = prompt_template.format(file_name=file_name, report_type=report_type)
         elif category == 'pathology':
-            prompt_template = load_prompt("educational_pathology_analysis")
+            prompt_template = load_prompt_cached("educational_pathology_analysis")
             prompt = prompt_template.format(file_name=file_name)
         elif category in ['signal', 'signaling']:
-            prompt_template = load_prompt("educational_signal_analysis")
+            prompt_template = load_prompt_cached("educational_signal_analysis")
             prompt = prompt_template.format(file_name=file_name, report_type=report_type)
         else:
             return jsonify({'success': False, 'error': 'Invalid report category'})
@@ -7868,24 +8570,14 @@ def analyze_medical_report():
         
         print(f"DEBUG: Final analysis object: {analysis}")
         
-        # Ensure patient_data exists in session
-        if 'patient_data' not in session:
-            session['patient_data'] = {}
-            print("DEBUG: Initialized empty patient_data in session")
-        
-        # Store analysis in session
-        if 'medical_reports_analysis' not in session['patient_data']:
-            session['patient_data']['medical_reports_analysis'] = []
-            print("DEBUG: Initialized medical_reports_analysis list")
-        
-        session['patient_data']['medical_reports_analysis'].append({
+        # Store analysis server-side (full analyses are too large for the session cookie)
+        append_session_artifact('medical_reports_analysis', {
             'file_name': file_name,
             'category': category,
             'report_type': report_type,
             'analysis': analysis,
             'analyzed_at': datetime.now().isoformat()
         })
-        session.modified = True
         
         return jsonify({
             'success': True,
@@ -7938,7 +8630,7 @@ def api_get_patient_data():
 def api_save_patient_data():
     """API endpoint to save patient data to file storage"""
     try:
-        request_data = request.get_json()
+        request_data = request.get_json(cache=False)
         if not request_data:
             return jsonify({'success': False, 'error': 'No data provided'})
         
@@ -8523,81 +9215,7 @@ def download_report():
 def get_referring_doctors():
     """Get list of referring doctors from database/static data"""
     try:
-        # Static data based on the SQL table structure
-        referring_doctors = [
-            {
-                'id': 1,
-                'first_name': 'Rajesh',
-                'last_name': 'Sharma',
-                'phone_number': '1111111111',
-                'email_address': 'rajesh.sharma@hospital.com',
-                'area_of_expertise': 'Cardiology'
-            },
-            {
-                'id': 2,
-                'first_name': 'Priya',
-                'last_name': 'Patel',
-                'phone_number': '2222222222',
-                'email_address': 'priya.patel@clinic.com',
-                'area_of_expertise': 'Pediatrics'
-            },
-            {
-                'id': 3,
-                'first_name': 'Amit',
-                'last_name': 'Kumar',
-                'phone_number': '3333333333',
-                'email_address': 'amit.kumar@medical.com',
-                'area_of_expertise': 'Orthopedics'
-            },
-            {
-                'id': 4,
-                'first_name': 'Sunita',
-                'last_name': 'Singh',
-                'phone_number': '4444444444',
-                'email_address': 'sunita.singh@healthcare.com',
-                'area_of_expertise': 'Dermatology'
-            },
-            {
-                'id': 5,
-                'first_name': 'Vikash',
-                'last_name': 'Gupta',
-                'phone_number': '5555555555',
-                'email_address': 'vikash.gupta@hospital.com',
-                'area_of_expertise': 'Neurology'
-            },
-            {
-                'id': 6,
-                'first_name': 'Meera',
-                'last_name': 'Jain',
-                'phone_number': '6666666666',
-                'email_address': 'meera.jain@clinic.com',
-                'area_of_expertise': 'Gynecology'
-            },
-            {
-                'id': 7,
-                'first_name': 'Rohit',
-                'last_name': 'Verma',
-                'phone_number': '7777777777',
-                'email_address': 'rohit.verma@medical.com',
-                'area_of_expertise': 'Gastroenterology'
-            },
-            {
-                'id': 8,
-                'first_name': 'Kavita',
-                'last_name': 'Agarwal',
-                'phone_number': '8888888888',
-                'email_address': 'kavita.agarwal@healthcare.com',
-                'area_of_expertise': 'Pulmonology'
-            },
-            {
-                'id': 9,
-                'first_name': 'Sanjay',
-                'last_name': 'Mishra',
-                'phone_number': '9999999999',
-                'email_address': 'sanjay.mishra@hospital.com',
-                'area_of_expertise': 'Oncology'
-            }
-        ]
+        referring_doctors = list(REFERRING_DOCTORS)
         
         print(f"✅ Retrieved {len(referring_doctors)} referring doctors")
         
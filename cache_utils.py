@@ -0,0 +1,71 @@
+"""
+In-process caching utilities for the Care AI application.
+This module provides a small thread-safe cache with per-entry expiry.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    Thread-safe key/value cache with a time-to-live and a maximum size.
+
+    Entries older than ``ttl`` seconds are treated as missing. When the cache
+    is full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, maxsize=256, ttl=300):
+        """
+        Args:
+            maxsize (int): Maximum number of entries kept in the cache
+            ttl (float): Seconds an entry stays valid after it is stored
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, or default if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Store value under key, evicting the least recently used entry when full.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            while len(self._entries) >= self.maxsize:
+                self._entries.popitem(last=False)
+            self._entries[key] = (time.monotonic(), value)
+
+    def pop(self, key, default=None):
+        """
+        Remove key from the cache and return its value (default if absent).
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry[1] if entry is not None else default
+
+    def clear(self):
+        """
+        Remove all entries from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
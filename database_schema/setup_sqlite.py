@@ -34,6 +34,12 @@ def setup_sqlite_database():
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_case_number ON cases(case_number);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_status ON cases(status);")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON cases(created_at);")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cases_email_session ON cases(
+                json_extract(details, '$.patient_email'),
+                json_extract(details, '$.session_id')
+            );
+        """)
         
         connection.commit()
         
@@ -4,6 +4,53 @@ This module provides functions to load prompts from external text files.
 """
 
 import os
+from functools import lru_cache
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts')
+
+# Map photo types to prompt files
+PHOTO_PROMPT_MAPPING = {
+    'tongue': 'photo_tongue_analysis',
+    'throat': 'photo_throat_analysis',
+    'infection': 'photo_infection_analysis',
+    'laboratory': 'photo_laboratory_analysis',
+    'medical_image': 'photo_medical_image_analysis',
+    'signal': 'photo_signal_analysis'
+}
+
+def get_prompt_mtime(prompt_name):
+    """
+    Get the modification time of a prompt file, for use as a cache key.
+    
+    Args:
+        prompt_name (str): Name of the prompt file (without .txt extension)
+        
+    Returns:
+        int or None: The file's mtime in nanoseconds, or None if it doesn't exist
+    """
+    try:
+        return os.stat(os.path.join(PROMPTS_DIR, f"{prompt_name}.txt")).st_mtime_ns
+    except OSError:
+        return None
+
+@lru_cache(maxsize=128)
+def _load_prompt_version(prompt_name, mtime):
+    return load_prompt(prompt_name)
+
+def load_prompt_cached(prompt_name):
+    """
+    Load a prompt, reusing the previously read content while the file is unchanged.
+    
+    Prompt files can be edited at runtime from the admin portal, so the cache
+    is keyed on the file's modification time.
+    
+    Args:
+        prompt_name (str): Name of the prompt file (without .txt extension)
+        
+    Returns:
+        str: The prompt content
+    """
+    return _load_prompt_version(prompt_name, get_prompt_mtime(prompt_name))
 
 def load_prompt(prompt_name):
     """
@@ -20,10 +67,7 @@ def load_prompt(prompt_name):
         IOError: If there's an error reading the file
     """
     try:
-        # Get the directory where this script is located
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        prompts_dir = os.path.join(current_dir, 'prompts')
-        prompt_file = os.path.join(prompts_dir, f"{prompt_name}.txt")
+        prompt_file = os.path.join(PROMPTS_DIR, f"{prompt_name}.txt")
         
         # Check if file exists
         if not os.path.exists(prompt_file):
@@ -51,21 +95,11 @@ def get_photo_analysis_prompt(photo_type, report_type=None):
         str: The formatted prompt content
     """
     try:
-        # Map photo types to prompt files
-        prompt_mapping = {
-            'tongue': 'photo_tongue_analysis',
-            'throat': 'photo_throat_analysis',
-            'infection': 'photo_infection_analysis',
-            'laboratory': 'photo_laboratory_analysis',
-            'medical_image': 'photo_medical_image_analysis',
-            'signal': 'photo_signal_analysis'
-        }
-        
         # Get the prompt name, default to infection if not found
-        prompt_name = prompt_mapping.get(photo_type, 'photo_infection_analysis')
+        prompt_name = PHOTO_PROMPT_MAPPING.get(photo_type, 'photo_infection_analysis')
         
-        # Load the prompt
-        prompt_content = load_prompt(prompt_name)
+        # Load the prompt (cached until the file changes)
+        prompt_content = load_prompt_cached(prompt_name)
         
         # Replace placeholder if report_type is provided
         if report_type and '{report_type}' in prompt_content: